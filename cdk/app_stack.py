@@ -22,7 +22,7 @@ class AppStack:
         alarms = Alarms(stack, stack_inputs, cloudwatch)
 
         # Create Dynamodb Table
-        dynamodb = Dynamodb(stack)
+        dynamodb = Dynamodb(stack, stack_inputs)
 
         # Create Eventbridge Rules
         eventbridge = Eventbridge(stack, stack_inputs, cloudwatch)
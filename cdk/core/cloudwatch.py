@@ -26,7 +26,7 @@ class CloudWatch(constructs.Construct):
         self.stack = stack
         self.stack_inputs = stack_inputs
 
-        # This topic is referenced by tenant stacks - do not remove or allow the ID/ARN to change
+        # This topic is passed to tenant stacks before version 0.4.0 - do not remove or allow the ID/ARN to change
         if stack_inputs.alarms.pagerduty.warning:
             self.warning_topic = Topic(self, 'FndsConnectorAlarmTopicWarning', unencrypted=True)
         if stack_inputs.alarms.pagerduty.critical:
@@ -176,6 +176,11 @@ class CloudWatch(constructs.Construct):
             treat_missing_data=TreatMissingData.NOT_BREACHING,
         )
 
+    def add_warning_alarm(self, _id: str, *, description: str, notify: bool = True, **kwargs) -> Alarm:
+        """Adds an alarm on any metric, sent to the warning topic if notify is set."""
+        topic = self.warning_topic if notify else None
+        return self._create_alarm(_id, topic=topic, description=description, **kwargs)
+
     def create_dashboard(self):
         """Adds our custom widgets to the CloudWatch dashboard."""
 
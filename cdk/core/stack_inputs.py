@@ -118,6 +118,10 @@ class LambdaFunctionOverrides:
     timeout_seconds: Optional[int] = None
     deployment_group_error_rate_alarm_config: AlarmConfigOverrides = field(default_factory=AlarmConfigOverrides)
     reserved_concurrency: Optional[int] = None
+    # Logging level for this function (default: the stack-wide level)
+    log_level: Optional[str] = None
+    # Fraction of per-record log messages to write (default: all); sampled messages are summarised once per invocation
+    log_sample_rate: Optional[float] = None
     # Alarm configuration for the Lambda
     alarms: LambdaAlarmOverrides = field(default_factory=LambdaAlarmOverrides)
 
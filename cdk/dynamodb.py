@@ -1,16 +1,18 @@
 from dataclasses import dataclass
 
 from aws_cdk import CfnOutput
-from aws_cdk.aws_dynamodb import Attribute, AttributeType, TableEncryption
+from aws_cdk.aws_dynamodb import Attribute, AttributeType, ProjectionType, TableEncryption
 from bb_fnds.cdk_constructs import pipeline_forge
 from bb_fnds.cdk_constructs.dynamodb import Table
 
+from cdk.stack_inputs import StackInputs
+
 
 @dataclass(init=False)
 class Dynamodb:
     tenant_resources_table: Table
 
-    def __init__(self, stack: pipeline_forge.Stack):
+    def __init__(self, stack: pipeline_forge.Stack, stack_inputs: StackInputs):
         self.tenant_resources_table = Table(
             stack,
             'TenantResourcesTable',
@@ -19,6 +21,26 @@ class Dynamodb:
             encryption=TableEncryption.AWS_MANAGED,
         )
 
+        # Sparse, as only METADATA rows have a MetadataVersion, so finding the tenants on a version reads nothing else
+        self.tenant_resources_table.add_global_secondary_index(
+            index_name='VersionIndex',
+            partition_key=Attribute(name='MetadataVersion', type=AttributeType.STRING),
+            sort_key=Attribute(name='pk', type=AttributeType.STRING),
+            projection_type=ProjectionType.INCLUDE,
+            non_key_attributes=['ClientId', 'InboundQueueArn', 'Provisioner'],
+        )
+
+        # Sparse, as audit rows only have an InFlight action while their execution is running, so finding stuck
+        # executions reads only the rows that have been in progress the longest
+        if stack_inputs.dynamodb.in_flight_index:
+            self.tenant_resources_table.add_global_secondary_index(
+                index_name='InFlightIndex',
+                partition_key=Attribute(name='InFlight', type=AttributeType.STRING),
+                sort_key=Attribute(name='UpdatedAt', type=AttributeType.STRING),
+                projection_type=ProjectionType.INCLUDE,
+                non_key_attributes=['Execution', 'Status'],
+            )
+
         CfnOutput(stack,
                   'TableName',
                   value=self.tenant_resources_table.table_name,
@@ -1,6 +1,6 @@
 from cdk.core.stack_inputs import AlarmConfigOverrides, AlarmOverrides, ApiGatewayOverrides
-from cdk.stack_inputs import GetQueueFunctionOverrides, LambdasOverrides, StackInputs, \
-    TestOverrides
+from cdk.stack_inputs import GetQueueFunctionOverrides, LambdasOverrides, StackInputs, StepFunctionsOverrides, \
+    TenantResourcesOverrides, TestOverrides, WarmPoolOverrides
 
 config = StackInputs(
     alarms=AlarmOverrides(use_dashboard_suffix=False),
@@ -14,5 +14,8 @@ config = StackInputs(
         log_level="INFO",
         get_queue=GetQueueFunctionOverrides(only_saas_tenants=False),
     ),
+    step_functions=StepFunctionsOverrides(event_driven_stack_completion=True),
+    tenant_resources=TenantResourcesOverrides(provisioner='Direct'),
     tests=TestOverrides(enable_integ_rest_tests=True),
+    warm_pool=WarmPoolOverrides(size=2),
 )
@@ -2,7 +2,7 @@ from cdk.core.stack_inputs import AlarmConfigOverrides, AlarmOverrides, ApiGatew
     LambdaEventFunctionOverrides, LambdaFunctionOverrides
 from cdk.environments import PAGERDUTY_NON_PROD
 from cdk.stack_inputs import EventHandlerOverrides, GetQueueFunctionOverrides, LambdasOverrides, \
-    StackInputs
+    StackInputs, StepFunctionsOverrides, WarmPoolOverrides
 
 config = StackInputs(
     alarms=AlarmOverrides(
@@ -17,10 +17,12 @@ config = StackInputs(
     lambdas=LambdasOverrides(
         log_level="INFO",
         get_queue=GetQueueFunctionOverrides(only_saas_tenants=False),
-        eventbridge_to_sqs=LambdaEventFunctionOverrides(reserved_concurrency=400),
-        sqs_to_eventbridge=EventHandlerOverrides(reserved_concurrency=160),
+        eventbridge_to_sqs=LambdaEventFunctionOverrides(reserved_concurrency=400, log_sample_rate=0.1),
+        sqs_to_eventbridge=EventHandlerOverrides(reserved_concurrency=160, log_sample_rate=0.1),
         tenant_event_handler=EventHandlerOverrides(reserved_concurrency=5),
         tenant_resources_get_stack_status=LambdaFunctionOverrides(reserved_concurrency=5),
         tenant_resources_manage_metadata=LambdaFunctionOverrides(reserved_concurrency=5),
     ),
+    step_functions=StepFunctionsOverrides(event_driven_stack_completion=True),
+    warm_pool=WarmPoolOverrides(size=5),
 )
@@ -5,11 +5,13 @@ import aws_cdk.aws_iam as iam
 import aws_cdk.aws_logs as logs
 import constructs
 from aws_cdk import Duration
+from aws_cdk.aws_cloudwatch import ComparisonOperator, Metric, TreatMissingData
 from aws_cdk.aws_codedeploy import LambdaDeploymentConfig, LambdaDeploymentGroup
-from aws_cdk.aws_events import EventPattern, Rule
+from aws_cdk.aws_events import EventPattern, Rule, Schedule
 from aws_cdk.aws_events_targets import LambdaFunction, SqsQueue
 from aws_cdk.aws_lambda import Alias, Architecture, Function, ILayerVersion, Runtime, Tracing
 from aws_cdk.aws_lambda_event_sources import SqsEventSource
+from aws_cdk.aws_s3_assets import Asset
 from aws_cdk.aws_sqs import DeadLetterQueue, QueueEncryption
 from bb_ent_data_services_shared.cdk.util import override_logical_id
 from bb_fnds.cdk_constructs import bundler, event_hub, lambdas as cc_lambdas, pipeline_forge, service_discovery
@@ -59,16 +61,27 @@ class Lambdas(constructs.Construct):
             'STACK_NAME': stack.stack_name,
             'LOG_LEVEL': stack_inputs.lambdas.log_level,
             'POWERTOOLS_SERVICE_NAME': stack.stack_name,
+            'METRICS_NAMESPACE': stack.stack_name,
         }
 
         self.sqs_wildcard_arn: str = f'arn:{stack.partition}:sqs:{stack.region}:{stack.account}:{stack.stack_name}-*'
+        self.warm_pool_sqs_wildcard_arn: str = \
+            f'arn:{stack.partition}:sqs:{stack.region}:{stack.account}:{stack.stack_name}-pool-*'
+        # Tenant step functions are named after the stack. Referencing them by name avoids a circular dependency
+        # between the Lambdas they invoke and the state machines.
+        self.state_machine_wildcard_arn: str = \
+            f'arn:{stack.partition}:states:{stack.region}:{stack.account}:stateMachine:{stack.stack_name}-*'
 
         # List of REST API lambdas
-        self.rest_apis: list[MonitoredLambda] = []
+        self.rest_apis: list[MonitoredLambda | RestEndpointAlias] = []
 
         self._create_sqs_event_handler()
+        self.rest_router: Optional[MonitoredLambda] = None
+        if stack_inputs.lambdas.rest_router.enabled:
+            self._create_rest_router()
         self._create_rest_get_queue()
         self._create_rest_get_queues()
+        self._create_rest_batch_get_queues()
         self._create_rest_delete_queues()
         self._create_eventbridge_event_handler()
         self._create_tenant_event_handler()
@@ -76,6 +89,16 @@ class Lambdas(constructs.Construct):
         self._create_tenant_resources_deploy_stack()
         self._create_tenant_resources_get_stack_status()
         self._create_tenant_resources_destroy_stack()
+        if stack_inputs.step_functions.event_driven_stack_completion:
+            self._create_tenant_resources_stack_status_listener()
+        if stack_inputs.warm_pool.size:
+            self._create_tenant_resources_fill_warm_pool()
+            self._create_tenant_resources_claim_pooled_queue()
+        self._create_tenant_resources_queue_age_monitor()
+        self._create_tenant_resources_list_tenants_to_upgrade()
+        self._create_tenant_resources_report_upgrade_progress()
+        if stack_inputs.dynamodb.in_flight_index:
+            self._create_tenant_resources_audit_sweeper()
 
         # Scaling/Performance alarms
         cloudwatch.lambda_rest_concurrency_alarm()
@@ -113,20 +136,49 @@ class Lambdas(constructs.Construct):
         # Subscribe to SQS events
         self.sqs_to_eventbridge.alias.add_event_source(SqsEventSource(queue=self.outbound_queue, batch_size=10))
 
+    def _create_rest_router(self):
+        overrides = self.stack_inputs.lambdas.rest_router
+        overrides.alarms.set_defaults(
+            availability_enabled=False,  # Has alarm on API Gateway metrics
+        )
+
+        # Each endpoint adds the environment, permissions and alias it needs as it is created
+        self.rest_router = MonitoredLambda(
+            self,
+            'RestRouterFunction',
+            overrides=overrides,
+            rest_api=True,
+            entry='functions/rest_api',
+            handler='router.handler',
+            reserved_concurrent_executions=overrides.reserved_concurrency,
+            # Long enough for get_queue, which may wait for a queue to be provisioned
+            timeout=Duration.seconds(28),
+        )
+
+    def _create_rest_lambda(self, _id: str, *, overrides: LambdaFunctionOverrides,
+                            **kwargs) -> 'MonitoredLambda | RestEndpointAlias':
+        """ Creates a REST endpoint's function, or its alias of the REST router if that is enabled """
+        if not self.rest_router:
+            return MonitoredLambda(self, _id, overrides=overrides, rest_api=True, **kwargs)
+
+        for key, value in kwargs.get('environment', {}).items():
+            self.rest_router.function.add_environment(key, value)
+        return RestEndpointAlias(self, _id, router=self.rest_router, overrides=overrides)
+
     def _create_rest_get_queue(self):
         overrides = self.stack_inputs.lambdas.get_queue
         overrides.alarms.set_defaults(
             availability_enabled=False,  # Has alarm on API Gateway metrics
         )
 
-        self.get_queue = MonitoredLambda(
-            self,
+        self.get_queue = self._create_rest_lambda(
             'GetQueueFunction',
             overrides=overrides,
-            rest_api=True,
             entry='functions/rest_api/get_queue',
             handler='get_queue.handler',
             reserved_concurrent_executions=overrides.reserved_concurrency,
+            # Requests may wait for their queue to be provisioned, up to just within the API Gateway timeout
+            timeout=Duration.seconds(28),
             environment={
                 **self.common_env,
                 'OUTBOUND_QUEUE_ARN': self.outbound_queue.queue_arn,
@@ -134,7 +186,8 @@ class Lambdas(constructs.Construct):
             },
         )
 
-        self.dynamodb.tenant_resources_table.grant_read_data(self.get_queue.function)
+        # Write access is needed to record the message encoding a tenant negotiates, and to claim creation attempts
+        self.dynamodb.tenant_resources_table.grant_read_write_data(self.get_queue.function)
 
         sqs_role = iam.Role(self,
                             'SqsAssumeRole',
@@ -185,27 +238,37 @@ class Lambdas(constructs.Construct):
             availability_enabled=False,  # Has alarm on API Gateway metrics
         )
 
-        self.get_queues = MonitoredLambda(
-            self,
+        self.get_queues = self._create_rest_lambda(
             'GetQueuesFunction',
             overrides=overrides,
-            rest_api=True,
             entry='functions/rest_api/get_queues',
             handler='get_queues.handler',
         )
         self.dynamodb.tenant_resources_table.grant_read_data(self.get_queues.function)
 
+    def _create_rest_batch_get_queues(self):
+        overrides = self.stack_inputs.lambdas.batch_get_queues
+        overrides.alarms.set_defaults(
+            availability_enabled=False,  # Has alarm on API Gateway metrics
+        )
+
+        self.batch_get_queues = self._create_rest_lambda(
+            'BatchGetQueuesFunction',
+            overrides=overrides,
+            entry='functions/rest_api/batch_get_queues',
+            handler='batch_get_queues.handler',
+        )
+        self.dynamodb.tenant_resources_table.grant_read_data(self.batch_get_queues.function)
+
     def _create_rest_delete_queues(self):
         overrides = self.stack_inputs.lambdas.delete_queues
         overrides.alarms.set_defaults(
             availability_enabled=False,  # Has alarm on API Gateway metrics
         )
 
-        self.delete_queues = MonitoredLambda(
-            self,
+        self.delete_queues = self._create_rest_lambda(
             'DeleteQueuesFunction',
             overrides=overrides,
-            rest_api=True,
             entry='functions/rest_api/delete_queues',
             handler='delete_queues.handler',
         )
@@ -349,6 +412,11 @@ class Lambdas(constructs.Construct):
 
         stack_tags = json.dumps(self.stack_inputs.tags)
 
+        # Staged under its content hash, so stack operations reference it by URL instead of sending its body
+        tenant_stack_template = Asset(self,
+                                      'TenantStackTemplate',
+                                      path='functions/tenant_resources/deploy_stack/template.yaml')
+
         self.tenant_resources_deploy_stack = MonitoredLambda(
             self,
             'DeployTenantStack',
@@ -358,17 +426,22 @@ class Lambdas(constructs.Construct):
             environment={
                 **self.common_env,
                 'MANAGE_METADATA_ARN': self.tenant_resources_manage_metadata.alias.function_arn,
-                'PAGER_DUTY_ALARM_WARNING_TOPIC': self.cloudwatch.warning_topic.topic_arn
-                if self.cloudwatch.warning_topic else "",
                 'INBOUND_DLQ_ARN': self.common_dlqs.inbound_dlq.queue_arn,
                 'STACK_VERSION': self.tenant_resources_version,
                 'STACK_TAGS': stack_tags,
+                'TENANT_PROVISIONER': self.stack_inputs.tenant_resources.provisioner,
+                'TEMPLATE_URL': tenant_stack_template.http_url,
             },
             reserved_concurrent_executions=(overrides.reserved_concurrency or 2),
             timeout=Duration.seconds(30))
 
         # manage tenant cloudformation stacks
         self._grant_cloudformation_permission(self.tenant_resources_deploy_stack.function.role)
+        # CloudFormation reads the template with the caller's permissions
+        tenant_stack_template.grant_read(self.tenant_resources_deploy_stack.function.role)
+
+        # manage the metadata of tenants without a stack
+        self.dynamodb.tenant_resources_table.grant_read_write_data(self.tenant_resources_deploy_stack.function.role)
 
     def _create_tenant_resources_get_stack_status(self):
         overrides = self.stack_inputs.lambdas.tenant_resources_get_stack_status
@@ -392,6 +465,45 @@ class Lambdas(constructs.Construct):
                                     f':{self.stack.account}:stack/{self.stack.stack_name}*'
                                 ]))
 
+        # read and record typical stack durations, and register task tokens
+        self.dynamodb.tenant_resources_table.grant_read_write_data(role)
+
+        if self.stack_inputs.step_functions.event_driven_stack_completion:
+            # resume step functions whose stack settled before the task token was registered
+            role.add_to_policy(
+                iam.PolicyStatement(actions=['states:SendTaskSuccess'], resources=[self.state_machine_wildcard_arn]))
+
+    def _create_tenant_resources_stack_status_listener(self):
+        overrides = self.stack_inputs.lambdas.tenant_resources_stack_status_listener
+        overrides.alarms.set_defaults()
+
+        self.tenant_resources_stack_status_listener = MonitoredLambda(
+            self,
+            'TenantStackStatusListener',
+            overrides=overrides,
+            entry='functions/tenant_resources/stack_status_listener',
+            handler='stack_status_listener.handler',
+            reserved_concurrent_executions=(overrides.reserved_concurrency or 2))
+
+        role = self.tenant_resources_stack_status_listener.function.role
+        self.dynamodb.tenant_resources_table.grant_read_write_data(role)
+        role.add_to_policy(
+            iam.PolicyStatement(actions=['states:SendTaskSuccess'], resources=[self.state_machine_wildcard_arn]))
+
+        # CloudFormation publishes tenant stack status changes to the default bus
+        tenant_stack_id_prefix = f'arn:{self.stack.partition}:cloudformation:{self.stack.region}' \
+                                 f':{self.stack.account}:stack/{self.stack.stack_name}-'
+        stack_status_rule = Rule(self.stack,
+                                 'TenantStackStatusChangeRule',
+                                 event_pattern=EventPattern(source=['aws.cloudformation'],
+                                                            detail_type=['CloudFormation Stack Status Change'],
+                                                            detail={
+                                                                'stack-id': [{
+                                                                    'prefix': tenant_stack_id_prefix
+                                                                }],
+                                                            }))
+        stack_status_rule.add_target(LambdaFunction(handler=self.tenant_resources_stack_status_listener.alias))
+
     def _create_tenant_resources_destroy_stack(self):
         overrides = self.stack_inputs.lambdas.tenant_resources_destroy_stack
         overrides.alarms.set_defaults()
@@ -409,6 +521,213 @@ class Lambdas(constructs.Construct):
         # manage tenant cloudformation stacks
         self._grant_cloudformation_permission(self.tenant_resources_destroy_stack.function.role)
 
+        # delete the metadata of tenants without a stack
+        self.dynamodb.tenant_resources_table.grant_read_write_data(self.tenant_resources_destroy_stack.function.role)
+
+    def _create_tenant_resources_fill_warm_pool(self):
+        overrides = self.stack_inputs.lambdas.tenant_resources_fill_warm_pool
+        overrides.alarms.set_defaults()
+
+        self.tenant_resources_fill_warm_pool = MonitoredLambda(
+            self,
+            'FillWarmPool',
+            overrides=overrides,
+            entry='functions/tenant_resources/fill_warm_pool',
+            handler='fill_warm_pool.handler',
+            environment={
+                **self.common_env,
+                'INBOUND_DLQ_ARN': self.common_dlqs.inbound_dlq.queue_arn,
+                'STACK_VERSION': self.tenant_resources_version,
+                'STACK_TAGS': json.dumps(self.stack_inputs.tags),
+                'WARM_POOL_SIZE': str(self.stack_inputs.warm_pool.size),
+            },
+            reserved_concurrent_executions=(overrides.reserved_concurrency or 1),
+            timeout=Duration.minutes(5))
+
+        role = self.tenant_resources_fill_warm_pool.function.role
+        self.dynamodb.tenant_resources_table.grant_read_write_data(role)
+        role.add_to_policy(
+            iam.PolicyStatement(resources=[self.warm_pool_sqs_wildcard_arn],
+                                actions=[
+                                    'sqs:CreateQueue',
+                                    'sqs:DeleteQueue',
+                                    'sqs:GetQueueAttributes',
+                                    'sqs:GetQueueUrl',
+                                    'sqs:ListQueueTags',
+                                    'sqs:SetQueueAttributes',
+                                    'sqs:TagQueue',
+                                    'sqs:UntagQueue',
+                                ]))
+
+        fill_warm_pool_rule = Rule(self.stack,
+                                   'FillWarmPoolSchedule',
+                                   schedule=Schedule.rate(
+                                       Duration.minutes(self.stack_inputs.warm_pool.refill_interval_minutes)))
+        fill_warm_pool_rule.add_target(LambdaFunction(handler=self.tenant_resources_fill_warm_pool.alias))
+
+    def _create_tenant_resources_claim_pooled_queue(self):
+        overrides = self.stack_inputs.lambdas.tenant_resources_claim_pooled_queue
+        overrides.alarms.set_defaults()
+
+        self.tenant_resources_claim_pooled_queue = MonitoredLambda(
+            self,
+            'ClaimPooledQueue',
+            overrides=overrides,
+            entry='functions/tenant_resources/claim_pooled_queue',
+            handler='claim_pooled_queue.handler',
+            environment={
+                **self.common_env,
+                'STACK_TAGS': json.dumps(self.stack_inputs.tags),
+            },
+            reserved_concurrent_executions=(overrides.reserved_concurrency or 2))
+
+        role = self.tenant_resources_claim_pooled_queue.function.role
+        self.dynamodb.tenant_resources_table.grant_read_write_data(role)
+        role.add_to_policy(
+            iam.PolicyStatement(actions=['sqs:ListQueueTags', 'sqs:TagQueue', 'sqs:UntagQueue'],
+                                resources=[self.warm_pool_sqs_wildcard_arn]))
+
+    def _create_tenant_resources_queue_age_monitor(self):
+        overrides = self.stack_inputs.lambdas.tenant_resources_queue_age_monitor
+        overrides.alarms.set_defaults()
+        monitor_inputs = self.stack_inputs.queue_age_monitor
+
+        self.tenant_resources_queue_age_monitor = MonitoredLambda(
+            self,
+            'QueueAgeMonitor',
+            overrides=overrides,
+            entry='functions/tenant_resources/queue_age_monitor',
+            handler='queue_age_monitor.handler',
+            environment={
+                **self.common_env,
+                'AGE_THRESHOLD_SECONDS': str(monitor_inputs.age_threshold_seconds),
+                'WORST_OFFENDERS': str(monitor_inputs.worst_offenders),
+                'USE_VERSION_INDEX': '1' if self.stack_inputs.dynamodb.version_index_backfilled else '0',
+            },
+            reserved_concurrent_executions=(overrides.reserved_concurrency or 1),
+            timeout=Duration.minutes(5))
+
+        role = self.tenant_resources_queue_age_monitor.function.role
+        self.dynamodb.tenant_resources_table.grant_read_data(role)
+        # GetMetricData doesn't support resource-level permissions
+        role.add_to_policy(iam.PolicyStatement(actions=['cloudwatch:GetMetricData'], resources=['*']))
+
+        interval = Duration.minutes(monitor_inputs.interval_minutes)
+        queue_age_monitor_rule = Rule(self.stack, 'QueueAgeMonitorSchedule', schedule=Schedule.rate(interval))
+        queue_age_monitor_rule.add_target(LambdaFunction(handler=self.tenant_resources_queue_age_monitor.alias))
+
+        # Replaces the InboundQueueOldMessagesAlarm of each tenant stack
+        self.cloudwatch.add_warning_alarm(
+            'TenantInboundQueueOldMessages',
+            description='Alarm if the oldest message inbound to Learn is too old in any tenant queue. The '
+            'OldestMessageAge metrics and queue age monitor logs name the tenants.',
+            notify=monitor_inputs.notify,
+            metric=Metric(namespace=self.stack.stack_name,
+                          metric_name='MaxOldestMessageAge',
+                          dimensions_map={
+                              'Service': 'queue_age_monitor'
+                          },
+                          statistic='Maximum',
+                          period=interval),
+            evaluation_periods=1,
+            threshold=monitor_inputs.age_threshold_seconds,
+            comparison_operator=ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+            treat_missing_data=TreatMissingData.NOT_BREACHING,
+        )
+
+    def _create_tenant_resources_list_tenants_to_upgrade(self):
+        overrides = self.stack_inputs.lambdas.tenant_resources_list_tenants_to_upgrade
+        overrides.alarms.set_defaults()
+
+        self.tenant_resources_list_tenants_to_upgrade = MonitoredLambda(
+            self,
+            'ListTenantsToUpgrade',
+            overrides=overrides,
+            entry='functions/tenant_resources/list_tenants_to_upgrade',
+            handler='list_tenants_to_upgrade.handler',
+            environment={
+                **self.common_env,
+                'STACK_VERSION': self.tenant_resources_version,
+                'PAGE_SIZE': str(self.stack_inputs.fleet_upgrade.page_size),
+                'USE_VERSION_INDEX': '1' if self.stack_inputs.dynamodb.version_index_backfilled else '0',
+            },
+            reserved_concurrent_executions=(overrides.reserved_concurrency or 1),
+            timeout=Duration.minutes(1))
+
+        role = self.tenant_resources_list_tenants_to_upgrade.function.role
+        self.dynamodb.tenant_resources_table.grant_read_data(role)
+        # check legacy outbound queues for activity; GetMetricData doesn't support resource-level permissions
+        role.add_to_policy(iam.PolicyStatement(actions=['cloudwatch:GetMetricData'], resources=['*']))
+
+    def _create_tenant_resources_report_upgrade_progress(self):
+        overrides = self.stack_inputs.lambdas.tenant_resources_report_upgrade_progress
+        overrides.alarms.set_defaults()
+
+        self.tenant_resources_report_upgrade_progress = MonitoredLambda(
+            self,
+            'ReportUpgradeProgress',
+            overrides=overrides,
+            entry='functions/tenant_resources/report_upgrade_progress',
+            handler='report_upgrade_progress.handler',
+            environment={
+                **self.common_env,
+                'STACK_VERSION': self.tenant_resources_version,
+            },
+            reserved_concurrent_executions=(overrides.reserved_concurrency or 1),
+            timeout=Duration.minutes(1))
+
+        self.dynamodb.tenant_resources_table.grant_read_data(
+            self.tenant_resources_report_upgrade_progress.function.role)
+
+    def _create_tenant_resources_audit_sweeper(self):
+        overrides = self.stack_inputs.lambdas.tenant_resources_audit_sweeper
+        overrides.alarms.set_defaults()
+        sweeper_inputs = self.stack_inputs.audit_sweeper
+
+        self.tenant_resources_audit_sweeper = MonitoredLambda(
+            self,
+            'AuditSweeper',
+            overrides=overrides,
+            entry='functions/tenant_resources/audit_sweeper',
+            handler='audit_sweeper.handler',
+            environment={
+                **self.common_env,
+                'STALE_AFTER_MINUTES': str(sweeper_inputs.stale_after_minutes),
+            },
+            reserved_concurrent_executions=(overrides.reserved_concurrency or 1),
+            timeout=Duration.minutes(5))
+
+        role = self.tenant_resources_audit_sweeper.function.role
+        self.dynamodb.tenant_resources_table.grant_read_write_data(role)
+        role.add_to_policy(
+            iam.PolicyStatement(actions=['states:DescribeExecution'],
+                                resources=[
+                                    f'arn:{self.stack.partition}:states:{self.stack.region}:{self.stack.account}'
+                                    f':execution:{self.stack.stack_name}-*'
+                                ]))
+
+        interval = Duration.minutes(sweeper_inputs.interval_minutes)
+        audit_sweeper_rule = Rule(self.stack, 'AuditSweeperSchedule', schedule=Schedule.rate(interval))
+        audit_sweeper_rule.add_target(LambdaFunction(handler=self.tenant_resources_audit_sweeper.alias))
+
+        self.cloudwatch.add_warning_alarm(
+            'TenantExecutionsStuck',
+            description='Alarm if a tenant step function execution has been running for too long. The audit sweeper '
+            'logs name the executions.',
+            notify=sweeper_inputs.notify,
+            metric=Metric(namespace=self.stack.stack_name,
+                          metric_name='StaleExecutionsRunning',
+                          dimensions_map={
+                              'Service': 'audit_sweeper'
+                          },
+                          statistic='Maximum',
+                          period=interval),
+            evaluation_periods=1,
+            threshold=1,
+            comparison_operator=ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+            treat_missing_data=TreatMissingData.NOT_BREACHING,
+        )
+
     def _grant_cloudformation_permission(self, role):
         # manage the tenant stack
         role.add_to_policy(
@@ -480,8 +799,12 @@ class MonitoredLambda(constructs.Construct):
                  **kwargs):
         super().__init__(lambdas, _id)
 
-        if 'environment' not in kwargs:
-            kwargs['environment'] = lambdas.common_env
+        # Copy the environment, as it is often the shared common_env
+        kwargs['environment'] = dict(kwargs.get('environment', lambdas.common_env))
+        if overrides.log_level:
+            kwargs['environment']['LOG_LEVEL'] = overrides.log_level
+        if overrides.log_sample_rate is not None:
+            kwargs['environment']['LOG_SAMPLE_RATE'] = str(overrides.log_sample_rate)
         if 'timeout' not in kwargs:
             kwargs['timeout'] = Duration.seconds(10)
         if 'architecture' not in kwargs:
@@ -526,27 +849,7 @@ class MonitoredLambda(constructs.Construct):
                 alias_id = logical_id
         override_logical_id(self.alias, alias_id)
 
-        if lambdas.stack_inputs.lambdas.blue_green_deployment:
-            # Support blue-green deployments in production
-            if lambdas.stack.stage == 'prod':
-                deployment_config = LambdaDeploymentConfig.CANARY_10_PERCENT_10_MINUTES
-            else:
-                deployment_config = LambdaDeploymentConfig.ALL_AT_ONCE
-            self.deployment_group = LambdaDeploymentGroup(self,
-                                                          "BlueGreenDeploy",
-                                                          alias=self.alias,
-                                                          deployment_config=cast(LambdaDeploymentConfig,
-                                                                                 deployment_config))
-
-            overrides.deployment_group_error_rate_alarm_config.set_defaults(threshold=5,
-                                                                            evaluation_periods=1,
-                                                                            minimum_invocations=1)
-            self.deployment_group.add_alarm(
-                lambdas.cloudwatch.lambda_error_rate_alarm(
-                    self.alias, name=_id, alarm_config=overrides.deployment_group_error_rate_alarm_config))
-        else:
-            # Skip blue-green deployment in dev
-            self.deployment_group = None
+        self.deployment_group = _blue_green_deployment(self, lambdas, self.alias, _id, overrides)
 
         # Alarm if events attempted to be sent to dead letter queues but fail
         if kwargs.get('dead_letter_queue'):
@@ -556,3 +859,47 @@ class MonitoredLambda(constructs.Construct):
                                                      dlq_send_error_alarm_config=overrides.dlq_send_error_alarm_config)
 
         lambdas.alarms.monitor_lambda(self.function, overrides.alarms)
+
+
+class RestEndpointAlias(constructs.Construct):
+    """
+    Stands in for an endpoint's own function when the REST router serves every endpoint. Each endpoint gets an alias of
+    the router under the logical ID the OpenAPI spec references, which rolls out new versions like a MonitoredLambda's.
+    """
+    function: Function
+    alias: Alias
+    deployment_group: Optional[LambdaDeploymentGroup]
+
+    def __init__(self, lambdas: Lambdas, _id: str, *, router: MonitoredLambda, overrides: LambdaFunctionOverrides):
+        super().__init__(lambdas, _id)
+        self.function = router.function
+        self.alias = Alias(self, 'Alias', alias_name=_id, version=router.function.current_version)
+        override_logical_id(self.alias, f'{_id}Alias')
+        self.deployment_group = _blue_green_deployment(self, lambdas, self.alias, _id, overrides)
+        lambdas.rest_apis.append(self)
+
+
+def _blue_green_deployment(scope: constructs.Construct, lambdas: Lambdas, alias: Alias, _id: str,
+                           overrides: LambdaFunctionOverrides) -> Optional[LambdaDeploymentGroup]:
+    if not lambdas.stack_inputs.lambdas.blue_green_deployment:
+        # Skip blue-green deployment in dev
+        return None
+
+    # Support blue-green deployments in production
+    if lambdas.stack.stage == 'prod':
+        deployment_config = LambdaDeploymentConfig.CANARY_10_PERCENT_10_MINUTES
+    else:
+        deployment_config = LambdaDeploymentConfig.ALL_AT_ONCE
+    deployment_group = LambdaDeploymentGroup(scope,
+                                             "BlueGreenDeploy",
+                                             alias=alias,
+                                             deployment_config=cast(LambdaDeploymentConfig, deployment_config))
+
+    overrides.deployment_group_error_rate_alarm_config.set_defaults(threshold=5,
+                                                                    evaluation_periods=1,
+                                                                    minimum_invocations=1)
+    deployment_group.add_alarm(
+        lambdas.cloudwatch.lambda_error_rate_alarm(alias,
+                                                   name=_id,
+                                                   alarm_config=overrides.deployment_group_error_rate_alarm_config))
+    return deployment_group
@@ -11,6 +11,12 @@ class GetQueueFunctionOverrides(LambdaFunctionOverrides):
     skip_tenant_api_errors: bool = False
 
 
+@dataclass
+class RestRouterOverrides(LambdaFunctionOverrides):
+    # Serve every REST endpoint from one function, so they share warm containers, rather than a function each
+    enabled: bool = False
+
+
 @dataclass
 class EventHandlerOverrides(LambdaEventFunctionOverrides):
     # Visibility timeout should be set in conjunction with LambdaEventFunctionOverrides.timeout_seconds
@@ -27,7 +33,9 @@ class LambdasOverrides(CoreLambdasOverrides):
     # Function-specific overrides
     get_queue: GetQueueFunctionOverrides = field(default_factory=GetQueueFunctionOverrides)
     get_queues: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
+    batch_get_queues: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
     delete_queues: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
+    rest_router: RestRouterOverrides = field(default_factory=RestRouterOverrides)
     eventbridge_to_sqs: LambdaEventFunctionOverrides = field(default_factory=LambdaEventFunctionOverrides)
     sqs_to_eventbridge: EventHandlerOverrides = field(default_factory=EventHandlerOverrides)
     tenant_event_handler: EventHandlerOverrides = field(default_factory=EventHandlerOverrides)
@@ -35,6 +43,13 @@ class LambdasOverrides(CoreLambdasOverrides):
     tenant_resources_destroy_stack: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
     tenant_resources_get_stack_status: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
     tenant_resources_manage_metadata: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
+    tenant_resources_stack_status_listener: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
+    tenant_resources_fill_warm_pool: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
+    tenant_resources_claim_pooled_queue: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
+    tenant_resources_queue_age_monitor: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
+    tenant_resources_list_tenants_to_upgrade: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
+    tenant_resources_report_upgrade_progress: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
+    tenant_resources_audit_sweeper: LambdaFunctionOverrides = field(default_factory=LambdaFunctionOverrides)
 
 
 @dataclass
@@ -56,9 +71,83 @@ class EventBridgeOverrides:
     enable_archive: bool = True
 
 
+@dataclass
+class StepFunctionsOverrides:
+    # Wait for CloudFormation stack status change events instead of polling tenant stacks at a fixed interval
+    event_driven_stack_completion: bool = False
+    # How long to wait for a stack status change event before falling back to polling
+    stack_completion_timeout_minutes: int = 15
+
+
+@dataclass
+class TenantResourcesOverrides:
+    # How new tenants' inbound queues are created: 'CloudFormation' deploys a stack per tenant, while 'Direct' creates
+    # the queue and its metadata through the SQS and DynamoDB APIs. Existing tenants keep the provisioner they have.
+    provisioner: str = 'CloudFormation'
+
+
+@dataclass
+class WarmPoolOverrides:
+    # Number of unassigned inbound queues to keep ready for new tenants. 0 disables the warm pool.
+    size: int = 0
+    # How often the pool is topped up
+    refill_interval_minutes: int = 5
+
+
+@dataclass
+class QueueAgeMonitorOverrides:
+    # Tenant inbound queues whose oldest message is at least this old are over the threshold
+    age_threshold_seconds: int = 21600
+    # How often the ages of all tenant inbound queues are checked
+    interval_minutes: int = 5
+    # Number of queues over the threshold, oldest first, to publish a per-tenant metric for
+    worst_offenders: int = 5
+    # Whether the alarm notifies PagerDuty. The per-tenant alarms it replaces had notifications disabled due to false
+    # alerts.
+    notify: bool = False
+
+
+@dataclass
+class FleetUpgradeOverrides:
+    # Number of tenants upgraded at once. Above about 30, CloudFormation starts throttling tenant stack updates.
+    max_concurrency: int = 30
+    # Percentage of a page's tenant upgrades that may fail before the fleet upgrade stops
+    tolerated_failure_percentage: int = 10
+    # Number of table rows read for each page of tenants to upgrade
+    page_size: int = 1000
+
+
+@dataclass
+class AuditSweeperOverrides:
+    # Audit rows still in progress this long after they were last updated are checked against their execution. Tenant
+    # stacks take a few minutes to create, update or delete, so this leaves plenty of room for slow ones.
+    stale_after_minutes: int = 60
+    # How often stale audit rows are looked for
+    interval_minutes: int = 15
+    # Whether the alarm on executions running past stale_after_minutes notifies PagerDuty
+    notify: bool = False
+
+
+@dataclass
+class DynamodbOverrides:
+    # Read tenants from the VersionIndex instead of scanning the table. Enable only once dynamodb_metadata_cleanup.py
+    # has backfilled MetadataVersion, as tenants without it are missing from the index. See docs/Database.md.
+    version_index_backfilled: bool = False
+    # Adds the InFlightIndex and the audit sweeper that reads it. CloudFormation adds only one global secondary index per
+    # table update, so enable this in a later deploy than the one creating the VersionIndex. See docs/Database.md.
+    in_flight_index: bool = False
+
+
 @dataclass
 class StackInputs(CoreStackInputs):
     lambdas: LambdasOverrides = field(default_factory=LambdasOverrides)
+    step_functions: StepFunctionsOverrides = field(default_factory=StepFunctionsOverrides)
+    tenant_resources: TenantResourcesOverrides = field(default_factory=TenantResourcesOverrides)
+    warm_pool: WarmPoolOverrides = field(default_factory=WarmPoolOverrides)
+    queue_age_monitor: QueueAgeMonitorOverrides = field(default_factory=QueueAgeMonitorOverrides)
+    fleet_upgrade: FleetUpgradeOverrides = field(default_factory=FleetUpgradeOverrides)
+    audit_sweeper: AuditSweeperOverrides = field(default_factory=AuditSweeperOverrides)
+    dynamodb: DynamodbOverrides = field(default_factory=DynamodbOverrides)
 
     eventbridge: EventBridgeOverrides = field(default_factory=EventBridgeOverrides)
     tests: TestOverrides = field(default_factory=TestOverrides)
@@ -4,10 +4,11 @@ from typing import Mapping, Optional, cast
 import constructs
 from aws_cdk import Duration
 from aws_cdk.aws_dynamodb import ITable, Table
-from aws_cdk.aws_stepfunctions import Choice, Condition, DefinitionBody, Fail, IChainable, JsonPath, Pass, StateMachine, \
-    Succeed, TaskInput, Wait, WaitTime
+from aws_cdk.aws_stepfunctions import Choice, Condition, DefinitionBody, DistributedMap, Fail, IChainable, \
+    IntegrationPattern, JsonPath, Pass, StateMachine, StateMachineType, Succeed, TaskInput, Timeout, Wait, \
+    WaitTime
 from aws_cdk.aws_stepfunctions_tasks import DynamoAttributeValue, DynamoGetItem, DynamoPutItem, DynamoUpdateItem, \
-    LambdaInvoke
+    LambdaInvoke, StepFunctionsStartExecution
 from bb_fnds.cdk_constructs import pipeline_forge
 
 from cdk.dynamodb import Dynamodb
@@ -21,8 +22,10 @@ class StepFunctions(constructs.Construct):
         self.stack = stack
 
         self._define_create_step(lambdas, dynamodb, stack_inputs)
-        self._define_update_step(lambdas, dynamodb, stack_inputs)
+        update_step_function = self._define_update_step(lambdas, dynamodb, stack_inputs)
         self._define_delete_step(lambdas, dynamodb, stack_inputs)
+        FleetUpgradeStepFunction(self, 'FleetUpgradeStep', self.stack, stack_inputs, lambdas,
+                                 update_step_function.state_machine)
 
     def _define_create_step(self, lambdas, dynamodb, stack_inputs):
         step_function = CreateTenantResourceStepFunction(self, 'CreateResourcesStep', self.stack, stack_inputs, lambdas,
@@ -34,8 +37,8 @@ class StepFunctions(constructs.Construct):
                                                    value=step_function.state_machine.state_machine_arn)
 
     def _define_update_step(self, lambdas, dynamodb, stack_inputs):
-        UpdateTenantResourceStepFunction(self, 'UpdateResourcesStep', self.stack, stack_inputs, lambdas,
-                                         dynamodb.tenant_resources_table)
+        return UpdateTenantResourceStepFunction(self, 'UpdateResourcesStep', self.stack, stack_inputs, lambdas,
+                                                dynamodb.tenant_resources_table)
 
     def _define_delete_step(self, lambdas, dynamodb, stack_inputs):
         delete_tenant_resources_step = DeleteTenantResourceStepFunction(self, 'DeleteResourcesStep', self.stack,
@@ -92,7 +95,10 @@ class TenantResourceStepFunction(constructs.Construct):
                              }),
                              result_path="$.GetTenantMetadata")
 
-    def create_audit_row(self, audit_sort_key: str, dynamic_params: Optional[dict[str, str]] = None):
+    def create_audit_row(self,
+                         function_type: TenantResourceStepFunctionType,
+                         audit_sort_key: str,
+                         dynamic_params: Optional[dict[str, str]] = None):
         if not dynamic_params:
             dynamic_params = {}
 
@@ -109,6 +115,8 @@ class TenantResourceStepFunction(constructs.Construct):
                 "UpdatedAt": JsonPath.string_at("$$.State.EnteredTime"),
                 "Execution": JsonPath.string_at("$$.Execution.Id"),
                 "Version": self.lambdas.tenant_resources_version,
+                # Puts the row in the InFlightIndex until update_audit_row records the outcome
+                "InFlight": function_type.name,
                 **dynamic_params
             }),
             result_path="$.PutItemOutput",
@@ -137,7 +145,7 @@ class TenantResourceStepFunction(constructs.Construct):
                 "pk": JsonPath.string_at("$.tenantPk"),
                 "sk": audit_sort_key
             }),
-            update_expression="SET #status = :status, UpdatedAt = :updatedAt",
+            update_expression="SET #status = :status, UpdatedAt = :updatedAt REMOVE InFlight",
             expression_attribute_names={
                 "#status": "Status"
             },
@@ -160,6 +168,77 @@ class TenantResourceStepFunction(constructs.Construct):
         failure_build_audit = self.update_audit_row(audit_sort_key, "Failure").next(self.failure_step)
         return success_build_audit, failure_build_audit
 
+    def wait_for_stack(self, function_type: TenantResourceStepFunctionType, stack_name_path: str,
+                       default_poll_interval: Duration, validate_status: Choice,
+                       failure_build_audit: IChainable) -> IChainable:
+        """
+        Waits for the tenant stack to change, then moves on to validate_status, which loops back to the wait until the
+        stack has settled. Each check recommends how long to wait before the next one, based on how long the stack
+        operation typically takes.
+
+        With event-driven stack completion, the execution is resumed by the stack status listener as soon as CloudFormation
+        reports the stack has settled. Polling is only used if that fails or times out.
+        """
+        get_stack_status = LambdaInvoke(self,
+                                        'GetStackStatus',
+                                        lambda_function=self.lambdas.tenant_resources_get_stack_status.alias,
+                                        payload=TaskInput.from_object({
+                                            'stackName': JsonPath.string_at(stack_name_path),
+                                            'tenantId': JsonPath.string_at('$.tenantId'),
+                                            'execution': JsonPath.string_at('$$.Execution.Id'),
+                                            'operation': function_type.name,
+                                            'startedAt': JsonPath.string_at('$$.Execution.StartTime'),
+                                            'defaultPollSeconds': default_poll_interval.to_seconds(),
+                                        }),
+                                        result_path='$.GetStackStatus')
+        self._add_lambda_retry(get_stack_status, failure_build_audit)
+
+        wait_for_stack = Wait(self, 'Sleep', time=WaitTime.seconds_path('$.GetStackStatus.Payload.nextPollSeconds'))
+        validate_status.otherwise(wait_for_stack)
+
+        # noinspection PyTypeChecker
+        poll_stack_status: IChainable = get_stack_status.next(validate_status)
+        wait_for_stack.next(get_stack_status)
+
+        step_functions_inputs = self.stack_inputs.step_functions
+        if not step_functions_inputs.event_driven_stack_completion:
+            return poll_stack_status
+
+        wait_for_status_change = LambdaInvoke(
+            self,
+            'WaitForStackStatusChange',
+            lambda_function=self.lambdas.tenant_resources_get_stack_status.alias,
+            integration_pattern=IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+            payload=TaskInput.from_object({
+                'stackName': JsonPath.string_at(stack_name_path),
+                'tenantId': JsonPath.string_at('$.tenantId'),
+                'execution': JsonPath.string_at('$$.Execution.Id'),
+                'operation': function_type.name,
+                'startedAt': JsonPath.string_at('$$.Execution.StartTime'),
+                'taskToken': JsonPath.task_token,
+            }),
+            # Shape the task output like a synchronous GetStackStatus invocation, so validate_status can handle both
+            result_selector={
+                'Payload.$': '$'
+            },
+            result_path='$.GetStackStatus',
+            task_timeout=Timeout.duration(Duration.minutes(step_functions_inputs.stack_completion_timeout_minutes)))
+
+        # Missing a status change event must not fail the execution, so fall back to polling on any error
+        wait_for_status_change.add_catch(handler=get_stack_status,
+                                         errors=['States.ALL'],
+                                         result_path='$.WaitForStackStatusChange')
+
+        return wait_for_status_change.next(validate_status)
+
+    def validate_stack(self, stack_id_path: str, wait_for_stack: IChainable, success_build_audit: IChainable) -> Choice:
+        """ Directly provisioned tenants have no stack, so there is nothing to wait for """
+        validate_stack = Choice(self, 'ValidateStack')
+        validate_stack.when(Condition.and_(Condition.is_present(stack_id_path), Condition.is_null(stack_id_path)),
+                            success_build_audit)
+        validate_stack.otherwise(wait_for_stack)
+        return validate_stack
+
     def generate_state_machine(self, _id: str, definition: IChainable, function_type: TenantResourceStepFunctionType):
         self.state_machine = StateMachine(self,
                                           "StateMachine",
@@ -194,8 +273,9 @@ class CreateTenantResourceStepFunction(TenantResourceStepFunction):
 
         parse_input = self.parse_input()
 
-        started_build_audit = self.create_audit_row(audit_sort_key, {
-            "RetryCount": JsonPath.string_at("$.currentCount"),
+        # RetryCount is the number of attempts made, including this one, so each retry is numbered after the last
+        started_build_audit = self.create_audit_row(function_type, audit_sort_key, {
+            "RetryCount": JsonPath.string_at("$.retryCount"),
             "ClientId": JsonPath.string_at("$.clientId"),
         })
         success_build_audit, failure_build_audit = self.end_state_audit_handlers(audit_sort_key)
@@ -210,35 +290,57 @@ class CreateTenantResourceStepFunction(TenantResourceStepFunction):
                                            result_path='$.CreateTenantStack')
         self._add_lambda_retry(create_tenant_stack, failure_build_audit)
 
-        wait_for_create: IChainable = cast(IChainable, Wait(self, 'Sleep',
-                                                            time=WaitTime.duration(Duration.seconds(15))))
-
-        get_stack_status = LambdaInvoke(self,
-                                        'GetStackStatus',
-                                        lambda_function=lambdas.tenant_resources_get_stack_status.alias,
-                                        payload=TaskInput.from_object({
-                                            'stackName': JsonPath.string_at('$.CreateTenantStack.Payload.stackId'),
-                                        }),
-                                        result_path='$.GetStackStatus')
-        self._add_lambda_retry(get_stack_status, failure_build_audit)
-
         validate_status = Choice(self, 'ValidateStatus')
         validate_status.when(Condition.boolean_equals('$.GetStackStatus.Payload.isFailure', True), failure_build_audit)
         validate_status.when(Condition.string_equals('$.GetStackStatus.Payload.status', 'DELETE_COMPLETE'),
                              failure_build_audit)
         validate_status.when(Condition.boolean_equals('$.GetStackStatus.Payload.isComplete', True), success_build_audit)
-        validate_status.otherwise(wait_for_create)
+
+        wait_for_create = self.wait_for_stack(function_type, '$.CreateTenantStack.Payload.stackId',
+                                              Duration.seconds(15), validate_status, failure_build_audit)
+
+        create_tenant_stack.next(
+            self.validate_stack('$.CreateTenantStack.Payload.stackId', wait_for_create, success_build_audit))
 
         # noinspection PyTypeChecker
         definition: IChainable = parse_input\
             .next(started_build_audit)\
-            .next(create_tenant_stack)\
-            .next(wait_for_create)\
-            .next(get_stack_status)\
-            .next(validate_status)
+            .next(self.claim_pooled_queue(create_tenant_stack, success_build_audit, failure_build_audit)
+                  if stack_inputs.warm_pool.size else create_tenant_stack)
 
         self.generate_state_machine(_id, definition, function_type)
 
+    def claim_pooled_queue(self, create_tenant_stack: IChainable, success_build_audit: IChainable,
+                           failure_build_audit: IChainable) -> IChainable:
+        """ Assigns the tenant a queue from the warm pool, only creating a stack if the pool is empty """
+        claim_pooled_queue = LambdaInvoke(self,
+                                          'ClaimPooledQueue',
+                                          lambda_function=self.lambdas.tenant_resources_claim_pooled_queue.alias,
+                                          payload=TaskInput.from_object({
+                                              'tenantId': JsonPath.string_at('$.tenantId'),
+                                              'clientId': JsonPath.string_at('$.clientId'),
+                                          }),
+                                          result_path='$.ClaimPooledQueue')
+        # Once the tenant holds a pooled queue, a stack would leave that queue orphaned. A retry claims the same queue.
+        claim_pooled_queue.add_retry(errors=['PooledQueueRetagFailed'],
+                                     interval=Duration.seconds(5),
+                                     max_attempts=5,
+                                     backoff_rate=2)
+        claim_pooled_queue.add_retry(interval=Duration.seconds(5), max_attempts=2)
+        claim_pooled_queue.add_catch(handler=failure_build_audit,
+                                     errors=['PooledQueueRetagFailed'],
+                                     result_path='$.Failure')
+        # Otherwise the pool is only an optimisation, so fall back to creating a stack on any error
+        claim_pooled_queue.add_catch(handler=create_tenant_stack,
+                                     errors=['States.ALL'],
+                                     result_path='$.ClaimPooledQueueError')
+
+        validate_claim = Choice(self, 'ValidateClaim')
+        validate_claim.when(Condition.boolean_equals('$.ClaimPooledQueue.Payload.claimed', True), success_build_audit)
+        validate_claim.otherwise(create_tenant_stack)
+
+        return claim_pooled_queue.next(validate_claim)
+
 
 class UpdateTenantResourceStepFunction(TenantResourceStepFunction):
     def __init__(self, scope: constructs.Construct, _id: str, stack: pipeline_forge.Stack, stack_inputs: StackInputs,
@@ -251,7 +353,7 @@ class UpdateTenantResourceStepFunction(TenantResourceStepFunction):
         parse_input = self.parse_input()
         get_tenant_metadata = self.get_tenant_metadata()
 
-        started_build_audit = self.create_audit_row(audit_sort_key)
+        started_build_audit = self.create_audit_row(function_type, audit_sort_key)
         success_build_audit, failure_build_audit = self.end_state_audit_handlers(audit_sort_key)
 
         update_tenant_stack = LambdaInvoke(self,
@@ -265,29 +367,20 @@ class UpdateTenantResourceStepFunction(TenantResourceStepFunction):
                                            result_path='$.UpdateTenantStack')
         self._add_lambda_retry(update_tenant_stack, failure_build_audit)
 
-        wait_for_update: IChainable = cast(IChainable, Wait(self, 'Sleep',
-                                                            time=WaitTime.duration(Duration.seconds(15))))
-
-        get_stack_status = LambdaInvoke(self,
-                                        'GetStackStatus',
-                                        lambda_function=lambdas.tenant_resources_get_stack_status.alias,
-                                        payload=TaskInput.from_object({
-                                            'stackName': JsonPath.string_at('$.UpdateTenantStack.Payload.stackName'),
-                                        }),
-                                        result_path='$.GetStackStatus')
-        self._add_lambda_retry(get_stack_status, failure_build_audit)
-
         validate_status = Choice(self, 'ValidateStatus')
         validate_status.when(Condition.boolean_equals('$.GetStackStatus.Payload.isFailure', True), failure_build_audit)
         validate_status.when(Condition.boolean_equals('$.GetStackStatus.Payload.isComplete', True), success_build_audit)
-        validate_status.otherwise(wait_for_update)
+
+        wait_for_update = self.wait_for_stack(function_type, '$.UpdateTenantStack.Payload.stackName',
+                                              Duration.seconds(15), validate_status, failure_build_audit)
+
+        validate_stack = self.validate_stack('$.UpdateTenantStack.Payload.stackId', wait_for_update,
+                                             success_build_audit)
 
         # noinspection PyTypeChecker
         run_upgrade: IChainable = started_build_audit\
             .next(update_tenant_stack)\
-            .next(wait_for_update)\
-            .next(get_stack_status)\
-            .next(validate_status)
+            .next(validate_stack)
 
         validate_version = Choice(self, 'ValidateVersion')
         validate_version.when(
@@ -314,7 +407,7 @@ class DeleteTenantResourceStepFunction(TenantResourceStepFunction):
         parse_input = self.parse_input()
         get_tenant_metadata = self.get_tenant_metadata()
 
-        started_build_audit = self.create_audit_row(audit_sort_key)
+        started_build_audit = self.create_audit_row(function_type, audit_sort_key)
         success_build_audit, failure_build_audit = self.end_state_audit_handlers(audit_sort_key)
 
         delete_tenant_stack = LambdaInvoke(self,
@@ -326,31 +419,133 @@ class DeleteTenantResourceStepFunction(TenantResourceStepFunction):
                                            result_path='$.DeleteTenantStack')
         self._add_lambda_retry(delete_tenant_stack, failure_build_audit)
 
-        wait_for_delete: IChainable = cast(IChainable, Wait(self, 'Sleep',
-                                                            time=WaitTime.duration(Duration.seconds(30))))
-
-        get_stack_status = LambdaInvoke(self,
-                                        'GetStackStatus',
-                                        lambda_function=lambdas.tenant_resources_get_stack_status.alias,
-                                        payload=TaskInput.from_object({
-                                            'stackName': JsonPath.string_at('$.DeleteTenantStack.Payload.stackName'),
-                                        }),
-                                        result_path='$.GetStackStatus')
-        self._add_lambda_retry(get_stack_status, failure_build_audit)
-
         validate_status = Choice(self, 'ValidateStatus')
         validate_status.when(Condition.boolean_equals('$.GetStackStatus.Payload.isFailure', True), failure_build_audit)
         validate_status.when(Condition.string_equals('$.GetStackStatus.Payload.status', 'DELETE_COMPLETE'),
                              success_build_audit)
-        validate_status.otherwise(wait_for_delete)
+
+        wait_for_delete = self.wait_for_stack(function_type, '$.DeleteTenantStack.Payload.stackName',
+                                              Duration.seconds(30), validate_status, failure_build_audit)
+
+        validate_stack = self.validate_stack('$.DeleteTenantStack.Payload.stackId', wait_for_delete,
+                                             success_build_audit)
 
         # noinspection PyTypeChecker
         definition: IChainable = parse_input\
             .next(get_tenant_metadata)\
             .next(started_build_audit)\
             .next(delete_tenant_stack)\
-            .next(wait_for_delete)\
-            .next(get_stack_status)\
-            .next(validate_status)
+            .next(validate_stack)
 
         self.generate_state_machine(_id, definition, function_type)
+
+
+class FleetUpgradeStepFunction(constructs.Construct):
+    """
+    Upgrades every tenant behind the current stack version, a page of tenants at a time. Each page is a distributed
+    map running the update step function for its tenants, and stops the fleet upgrade if too many of them fail.
+    Progress is published as metrics after each page, and the running totals are the execution's output.
+    """
+    state_machine: StateMachine
+
+    def __init__(self, scope: constructs.Construct, _id: str, stack: pipeline_forge.Stack, stack_inputs: StackInputs,
+                 lambdas: Lambdas, update_state_machine: StateMachine):
+        super().__init__(scope, _id)
+        fleet_upgrade_inputs = stack_inputs.fleet_upgrade
+
+        initialize_progress = Pass(self,
+                                   'InitializeProgress',
+                                   parameters={
+                                       'progress': {
+                                           'upgraded': 0,
+                                           'failed': 0,
+                                           'incomplete': 0,
+                                           'skipped': 0,
+                                           'pages': 0,
+                                       }
+                                   })
+
+        list_tenants = LambdaInvoke(self,
+                                    'ListTenantsToUpgrade',
+                                    lambda_function=lambdas.tenant_resources_list_tenants_to_upgrade.alias,
+                                    payload_response_only=True,
+                                    result_path='$.page')
+        list_tenants.add_retry(interval=Duration.seconds(5), max_attempts=5)
+
+        upgrade_tenant = StepFunctionsStartExecution(
+            self,
+            'UpgradeTenant',
+            state_machine=update_state_machine,
+            integration_pattern=IntegrationPattern.RUN_JOB,
+            associate_with_parent=True,
+            input=TaskInput.from_object({
+                'tenantId': JsonPath.string_at('$.tenantId'),
+            }),
+            # Keep the map's results small, as they are discarded anyway
+            result_selector={
+                'status.$': '$.Status'
+            })
+        upgrade_tenant.add_retry(
+            errors=['StepFunctions.ExecutionLimitExceeded', 'StepFunctions.AWSStepFunctionsException'],
+            interval=Duration.seconds(5),
+            backoff_rate=2,
+            max_attempts=5)
+
+        upgrade_tenants = DistributedMap(self,
+                                         'UpgradeTenants',
+                                         items_path='$.page.tenantIds',
+                                         item_selector={
+                                             'tenantId.$': '$$.Map.Item.Value'
+                                         },
+                                         max_concurrency=fleet_upgrade_inputs.max_concurrency,
+                                         tolerated_failure_percentage=fleet_upgrade_inputs.tolerated_failure_percentage,
+                                         map_execution_type=StateMachineType.STANDARD,
+                                         result_path=JsonPath.DISCARD)
+        upgrade_tenants.item_processor(upgrade_tenant)
+
+        report_progress = self._report_progress('ReportUpgradeProgress', lambdas)
+
+        next_page = Pass(self, 'NextPage', parameters={
+            'progress.$': '$.progress',
+            'nextKey.$': '$.page.nextKey',
+        })
+        next_page.next(list_tenants)
+
+        more_pages = Choice(self, 'MorePages')
+        more_pages.when(Condition.and_(Condition.is_present('$.page.nextKey'), Condition.is_not_null('$.page.nextKey')),
+                        next_page)
+        more_pages.otherwise(Succeed(self, 'Success', output_path='$.progress'))
+
+        # Still report the page, so the failures show up in the metrics, before stopping the fleet upgrade
+        too_many_failures = self._report_progress('ReportFailedPageProgress', lambdas)\
+            .next(Fail(self, 'TooManyFailures', cause='Too many tenant upgrades failed, see the UpgradeTenants map run'))
+        upgrade_tenants.add_catch(handler=too_many_failures,
+                                  errors=['States.ExceedToleratedFailureThreshold'],
+                                  result_path='$.UpgradeTenantsError')
+
+        # noinspection PyTypeChecker
+        definition: IChainable = initialize_progress\
+            .next(list_tenants)\
+            .next(upgrade_tenants)\
+            .next(report_progress)\
+            .next(more_pages)
+
+        self.state_machine = StateMachine(self,
+                                          'StateMachine',
+                                          definition_body=DefinitionBody.from_chainable(definition),
+                                          state_machine_name=f'{stack.stack_name}-upgrade-fleet',
+                                          tracing_enabled=True)
+
+    def _report_progress(self, _id: str, lambdas: Lambdas) -> LambdaInvoke:
+        report_progress = LambdaInvoke(self,
+                                       _id,
+                                       lambda_function=lambdas.tenant_resources_report_upgrade_progress.alias,
+                                       payload=TaskInput.from_object({
+                                           'tenantIds': JsonPath.list_at('$.page.tenantIds'),
+                                           'skipped': JsonPath.number_at('$.page.skipped'),
+                                           'progress': JsonPath.object_at('$.progress'),
+                                       }),
+                                       payload_response_only=True,
+                                       result_path='$.progress')
+        report_progress.add_retry(interval=Duration.seconds(5), max_attempts=5)
+        return report_progress
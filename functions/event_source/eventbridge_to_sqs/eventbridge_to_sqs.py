@@ -1,7 +1,8 @@
 import json
 import os
 import re
-from typing import MutableMapping, cast
+from datetime import datetime, timezone
+from typing import MutableMapping, Optional, cast
 
 import boto3
 from aws_lambda_powertools import Tracer
@@ -10,15 +11,27 @@ from aws_lambda_powertools.utilities.typing import LambdaContext
 from bb_ent_data_services_shared.lambdas.logger import logger
 from cachetools import TTLCache
 
+from common.data.message_encoding import decode_message_body, encode_message_body
 from common.data.queues import Queue, QueueType, StepFunctionAction, get_queue, get_status_and_retry_information
+from common.dates import format_iso8601_date, milliseconds_between, parse_iso8601_date
+from common.heavy_hitters import HeavyHitters
+from common.metrics import MetricUnit, Metrics
+from common.sampled_logging import SampledLogger
 
 xray_tracer = Tracer()
+metrics = Metrics(service='eventbridge_to_sqs')
+heavy_hitters = HeavyHitters(metrics)
+sampled_logger = SampledLogger()
 
 sqs_client = boto3.client('sqs')
 dynamodb = boto3.resource('dynamodb')
 TABLE_NAME = os.environ['TABLE_NAME']
 table = dynamodb.Table(TABLE_NAME)
 
+# Message attributes stamped on every event delivered to a tenant queue, so consumers can measure end-to-end latency
+EVENT_TIME_ATTRIBUTE = 'EventTime'
+DELIVERED_AT_ATTRIBUTE = 'DeliveredAt'
+
 queue_cache: MutableMapping[str, Queue] = TTLCache(maxsize=256, ttl=300)
 events_ignored_when_queue_missing = cast(dict[str, list[str]],
                                          json.loads(os.getenv('EVENTS_IGNORED_WHEN_QUEUE_MISSING', '{}')))
@@ -26,6 +39,9 @@ events_ignored_when_queue_missing = cast(dict[str, list[str]],
 
 @xray_tracer.capture_lambda_handler
 @logger.inject_lambda_context(correlation_id_path=correlation_paths.EVENT_BRIDGE)
+@metrics.log_metrics
+@heavy_hitters.flush_periodically
+@sampled_logger.summarize
 def handler(event: dict, _context: LambdaContext):
     logger.debug('Received event: %s', event)
 
@@ -42,7 +58,7 @@ def handler(event: dict, _context: LambdaContext):
         raise Exception(f"Can't handle event {event}")
 
 
-def _handle_eventbridge_event(event):
+def _handle_eventbridge_event(event, replayed: bool = False):
     # Look for the tenantId to know which SQS to forward the message to.
     detail = event['detail']
     tenant_id = detail.get('tenantId') or \
@@ -51,8 +67,10 @@ def _handle_eventbridge_event(event):
     if not tenant_id:
         raise RuntimeError('No tenantId is associated to the event')
 
+    metrics.add_count('Events', dimensions=_event_dimensions(event))
+
     # Obtain the queue to which the event should be sent.
-    queue = _get_tenant_queue(tenant_id)
+    queue, cache_hit = _get_tenant_queue(tenant_id)
 
     # No queue exists actually.
     if not queue:
@@ -68,7 +86,8 @@ def _handle_eventbridge_event(event):
 
     # Queue exists then send the message to that queue.
     try:
-        sqs_client.send_message(QueueUrl=queue.url, MessageBody=json.dumps(event))
+        with metrics.timer('SendMessageTime'):
+            delivered_at = _send_message(queue, event)
     except:
         # Remove queue from the cache just in case
         logger.info('Removing cached queue for %s', tenant_id)
@@ -85,17 +104,66 @@ def _handle_eventbridge_event(event):
         # Unknown failure
         raise
 
+    # Replayed events have spent an arbitrary time in the dead-letter queue and would skew delivery latency
+    if not replayed and 'time' in event:
+        metrics.add_sample('DeliveryLatency',
+                           milliseconds_between(delivered_at, parse_iso8601_date(event['time'])),
+                           MetricUnit.MILLISECONDS,
+                           dimensions={
+                               **_event_dimensions(event),
+                               'CacheHit': str(cache_hit),
+                           })
+
+
+def _event_dimensions(event: dict) -> dict[str, str]:
+    return {
+        'Source': event.get('source', 'Unknown'),
+        'DetailType': event.get('detail-type', 'Unknown'),
+    }
+
+
+def _send_message(queue: Queue, event: dict) -> datetime:
+    """
+    Sends the event to the tenant queue, stamped with the time the event was created and the time it was delivered.
+
+    :return: the delivery time
+    """
+    delivered_at = datetime.now(timezone.utc)
+    body, attributes = encode_message_body(json.dumps(event), queue.encoding)
+    attributes[DELIVERED_AT_ATTRIBUTE] = _string_attribute(format_iso8601_date(delivered_at))
+    if 'time' in event:
+        attributes[EVENT_TIME_ATTRIBUTE] = _string_attribute(event['time'])
+
+    sqs_client.send_message(QueueUrl=queue.url, MessageBody=body, MessageAttributes=attributes)
+    heavy_hitters.record(queue.tenant_id, len(body))
+    return delivered_at
+
+
+def _string_attribute(value: str) -> dict:
+    return {
+        'DataType': 'String',
+        'StringValue': value,
+    }
+
 
-def _get_tenant_queue(tenant_id: str):
-    if tenant_id in queue_cache:
-        logger.info('Returning cached queue for %s', tenant_id)
-        return queue_cache[tenant_id]
+def _get_tenant_queue(tenant_id: str) -> tuple[Optional[Queue], bool]:
+    """
+    :return: the tenant's inbound queue, and whether it was found in the cache
+    """
+    cache_hit = tenant_id in queue_cache
+    dimensions = {
+        'CacheHit': str(cache_hit)
+    }
+    with metrics.timer('TenantResolutionTime', dimensions=dimensions):
+        if cache_hit:
+            sampled_logger.info('Returning cached queue for %s', tenant_id)
+            return queue_cache[tenant_id], True
 
-    queue = get_queue(table, tenant_id=tenant_id, queue_type=QueueType.Inbound)
-    if queue:
-        queue_cache[tenant_id] = queue
+        queue = get_queue(table, tenant_id=tenant_id, queue_type=QueueType.Inbound)
+        if queue:
+            queue_cache[tenant_id] = queue
 
-    return queue
+        return queue, False
 
 
 def _is_tenant_queue_deleted(tenant_id: str) -> bool:
@@ -107,12 +175,14 @@ def _is_tenant_queue_deleted(tenant_id: str) -> bool:
 def _handle_sqs_events(event):
     failed_records = []
     for record in event['Records']:
-        body = json.loads(record['body'])
         try:
-            _handle_eventbridge_event(body)
+            # Events dead-lettered from tenant queues keep the encoding they were delivered with. A body that can't be
+            # decoded fails only its own record.
+            body = json.loads(decode_message_body(record['body'], record.get('messageAttributes', {})))
+            _handle_eventbridge_event(body, replayed=True)
         except:  # pylint: disable=bare-except
             failed_records.append(record['receiptHandle'])
-            logger.exception('Failed replaying event: %s', body)
+            logger.exception('Failed replaying event: %s', record['body'])
 
     # If some events failed, delete the successful ones
     if failed_records:
@@ -144,6 +214,6 @@ def _can_ignore_event_when_queue_missing(tenant_id: str, event: dict) -> bool:
         source = event.get('source')
         detail_type = event.get('detail-type')
         if source and detail_type and detail_type in events_ignored_when_queue_missing.get(source, []):
-            logger.info('Dropping event "%s:%s" for missing tenant %s', source, detail_type, tenant_id)
+            sampled_logger.info('Dropping event "%s:%s" for missing tenant %s', source, detail_type, tenant_id)
             return True
     return False
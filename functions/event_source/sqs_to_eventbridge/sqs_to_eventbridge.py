@@ -2,7 +2,7 @@ import json
 import os
 import re
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 from functools import lru_cache
 from typing import Optional
 
@@ -12,9 +12,15 @@ from aws_lambda_powertools.utilities.typing import LambdaContext
 from bb_ent_data_services_shared.lambdas.logger import logger
 
 from common.data.eventbridge import send_events_to_eventbridge
-from common.dates import parse_iso8601_date
+from common.dates import milliseconds_between, parse_epoch_millis, parse_iso8601_date
+from common.heavy_hitters import HeavyHitters
+from common.metrics import MetricUnit, Metrics
+from common.sampled_logging import SampledLogger
 
 xray_tracer = Tracer()
+metrics = Metrics(service='sqs_to_eventbridge')
+heavy_hitters = HeavyHitters(metrics)
+sampled_logger = SampledLogger()
 
 STACK_NAME = os.environ['STACK_NAME']
 EVENT_BUS = os.environ['EVENT_BUS']
@@ -35,10 +41,17 @@ class Message:
     detail: dict
     time: datetime
     sender_id: str
+    sent_timestamp: datetime
 
     def tenant_id(self):
         return self.detail.get('tenantId')
 
+    def metric_dimensions(self) -> dict[str, str]:
+        return {
+            'Source': self.source,
+            'DetailType': self.detail_type,
+        }
+
     def to_eventbridge(self):
         return {
             'Source': self.source,
@@ -52,37 +65,55 @@ class Message:
 
 @xray_tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@metrics.log_metrics
+@heavy_hitters.flush_periodically
+@sampled_logger.summarize
 def handler(event: dict, _context: LambdaContext):
     """ Entrypoint for the event source lambda """
-    events = []
+    messages = []
+    receipt_handles = []
     failed_records = []
 
     queue_name = queue_name_from_queue_arn(stack_name=STACK_NAME, queue_arn=event['Records'][0]['eventSourceARN'])
     queue_url = get_sqs_url(queue_name)
 
-    for record in event['Records']:
-        message = parse_message(record, _context.invoked_function_arn)
-        if message is None:
-            # Message could not be parsed.
-            failed_records.append(record['receiptHandle'])
-            continue
-
-        logger.info('Processing message sent by %s to queue %s', message.sender_id, message.queue_arn)
-        if not validate_message(message):
-            # Drop messages where tenant_id's don't match
-            failed_records.append(record['receiptHandle'])
-            continue
+    with metrics.timer('ParseTime'):
+        for record in event['Records']:
+            message = parse_message(record, _context.invoked_function_arn)
+            if message is None:
+                # Message could not be parsed.
+                failed_records.append(record['receiptHandle'])
+                continue
+
+            sampled_logger.info('Processing message sent by %s to queue %s', message.sender_id, message.queue_arn)
+            metrics.add_count('Events', dimensions=message.metric_dimensions())
+            heavy_hitters.record(message.tenant_id() or 'Unknown', len(record['body']))
+            if not validate_message(message):
+                # Drop messages where tenant_id's don't match
+                failed_records.append(record['receiptHandle'])
+                continue
+
+            messages.append(message)
+            receipt_handles.append(record['receiptHandle'])
+
+    if messages:
+        with metrics.timer('PutEventsTime'):
+            errors = send_events_to_eventbridge(eb_client, [message.to_eventbridge() for message in messages])
+        for error in errors:
+            # PutEvents entries carry no receipt handle, so find the message by its position in the request
+            failed_records.append(receipt_handles[error.index])
+            logger.error('Failed sending event: %s \n to eventbridge with error: %s', error.event, error.error_message)
 
-        events.append(message.to_eventbridge())
+        # Rejected messages are retried, so their latency is only recorded once they reach the event bus
+        rejected = set(error.index for error in errors)
+        record_latencies([message for i, message in enumerate(messages) if i not in rejected])
 
-    if events:
-        for error in send_events_to_eventbridge(eb_client, events):
-            failed_records.append(error.event['receiptHandle'])
-            logger.error('Failed sending event: %s \n to eventbridge with error: %s', error.event, error.error_message)
+    metrics.add_count('FailedEvents', len(failed_records))
 
     # If some message failed to parse or be sent -> Delete the successful ones and raise an exception for retry logic.
     if failed_records:
-        delete_messages_from_sqs(queue_url, event['Records'], failed_records)
+        with metrics.timer('DeleteMessagesTime'):
+            delete_messages_from_sqs(queue_url, event['Records'], failed_records)
         raise RuntimeError('Failed to process one or more messages')
 
 
@@ -102,7 +133,8 @@ def parse_message(record: dict, lambda_arn: str) -> Optional[Message]:
                        detail_type=body['detail-type'],
                        detail=body['detail'],
                        time=parse_iso8601_date(body['time']),
-                       sender_id=sender_id)
+                       sender_id=sender_id,
+                       sent_timestamp=parse_epoch_millis(record['attributes']['SentTimestamp']))
     except ValueError:
         logger.exception('Could Not Parse Json %s', json.dumps(record))
         return None
@@ -111,6 +143,24 @@ def parse_message(record: dict, lambda_arn: str) -> Optional[Message]:
         return None
 
 
+def record_latencies(messages: list[Message]):
+    """
+    Records how long messages took to reach the event bus, both since Learn sent them to the outbound queue and since the
+    event itself was created
+    """
+    published_at = datetime.now(timezone.utc)
+    for message in messages:
+        dimensions = message.metric_dimensions()
+        metrics.add_sample('QueueLatency',
+                           milliseconds_between(published_at, message.sent_timestamp),
+                           MetricUnit.MILLISECONDS,
+                           dimensions=dimensions)
+        metrics.add_sample('EventLatency',
+                           milliseconds_between(published_at, message.time),
+                           MetricUnit.MILLISECONDS,
+                           dimensions=dimensions)
+
+
 def validate_message(message: Message) -> bool:
     """
     Validate the record satisfies the requirements such as
@@ -0,0 +1,74 @@
+import json
+import os
+from http import HTTPStatus
+
+import boto3
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.logging import correlation_paths
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.queues import TenantQueues, UnprocessedTenants, batch_get_queues
+from common.rest import BadRequest, RestApiWrapper, ServiceUnavailable, rest_response
+from common.rest.constants import BATCH_GET_MAX_TENANTS
+from common.rest.timing import DYNAMODB, phase
+
+xray_tracer = Tracer()
+
+dynamodb = boto3.resource('dynamodb')
+TABLE_NAME = os.environ['TABLE_NAME']
+table = dynamodb.Table(TABLE_NAME)
+
+
+@xray_tracer.capture_lambda_handler
+@logger.inject_lambda_context(correlation_id_path=correlation_paths.API_GATEWAY_REST)
+@RestApiWrapper('rest_api.batch_get_queues')
+def handler(event: dict, _context: LambdaContext):
+    tenant_ids = _parse_tenant_ids(event.get('body'))
+
+    try:
+        with phase(DYNAMODB):
+            tenants = batch_get_queues(table, tenant_ids)
+    except UnprocessedTenants as e:
+        raise ServiceUnavailable('Tenants could not be read, try again later', str(e)) from e
+
+    return rest_response(HTTPStatus.OK, {
+        'results': [to_json(tenant_id, tenants[tenant_id]) for tenant_id in tenant_ids]
+    })
+
+
+def _parse_tenant_ids(body) -> list[str]:
+    try:
+        tenant_ids = json.loads(body or '{}').get('tenantIds')
+    except (AttributeError, ValueError) as e:
+        raise BadRequest('Invalid request body', str(e)) from e
+
+    if not isinstance(tenant_ids, list) or not all(
+            isinstance(tenant_id, str) and tenant_id for tenant_id in tenant_ids):
+        raise BadRequest('Invalid request body', 'tenantIds must be a list of tenant IDs')
+    if not 0 < len(tenant_ids) <= BATCH_GET_MAX_TENANTS:
+        raise BadRequest('Invalid request body', f'Between 1 and {BATCH_GET_MAX_TENANTS} tenantIds are allowed')
+
+    # BatchGetItem rejects duplicate keys
+    return list(dict.fromkeys(tenant_ids))
+
+
+def to_json(tenant_id: str, tenant: TenantQueues):
+    # Matches get_queues, which answers 404 for tenants without queues, and 410 while their queues are being deleted
+    if not tenant.queues:
+        state = 'NotFound'
+    elif tenant.delete_status == 'Started':
+        state = 'Deleting'
+    else:
+        state = 'Active'
+
+    return {
+        'tenantId': tenant_id,
+        'state': state,
+        'queues': [{
+            'tenantId': queue.tenant_id,
+            'type': queue.queue_type.name,
+            'arn': queue.sqs_arn,
+            'url': queue.url
+        } for queue in tenant.queues] if state == 'Active' else [],
+    }
@@ -9,6 +9,7 @@ from bb_ent_data_services_shared.lambdas.logger import logger
 
 from common.data.queues import StepFunctionAction, delete_queues, get_queues, get_status
 from common.rest import RestApiWrapper, rest_response
+from common.rest.timing import DYNAMODB, STEP_FUNCTIONS, phase
 
 xray_tracer = Tracer()
 
@@ -26,13 +27,18 @@ def handler(event: dict, _context: LambdaContext):
     parameters = event['pathParameters']
     tenant_id = parameters['tenantId']
 
-    if len(get_queues(table, tenant_id)) == 0:
+    with phase(DYNAMODB):
+        queues = get_queues(table, tenant_id)
+    if len(queues) == 0:
         return rest_response(HTTPStatus.NOT_FOUND)
 
-    if get_status(table, tenant_id, StepFunctionAction.DELETE) == "Started":
+    with phase(DYNAMODB):
+        delete_status = get_status(table, tenant_id, StepFunctionAction.DELETE)
+    if delete_status == "Started":
         return rest_response(HTTPStatus.GONE)
 
     logger.warning('Deleting queues for tenant %s', tenant_id)
-    delete_queues(sfn_client, TENANT_DELETE_ARN, tenant_id=tenant_id)
+    with phase(STEP_FUNCTIONS):
+        delete_queues(sfn_client, TENANT_DELETE_ARN, tenant_id=tenant_id)
 
     return rest_response(HTTPStatus.ACCEPTED)
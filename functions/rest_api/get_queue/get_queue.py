@@ -13,12 +13,16 @@ from boto3 import session
 from pyfnds.service_discovery import discover_api_url
 from requests_aws_sign import AWSV4Sign
 
-from common.data.queues import QueueType, StepFunctionAction, create_queues, get_queue, get_shared_outbound_queue, \
-    get_sqs_credentials, get_status_and_retry_information
+from common.data.message_encoding import MessageEncoding
+from common.data.queues import Queue, QueueType, StepFunctionAction, create_queues, get_queue, \
+    get_shared_outbound_queue, get_sqs_credentials, get_status_and_retry_information, set_message_encoding, \
+    wait_for_queue
 from common.dates import format_iso8601_date, time_minute_difference
 from common.rest import NotFound, RestApiWrapper, rest_response
-from common.rest.constants import GET_QUEUE_MAX_RETRIES, GET_QUEUE_RETRY_FACTOR
+from common.rest.constants import GET_QUEUE_MAX_RETRIES, GET_QUEUE_MAX_WAIT_SECONDS, GET_QUEUE_RETRY_FACTOR, \
+    GET_QUEUE_WAIT_MARGIN_SECONDS, GET_QUEUE_WAIT_POLL_SECONDS
 from common.rest.exceptions import BadRequest
+from common.rest.timing import DYNAMODB, STEP_FUNCTIONS, STS, TENANT_API, WAIT, phase
 
 xray_tracer = Tracer()
 
@@ -86,7 +90,7 @@ def _get_saas_client_id(tenant_id: str) -> Optional[str]:
 @xray_tracer.capture_lambda_handler
 @logger.inject_lambda_context(correlation_id_path=correlation_paths.API_GATEWAY_REST)
 @RestApiWrapper('rest_api.get_queue')
-def handler(event: dict, _context: LambdaContext):
+def handler(event: dict, context: LambdaContext):
     parameters = event['pathParameters']
     tenant_id = parameters['tenantId']
     try:
@@ -95,7 +99,11 @@ def handler(event: dict, _context: LambdaContext):
         # pylint: disable=raise-missing-from
         raise BadRequest('Failed to parse queueType', str(error))
 
-    queue = get_queue(table, tenant_id=tenant_id, queue_type=queue_type)
+    requested_encoding = _get_requested_encoding(event)
+    wait_seconds = _get_wait_seconds(event)
+
+    with phase(DYNAMODB):
+        queue = get_queue(table, tenant_id=tenant_id, queue_type=queue_type)
     if queue_type == QueueType.Inbound:
         legacy_queue = None
     else:
@@ -107,24 +115,26 @@ def handler(event: dict, _context: LambdaContext):
     if queue is None:
         logger.info('Queue not found for %s', tenant_id)
 
-        client_id = _get_saas_client_id(tenant_id)
+        with phase(TENANT_API):
+            client_id = _get_saas_client_id(tenant_id)
         if not client_id:
             # TODO LRN-172116: Rework the mechanism we use to validate sites are SaaS Learn
             # raise Forbidden('Only Learn SaaS tenants may create queues')
             client_id = "Missing"
         logger.info("The ClientId associated with this tenant is %s", client_id)
 
-        audit_info = get_status_and_retry_information(table, tenant_id=tenant_id, action=StepFunctionAction.CREATE)
+        with phase(DYNAMODB):
+            audit_info = get_status_and_retry_information(table, tenant_id=tenant_id, action=StepFunctionAction.CREATE)
         if audit_info.status is None:
-            create_queues(sfn_client, TENANT_PROVISIONER_ARN, tenant_id, client_id)
-            logger.info('Scheduled queue creation for %s', tenant_id)
-            return rest_response(HTTPStatus.ACCEPTED)
+            with phase(STEP_FUNCTIONS):
+                scheduled = create_queues(sfn_client, table, TENANT_PROVISIONER_ARN, tenant_id, client_id)
+            if scheduled:
+                logger.info('Scheduled queue creation for %s', tenant_id)
 
-        if audit_info.status == "Started":
+        elif audit_info.status == "Started":
             logger.info("Queue creation already scheduled")
-            return rest_response(HTTPStatus.ACCEPTED)
 
-        if audit_info.status == "Failure":
+        elif audit_info.status == "Failure":
             if audit_info.retry_count == GET_QUEUE_MAX_RETRIES:
                 raise Exception("Tenant's Queue Creation has Failed")
 
@@ -134,20 +144,97 @@ def handler(event: dict, _context: LambdaContext):
                 logger.info("Scheduled creation failed; %d minutes until retry", minutes_until_next_attempt)
                 return rest_response(HTTPStatus.ACCEPTED)
 
-            create_queues(sfn_client, TENANT_PROVISIONER_ARN, tenant_id, client_id, retry_count=audit_info.retry_count)
-            logger.info('Scheduled queue creation for %s. Re-attempt %s', tenant_id, audit_info.retry_count)
+            with phase(STEP_FUNCTIONS):
+                scheduled = create_queues(sfn_client,
+                                          table,
+                                          TENANT_PROVISIONER_ARN,
+                                          tenant_id,
+                                          client_id,
+                                          retry_count=audit_info.retry_count)
+            if scheduled:
+                logger.info('Scheduled queue creation for %s. Re-attempt %s', tenant_id, audit_info.retry_count)
+
+        else:
+            with phase(DYNAMODB):
+                delete_info = get_status_and_retry_information(table,
+                                                               tenant_id=tenant_id,
+                                                               action=StepFunctionAction.DELETE)
+            if delete_info.status:
+                raise NotFound("Tenant's queues have been deleted")
+
+            # This is likely to require manual intervention
+            logger.error('Unexpected audit row status %s for tenant %s', audit_info.status, tenant_id)
+            raise Exception("Unexpected tenant status")
+
+        # Creation is underway
+        queue = _wait_for_queue(context, tenant_id, queue_type, wait_seconds)
+        if queue is None:
             return rest_response(HTTPStatus.ACCEPTED)
 
-        delete_info = get_status_and_retry_information(table, tenant_id=tenant_id, action=StepFunctionAction.DELETE)
-        if delete_info.status:
-            raise NotFound("Tenant's queues have been deleted")
+    if queue_type == QueueType.Inbound and requested_encoding and requested_encoding != queue.encoding:
+        with phase(DYNAMODB):
+            set_message_encoding(table, tenant_id, requested_encoding)
+        queue.encoding = requested_encoding
+
+    # The response carries short-lived credentials, so must never be cached or revalidated. Validators built from the
+    # queue would let a client keep reusing credentials that have since expired.
+    headers = {
+        'Cache-Control': 'no-store'
+    }
+
+    with phase(STS):
+        credentials = get_sqs_credentials(sts_client, ASSUMABLE_ROLE, queue, legacy_queue=legacy_queue)
+    return rest_response(HTTPStatus.OK, to_json(queue, credentials), headers=headers)
+
+
+def _get_requested_encoding(event: dict) -> Optional[MessageEncoding]:
+    """
+    Learn may opt in to compressed inbound messages by passing the encoding it wants to receive. The encoding in use is
+    echoed back in the response, so older Learn versions that don't pass the parameter keep receiving plain JSON.
+    """
+    query_parameters = event.get('queryStringParameters') or {}
+    label = query_parameters.get('messageEncoding')
+    if not label:
+        return None
+
+    try:
+        return MessageEncoding.from_string(label)
+    except ValueError as error:
+        # pylint: disable=raise-missing-from
+        raise BadRequest('Failed to parse messageEncoding', str(error))
+
+
+def _get_wait_seconds(event: dict) -> int:
+    """
+    Learn may ask to wait for a queue being provisioned, rather than being told to retry at once. The wait is capped
+    so that the response always beats the API Gateway timeout.
+    """
+    query_parameters = event.get('queryStringParameters') or {}
+    label = query_parameters.get('wait')
+    if not label:
+        return 0
+
+    try:
+        wait_seconds = int(label)
+    except ValueError as error:
+        # pylint: disable=raise-missing-from
+        raise BadRequest('Failed to parse wait', str(error))
+    if wait_seconds < 0:
+        raise BadRequest('Failed to parse wait', 'wait must not be negative')
+    return min(wait_seconds, GET_QUEUE_MAX_WAIT_SECONDS)
+
 
-        # This is likely to require manual intervention
-        logger.error('Unexpected audit row status %s for tenant %s', audit_info.status, tenant_id)
-        raise Exception("Unexpected tenant status")
+def _wait_for_queue(context: LambdaContext, tenant_id: str, queue_type: QueueType,
+                    wait_seconds: int) -> Optional[Queue]:
+    # Leave time to issue credentials before the Lambda times out
+    timeout_seconds = min(wait_seconds, context.get_remaining_time_in_millis() / 1000 - GET_QUEUE_WAIT_MARGIN_SECONDS)
+    if timeout_seconds <= 0:
+        return None
 
-    credentials = get_sqs_credentials(sts_client, ASSUMABLE_ROLE, queue, legacy_queue=legacy_queue)
-    return rest_response(HTTPStatus.OK, to_json(queue, credentials))
+    with phase(WAIT):
+        queue = wait_for_queue(table, tenant_id, queue_type, timeout_seconds, GET_QUEUE_WAIT_POLL_SECONDS)
+    logger.info('Queue for %s %s while waiting', tenant_id, 'provisioned' if queue else 'not provisioned')
+    return queue
 
 
 def to_json(queue, credentials):
@@ -157,6 +244,7 @@ def to_json(queue, credentials):
         'arn': queue.sqs_arn,
         'url': queue.url,
         'region': REGION,
+        'messageEncoding': queue.encoding.value,
         'credentials': {
             'accessKeyId': credentials.access_key_id,
             'secretAccessKey': credentials.secret_access_key,
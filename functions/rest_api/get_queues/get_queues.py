@@ -8,7 +8,8 @@ from aws_lambda_powertools.utilities.typing import LambdaContext
 from bb_ent_data_services_shared.lambdas.logger import logger
 
 from common.data.queues import StepFunctionAction, get_queues, get_status
-from common.rest import NotFound, RestApiWrapper, rest_response
+from common.rest import NotFound, RestApiWrapper, cache_headers, is_not_modified, rest_response
+from common.rest.timing import DYNAMODB, phase
 
 xray_tracer = Tracer()
 
@@ -24,18 +25,27 @@ def handler(event: dict, _context: LambdaContext):
     parameters = event['pathParameters']
     tenant_id = parameters['tenantId']
 
-    queues = get_queues(table, tenant_id=tenant_id)
+    with phase(DYNAMODB):
+        queues = get_queues(table, tenant_id=tenant_id)
 
     if len(queues) == 0:
         raise NotFound('Queues not found', f"No queues exist for tenant '{tenant_id}'")
 
-    if get_status(table, tenant_id, StepFunctionAction.DELETE) == "Started":
+    with phase(DYNAMODB):
+        delete_status = get_status(table, tenant_id, StepFunctionAction.DELETE)
+    if delete_status == "Started":
         return rest_response(HTTPStatus.GONE)
 
+    # The queues all come from the METADATA row, so share its validators. Caches must revalidate, as deletion may
+    # start at any time.
+    headers = cache_headers(queues[0].version, queues[0].modified_date, 'no-cache')
+    if is_not_modified(event, headers):
+        return rest_response(HTTPStatus.NOT_MODIFIED, headers=headers)
+
     json_queues = [to_json(queue) for queue in queues]
     return rest_response(HTTPStatus.OK, {
         'results': json_queues
-    })
+    }, headers=headers)
 
 
 def to_json(queue):
@@ -0,0 +1,36 @@
+"""
+Serves every REST endpoint from one function when the REST router is enabled, so the endpoints share warm containers.
+
+Each endpoint's module is imported the first time it is called, which keeps cold starts as fast as with a function per
+endpoint. Its clients and caches are then kept for every later request the container serves.
+"""
+import importlib
+
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.rest import NotFound, RestApiWrapper
+
+# Endpoint modules by the API Gateway resource and method they serve
+ROUTES = {
+    ('/api/v1/foundationsConnector/tenants/{tenantId}/queues/{queueType}', 'GET'): 'get_queue.get_queue',
+    ('/internal/api/v1/foundationsConnector/tenants/{tenantId}/queues', 'GET'): 'get_queues.get_queues',
+    ('/internal/api/v1/foundationsConnector/tenants/{tenantId}/queues', 'DELETE'): 'delete_queues.delete_queues',
+    ('/internal/api/v1/foundationsConnector/queues/batchGet', 'POST'): 'batch_get_queues.batch_get_queues',
+}
+
+# The endpoints are top-level packages of the deployed function, but live in the rest_api package in tests
+_PACKAGE_PREFIX = f'{__package__}.' if __package__ else ''
+
+
+@RestApiWrapper('rest_api.router')
+def handler(event: dict, context: LambdaContext):
+    resource = event.get('resource')
+    method = event.get('httpMethod')
+    module_name = ROUTES.get((resource, method)) if isinstance(resource, str) and isinstance(method, str) else None
+    if not module_name:
+        raise NotFound('Endpoint not found', f'No endpoint serves {method} {resource}')
+
+    logger.debug('Routing %s %s to %s', method, resource, module_name)
+    endpoint = importlib.import_module(f'{_PACKAGE_PREFIX}{module_name}')
+    return endpoint.handler(event, context)
@@ -0,0 +1,57 @@
+import os
+from datetime import datetime, timedelta
+
+import boto3
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.queues import StepFunctionAction
+from common.data.stale_executions import get_execution_outcome, get_stale_audit_rows, record_execution_outcome
+from common.metrics import Metrics
+
+xray_tracer = Tracer()
+metrics = Metrics(service='audit_sweeper')
+
+TABLE_NAME = os.environ['TABLE_NAME']
+STALE_AFTER = timedelta(minutes=int(os.environ['STALE_AFTER_MINUTES']))
+
+sfn_client = boto3.client('stepfunctions')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
+
+
+@xray_tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@metrics.log_metrics
+def handler(_event: dict, _context: LambdaContext):
+    """
+    Finds audit rows still marked Started long after their execution began, and records the outcome of the executions
+    that have since finished. Without this, an execution that never updated its audit row leaves the tenant waiting
+    forever, as get_queue keeps answering 202 while creation is Started.
+    """
+    updated_before = datetime.now() - STALE_AFTER
+    totals = {
+        'stale': 0,
+        'running': 0,
+        'reconciled': 0,
+    }
+
+    for action in StepFunctionAction:
+        for audit_row in get_stale_audit_rows(table, action, updated_before):
+            totals['stale'] += 1
+            outcome = get_execution_outcome(sfn_client, audit_row['Execution'])
+            if outcome is None:
+                logger.warning('Execution %s has been running since %s', audit_row['Execution'], audit_row['UpdatedAt'])
+                totals['running'] += 1
+            elif record_execution_outcome(table, audit_row, outcome):
+                logger.warning('Execution %s finished without recording its outcome, marked %s %s',
+                               audit_row['Execution'], audit_row['sk'], outcome)
+                totals['reconciled'] += 1
+
+    metrics.add_count('StaleAuditRows', totals['stale'])
+    metrics.add_count('StaleExecutionsRunning', totals['running'])
+    metrics.add_count('AuditRowsReconciled', totals['reconciled'])
+
+    logger.info('Audit rows not updated since %s: %s', updated_before, totals)
+    return totals
@@ -0,0 +1,58 @@
+import json
+import os
+
+import boto3
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.tenant_queues import retag_queue, tenant_tags
+from common.data.warm_pool import claim_pooled_queue
+
+xray_tracer = Tracer()
+
+stack_tags = json.loads(os.environ['STACK_TAGS'])
+TABLE_NAME = os.environ['TABLE_NAME']
+
+sqs_client = boto3.client('sqs')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
+
+
+class PooledQueueRetagFailed(Exception):
+    """
+    The tenant was given a pooled queue, but the queue couldn't be retagged. The step function retries the claim, which
+    only retags the queue again, and must never fall back to creating a stack for the tenant.
+    """
+
+
+@xray_tracer.capture_lambda_handler
+@logger.inject_lambda_context
+def handler(event: dict, _context: LambdaContext):
+    """ Assigns a queue from the warm pool to a new tenant, so the tenant doesn't have to wait for a stack """
+    logger.debug('In with: %s', event)
+
+    tenant_id = event['tenantId']
+    client_id = event['clientId']
+
+    assert tenant_id, 'missing tenantId'
+    assert client_id, 'missing clientId'
+
+    metadata = claim_pooled_queue(table, tenant_id, client_id)
+    if not metadata:
+        logger.info('No pooled queue available for tenant %s', tenant_id)
+        return {
+            'claimed': False
+        }
+
+    # Replaces the pool tag, so the queue is tagged like any other tenant queue
+    try:
+        retag_queue(sqs_client, metadata['InboundQueueUrl'], tenant_tags(stack_tags, tenant_id, client_id))
+    except Exception as e:
+        raise PooledQueueRetagFailed(f"Failed to retag pooled queue {metadata['InboundQueueUrl']}") from e
+
+    logger.info('Assigned pooled queue %s to tenant %s', metadata['InboundQueueUrl'], tenant_id)
+    return {
+        'claimed': True,
+        'queueUrl': metadata['InboundQueueUrl'],
+    }
@@ -3,10 +3,16 @@ import os
 from typing import Sequence
 
 import boto3
+import botocore
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from bb_ent_data_services_shared.lambdas.logger import logger
 
+from common.data.queues import get_metadata
+from common.data.stack_templates import TEMPLATE_HASH_PARAMETER, StackTemplate, is_stack_up_to_date
+from common.data.tenant_queues import CLOUDFORMATION_PROVISIONER, DIRECT_PROVISIONER, create_inbound_queue, \
+    is_directly_provisioned, put_direct_metadata, reconcile_inbound_queue, set_metadata_version, tenant_tags
+
 xray_tracer = Tracer()
 
 parent_stack_name = os.environ['STACK_NAME']
@@ -14,12 +20,17 @@ stack_version = os.environ['STACK_VERSION']
 stack_tags = json.loads(os.environ['STACK_TAGS'])
 manage_metadata_arn = os.environ['MANAGE_METADATA_ARN']
 inbound_dlq_arn = os.environ['INBOUND_DLQ_ARN']
-pager_duty_alarm_warning_topic = os.environ.get('PAGER_DUTY_ALARM_WARNING_TOPIC', "")
+tenant_provisioner = os.getenv('TENANT_PROVISIONER', CLOUDFORMATION_PROVISIONER)
+TABLE_NAME = os.environ['TABLE_NAME']
 
 cloudformation = boto3.resource('cloudformation')
+sqs_client = boto3.client('sqs')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
 
-with open('template.yaml', 'r', encoding='ascii') as file:
-    template = file.read()
+with open(os.path.join(os.path.dirname(__file__), 'template.yaml'), 'r', encoding='ascii') as file:
+    # Staged in S3 at deployment, by content hash
+    template = StackTemplate(file.read(), url=os.getenv('TEMPLATE_URL'))
 
 
 @xray_tracer.capture_lambda_handler
@@ -35,12 +46,28 @@ def handler(event: dict, _context: LambdaContext):
     assert client_id, 'missing clientId'
 
     stack_name = f'{parent_stack_name}-{tenant_id}'
+    tags = tenant_tags(stack_tags, tenant_id, client_id)
+
+    # Tenants keep the provisioner they were created with
+    if is_update:
+        metadata = get_metadata(table, tenant_id)
+        if is_directly_provisioned(metadata):
+            # There is no stack to update, e.g. the queue came from the warm pool
+            reconcile_inbound_queue(sqs_client, metadata['InboundQueueUrl'], inbound_dlq_arn, tags)
+            set_metadata_version(table, tenant_id, stack_version)
+            return {
+                'stackName': stack_name,
+                'stackId': None,
+            }
+    elif tenant_provisioner == DIRECT_PROVISIONER:
+        # Named like the queue in a tenant stack. Safe to retry, as an existing queue is reconciled instead.
+        queue_url, queue_arn = create_inbound_queue(sqs_client, f'{stack_name}-inbound', inbound_dlq_arn, tags)
+        put_direct_metadata(table, tenant_id, client_id, stack_version, queue_url, queue_arn)
+        return {
+            'stackName': stack_name,
+            'stackId': None,
+        }
 
-    tags = {
-        **stack_tags,
-        'TenantId': tenant_id,
-        'ClientId': client_id,
-    }
     aws_tags: Sequence = [{
         'Key': k,
         'Value': v
@@ -52,7 +79,7 @@ def handler(event: dict, _context: LambdaContext):
         'StackVersion': stack_version,
         'ManageMetadataFunctionArn': manage_metadata_arn,
         'InboundDlqArn': inbound_dlq_arn,
-        'PagerDutyAlarmWarningTopic': pager_duty_alarm_warning_topic
+        TEMPLATE_HASH_PARAMETER: template.hash,
     }
     aws_params: Sequence = [{
         'ParameterKey': k,
@@ -61,15 +88,19 @@ def handler(event: dict, _context: LambdaContext):
 
     if is_update:
         stack = cloudformation.Stack(stack_name)
-
-        logger.info('Updating existing stack %s', stack_name)
-        stack.update(TemplateBody=template, Tags=aws_tags, Parameters=aws_params)
+        if is_stack_up_to_date(stack, parameters, tags) or not _update_stack(stack, aws_tags, aws_params):
+            # CloudFormation rejects updates that change nothing, so there is nothing to wait for
+            logger.info('Stack %s is already up to date', stack_name)
+            return {
+                'stackName': stack_name,
+                'stackId': None,
+            }
 
     else:
         logger.info('Creating stack %s', stack_name)
         stack = cloudformation.create_stack(
             StackName=stack_name,
-            TemplateBody=template,
+            **template.template_args(),
             Tags=aws_tags,
             Parameters=aws_params,
             # If creation fails, nuke the stack so we can retry later
@@ -79,3 +110,17 @@ def handler(event: dict, _context: LambdaContext):
         'stackName': stack_name,
         'stackId': stack.stack_id,
     }
+
+
+def _update_stack(stack, aws_tags: Sequence, aws_params: Sequence) -> bool:
+    """
+    :return: False if the stack was already up to date, e.g. updated by an earlier attempt since it was checked
+    """
+    logger.info('Updating existing stack %s', stack.stack_name)
+    try:
+        stack.update(**template.template_args(), Tags=aws_tags, Parameters=aws_params)
+    except botocore.exceptions.ClientError as e:
+        if 'No updates are to be performed' not in e.response['Error']['Message']:
+            raise
+        return False
+    return True
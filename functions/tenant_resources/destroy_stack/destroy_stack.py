@@ -5,11 +5,18 @@ from aws_lambda_powertools import Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from bb_ent_data_services_shared.lambdas.logger import logger
 
+from common.data.queues import get_metadata
+from common.data.tenant_queues import delete_inbound_queue, delete_metadata, is_directly_provisioned
+
 xray_tracer = Tracer()
 
 parent_stack_name = os.environ['STACK_NAME']
+TABLE_NAME = os.environ['TABLE_NAME']
 
 cloudformation = boto3.resource('cloudformation')
+sqs_client = boto3.client('sqs')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
 
 
 @xray_tracer.capture_lambda_handler
@@ -21,6 +28,17 @@ def handler(event: dict, _context: LambdaContext):
     assert tenant_id, 'missing tenantId'
 
     stack_name = f'{parent_stack_name}-{tenant_id}'
+
+    metadata = get_metadata(table, tenant_id)
+    if is_directly_provisioned(metadata):
+        # There is no stack to delete, e.g. the queue came from the warm pool
+        delete_inbound_queue(sqs_client, metadata['InboundQueueUrl'])
+        delete_metadata(table, tenant_id)
+        return {
+            'stackName': stack_name,
+            'stackId': None,
+        }
+
     logger.info('Deleting stack %s', stack_name)
 
     stack = cloudformation.Stack(stack_name)
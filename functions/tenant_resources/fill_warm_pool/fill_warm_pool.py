@@ -0,0 +1,55 @@
+import json
+import os
+
+import boto3
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.tenant_queues import create_inbound_queue, delete_inbound_queue
+from common.data.warm_pool import WARM_POOL_TAG, add_pooled_queue, get_pooled_queues, pooled_queue_name, \
+    remove_pooled_queue
+
+xray_tracer = Tracer()
+
+parent_stack_name = os.environ['STACK_NAME']
+stack_version = os.environ['STACK_VERSION']
+stack_tags = json.loads(os.environ['STACK_TAGS'])
+inbound_dlq_arn = os.environ['INBOUND_DLQ_ARN']
+TABLE_NAME = os.environ['TABLE_NAME']
+WARM_POOL_SIZE = int(os.environ['WARM_POOL_SIZE'])
+
+sqs_client = boto3.client('sqs')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
+
+
+@xray_tracer.capture_lambda_handler
+@logger.inject_lambda_context
+def handler(_event: dict, _context: LambdaContext):
+    """ Tops up the warm pool of unassigned inbound queues, replacing any created from an older stack version """
+    pooled_queues = get_pooled_queues(table)
+
+    available = 0
+    for pooled_queue in pooled_queues:
+        if pooled_queue['Version'] == stack_version:
+            available += 1
+        elif remove_pooled_queue(table, pooled_queue['sk']):
+            logger.info('Replacing pooled queue %s from version %s', pooled_queue['sk'], pooled_queue['Version'])
+            delete_inbound_queue(sqs_client, pooled_queue['InboundQueueUrl'])
+
+    logger.info('Warm pool has %d of %d queues available', available, WARM_POOL_SIZE)
+
+    tags = {
+        **stack_tags,
+        WARM_POOL_TAG: 'true',
+    }
+    for _ in range(WARM_POOL_SIZE - available):
+        queue_name = pooled_queue_name(parent_stack_name)
+        queue_url, queue_arn = create_inbound_queue(sqs_client, queue_name, inbound_dlq_arn, tags)
+        add_pooled_queue(table, queue_name, queue_url, queue_arn, stack_version)
+
+    return {
+        'available': available,
+        'created': max(WARM_POOL_SIZE - available, 0),
+    }
@@ -1,23 +1,24 @@
+import os
+from datetime import datetime, timezone
+
 import boto3
 import botocore
 from aws_lambda_powertools import Tracer
 
 from bb_ent_data_services_shared.lambdas.logger import logger
 
+from common.data.stacks import complete_stack_task, get_typical_stack_seconds, is_settled, put_stack_task_token, \
+    recommend_next_poll_seconds, record_stack_completion, record_stack_seconds, stack_status_result
+from common.dates import parse_iso8601_date
+
 xray_tracer = Tracer()
 
-cloudformation = boto3.resource('cloudformation')
+TABLE_NAME = os.environ['TABLE_NAME']
 
-FAILURE_STATUSES = {
-    'CREATE_FAILED',
-    'ROLLBACK_FAILED',
-    'ROLLBACK_COMPLETE',
-    'DELETE_FAILED',
-    'UPDATE_ROLLBACK_FAILED',
-    'UPDATE_ROLLBACK_COMPLETE',
-    'IMPORT_ROLLBACK_FAILED',
-    'IMPORT_ROLLBACK_COMPLETE',
-}
+cloudformation = boto3.resource('cloudformation')
+sfn_client = boto3.client('stepfunctions')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
 
 
 @xray_tracer.capture_lambda_handler
@@ -28,6 +29,48 @@ def handler(event, _context):
     stack_name = event['stackName']
     assert stack_name, 'missing stackName'
 
+    task_token = event.get('taskToken')
+    if task_token:
+        # Register the token before checking the status, so a status change between the two can't be missed
+        tenant_id = event['tenantId']
+        put_stack_task_token(table, tenant_id, stack_name, task_token, event['execution'], event.get('operation'),
+                             event.get('startedAt'))
+
+    status = _get_stack_status(stack_name)
+
+    if task_token:
+        if is_settled(status):
+            # The stack settled before our token was registered, so no status change event will resume us
+            logger.info('Stack %s already settled, resuming step function', stack_name)
+            complete_stack_task(table, sfn_client, tenant_id, task_token, status)
+            record_stack_completion(table, tenant_id, event['execution'], event.get('operation'),
+                                    event.get('startedAt'), status)
+        else:
+            logger.info('Waiting for status change of stack %s', stack_name)
+
+        return stack_status_result(status)
+
+    operation = event.get('operation')
+    if not operation:
+        return stack_status_result(status)
+
+    elapsed_seconds = (datetime.now(timezone.utc) - parse_iso8601_date(event['startedAt'])).total_seconds()
+    if status == f'{operation}_COMPLETE':
+        # Slightly overestimates the duration, by up to one poll. Executions started before the tenant and execution
+        # were passed can't be recorded only once, so aren't recorded.
+        if 'execution' in event:
+            record_stack_seconds(table, event['tenantId'], event['execution'], operation, elapsed_seconds)
+        return stack_status_result(status)
+
+    typical_seconds = get_typical_stack_seconds(table, operation)
+    next_poll_seconds = recommend_next_poll_seconds(status, elapsed_seconds, typical_seconds,
+                                                    event['defaultPollSeconds'])
+    logger.info('Next poll of stack %s in %d seconds (elapsed: %d, typical: %s)', stack_name, next_poll_seconds,
+                elapsed_seconds, typical_seconds)
+    return stack_status_result(status, next_poll_seconds)
+
+
+def _get_stack_status(stack_name: str) -> str:
     try:
         stack = cloudformation.Stack(stack_name)
         status = stack.stack_status
@@ -39,8 +82,4 @@ def handler(event, _context):
         logger.info('Stack %s not found', stack_name)
         status = 'DELETE_COMPLETE'
 
-    return {
-        'status': status,
-        'isComplete': ('IN_PROGRESS' not in status),
-        'isFailure': (status in FAILURE_STATUSES),
-    }
+    return status
@@ -0,0 +1,73 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.fleet_upgrade import get_tenants_to_upgrade
+from common.queue_ages import get_queue_metrics
+
+xray_tracer = Tracer()
+
+parent_stack_name = os.environ['STACK_NAME']
+stack_version = os.environ['STACK_VERSION']
+TABLE_NAME = os.environ['TABLE_NAME']
+PAGE_SIZE = int(os.environ['PAGE_SIZE'])
+USE_VERSION_INDEX = os.getenv('USE_VERSION_INDEX') == '1'
+
+# Tenant stacks before 0.3.0 have an outbound queue, which the upgrade removes
+LEGACY_VERSION_PREFIXES = ('0.1', '0.2')
+
+cloudwatch_client = boto3.client('cloudwatch')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
+
+
+@xray_tracer.capture_lambda_handler
+@logger.inject_lambda_context
+def handler(event: dict, _context: LambdaContext):
+    """ Finds the tenants in one page of the table that the fleet upgrade step function should upgrade """
+    logger.debug('In with: %s', event)
+
+    tenants, next_key = get_tenants_to_upgrade(table, stack_version, PAGE_SIZE, event.get('nextKey'), USE_VERSION_INDEX)
+
+    active_legacy_tenants = _get_active_legacy_tenants(tenants)
+    for tenant_id in active_legacy_tenants:
+        logger.info('Skipping tenant %s with active legacy outbound queue', tenant_id)
+
+    tenant_ids = [tenant_id for tenant_id in tenants if tenant_id not in active_legacy_tenants]
+    logger.info('Found %d tenants to upgrade to %s, skipped %d', len(tenant_ids), stack_version,
+                len(active_legacy_tenants))
+    return {
+        'tenantIds': tenant_ids,
+        'skipped': len(active_legacy_tenants),
+        'nextKey': next_key,
+    }
+
+
+def _get_active_legacy_tenants(tenants: dict[str, str]) -> set[str]:
+    """
+    We don't want to remove legacy outbound queues while they are still active, so look for any events sent through
+    them in the last day
+    """
+    queue_tenants = {
+        f'{parent_stack_name}-{tenant_id}-outbound': tenant_id
+        for tenant_id, version in tenants.items() if version.startswith(LEGACY_VERSION_PREFIXES)
+    }
+    if not queue_tenants:
+        return set()
+
+    one_day = timedelta(days=1)
+    end_time = datetime.now(timezone.utc)
+    # The day may straddle two periods, so add up every datapoint
+    messages_sent = get_queue_metrics(cloudwatch_client,
+                                      queue_tenants.keys(),
+                                      'NumberOfMessagesSent',
+                                      'Sum',
+                                      int(one_day.total_seconds()),
+                                      end_time - one_day,
+                                      end_time,
+                                      aggregate=sum)
+    return set(queue_tenants[queue_name] for queue_name, sent in messages_sent.items() if sent > 0)
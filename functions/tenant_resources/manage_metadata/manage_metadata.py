@@ -8,6 +8,7 @@ import requests
 from aws_lambda_powertools import Tracer
 from bb_ent_data_services_shared.lambdas.logger import logger
 
+from common.data.stack_versions import register_stack_version
 from common.dates import format_iso8601_date
 
 xray_tracer = Tracer()
@@ -38,6 +39,9 @@ def handler(event, _context):
             'sk': 'METADATA'
         }
 
+        if request_type in ('Create', 'Update'):
+            register_stack_version(table, properties['Version'])
+
         if request_type == 'Create':
             try:
                 _create_metadata(key, properties, time_now)
@@ -67,6 +71,7 @@ def _create_metadata(key, properties, time_now):
             **key,
             'ClientId': properties['ClientId'],
             'Version': properties['Version'],
+            'MetadataVersion': properties['Version'],
             'InboundQueueArn': properties['InboundQueueArn'],
             'InboundQueueUrl': properties['InboundQueueUrl'],
             'CreatedAt': time_now,
@@ -81,6 +86,7 @@ def _update_metadata(key, properties, time_now):
         Key=key,
         UpdateExpression='SET ClientId = :clientId'
         ', Version = :version'
+        ', MetadataVersion = :version'
         ', InboundQueueArn = :inArn'
         ', InboundQueueUrl = :inUrl'
         ', UpdatedAt = :updatedAt'
@@ -0,0 +1,60 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.tenant_queues import get_inbound_queue_tenants
+from common.metrics import MetricUnit, Metrics
+from common.queue_ages import get_oldest_message_ages, summarize_queue_ages
+
+xray_tracer = Tracer()
+metrics = Metrics(service='queue_age_monitor')
+
+TABLE_NAME = os.environ['TABLE_NAME']
+AGE_THRESHOLD_SECONDS = int(os.environ['AGE_THRESHOLD_SECONDS'])
+WORST_OFFENDERS = int(os.environ['WORST_OFFENDERS'])
+USE_VERSION_INDEX = os.getenv('USE_VERSION_INDEX') == '1'
+
+# SQS metrics can arrive several minutes late, so look back far enough to find each queue's latest datapoint
+LOOKBACK = timedelta(minutes=15)
+
+cloudwatch_client = boto3.client('cloudwatch')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
+
+
+@xray_tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@metrics.log_metrics
+def handler(_event: dict, _context: LambdaContext):
+    """ Checks the age of the oldest message in every tenant inbound queue, in place of per-tenant alarms """
+    queue_tenants = get_inbound_queue_tenants(table, USE_VERSION_INDEX)
+
+    end_time = datetime.now(timezone.utc)
+    ages = get_oldest_message_ages(cloudwatch_client, queue_tenants.keys(), end_time - LOOKBACK, end_time)
+    summary = summarize_queue_ages(ages, AGE_THRESHOLD_SECONDS, WORST_OFFENDERS)
+
+    logger.info('%d of %d inbound queues reported an age, %d are over %d seconds old', summary.reporting,
+                len(queue_tenants), summary.over_threshold, AGE_THRESHOLD_SECONDS)
+
+    metrics.add_count('MonitoredQueues', len(queue_tenants))
+    metrics.add_count('ReportingQueues', summary.reporting)
+    metrics.add_count('QueuesOverAgeThreshold', summary.over_threshold)
+    metrics.add_sample('MaxOldestMessageAge', summary.max_age_seconds, MetricUnit.SECONDS)
+
+    # Only the worst offenders get a per-tenant metric, to keep the number of custom metrics bounded
+    for queue_name, age in summary.worst_offenders:
+        tenant_id = queue_tenants[queue_name]
+        logger.warning('Oldest message in inbound queue %s of tenant %s is %d seconds old', queue_name, tenant_id, age)
+        metrics.add_sample('OldestMessageAge', age, MetricUnit.SECONDS, dimensions={
+            'TenantId': tenant_id
+        })
+
+    return {
+        'monitored': len(queue_tenants),
+        'reporting': summary.reporting,
+        'overThreshold': summary.over_threshold,
+    }
@@ -0,0 +1,57 @@
+import os
+
+import boto3
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.fleet_upgrade import get_upgrade_statuses
+from common.metrics import Metrics
+
+xray_tracer = Tracer()
+metrics = Metrics(service='fleet_upgrade')
+
+stack_version = os.environ['STACK_VERSION']
+TABLE_NAME = os.environ['TABLE_NAME']
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
+
+
+@xray_tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@metrics.log_metrics
+def handler(event: dict, _context: LambdaContext):
+    """
+    Counts how the upgrades of one page of tenants went, from their audit rows, and adds them to the fleet upgrade's
+    running totals
+    """
+    logger.debug('In with: %s', event)
+
+    tenant_ids = event['tenantIds']
+    statuses = get_upgrade_statuses(dynamodb, table, tenant_ids, stack_version)
+
+    page = {
+        'upgraded': sum(1 for tenant_id in tenant_ids if statuses.get(tenant_id) == 'Success'),
+        'failed': sum(1 for tenant_id in tenant_ids if statuses.get(tenant_id) == 'Failure'),
+        'skipped': event['skipped'],
+    }
+    # Still running, e.g. started by someone else, or never started because the page exceeded its failure tolerance
+    page['incomplete'] = len(tenant_ids) - page['upgraded'] - page['failed']
+
+    dimensions = {
+        'Version': stack_version
+    }
+    metrics.add_count('TenantsUpgraded', page['upgraded'], dimensions)
+    metrics.add_count('TenantUpgradesFailed', page['failed'], dimensions)
+    metrics.add_count('TenantUpgradesIncomplete', page['incomplete'], dimensions)
+    metrics.add_count('TenantUpgradesSkipped', page['skipped'], dimensions)
+
+    progress = event['progress']
+    totals = {
+        key: progress[key] + value
+        for key, value in page.items()
+    }
+    totals['pages'] = progress['pages'] + 1
+    logger.info('Upgrade to %s: page %s, fleet so far %s', stack_version, page, totals)
+    return totals
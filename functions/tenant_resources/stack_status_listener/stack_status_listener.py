@@ -0,0 +1,48 @@
+import os
+
+import boto3
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.stacks import complete_stack_task, get_stack_task_token, is_settled, record_stack_completion, \
+    tenant_id_from_stack_name, to_stack_name
+
+xray_tracer = Tracer()
+
+parent_stack_name = os.environ['STACK_NAME']
+TABLE_NAME = os.environ['TABLE_NAME']
+
+sfn_client = boto3.client('stepfunctions')
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(TABLE_NAME)
+
+
+@xray_tracer.capture_lambda_handler
+@logger.inject_lambda_context
+def handler(event: dict, _context: LambdaContext):
+    """ Resumes the step function waiting on a tenant stack when CloudFormation reports the stack has settled """
+    logger.debug('In with: %s', event)
+
+    stack_name = to_stack_name(event['detail']['stack-id'])
+    status = event['detail']['status-details']['status']
+
+    if not is_settled(status):
+        logger.debug('Ignoring status %s of stack %s', status, stack_name)
+        return
+
+    tenant_id = tenant_id_from_stack_name(parent_stack_name, stack_name)
+    if not tenant_id:
+        logger.info('Ignoring stack %s, which is not a tenant stack', stack_name)
+        return
+
+    task_token = get_stack_task_token(table, tenant_id)
+    if not task_token or task_token['StackName'] != stack_name:
+        # Nothing is waiting on this stack, e.g. the step function is polling instead
+        logger.info('No step function is waiting on stack %s', stack_name)
+        return
+
+    logger.info('Stack %s settled with status %s, resuming step function', stack_name, status)
+    complete_stack_task(table, sfn_client, tenant_id, task_token['TaskToken'], status)
+    record_stack_completion(table, tenant_id, task_token['Execution'], task_token.get('Operation'),
+                            task_token.get('StartedAt'), status)
@@ -8,6 +8,8 @@ class EventBridgeFailure:
     error_code: str
     error_message: str
     event: dict
+    # Position of the event in the request, as PutEvents returns results in request order
+    index: int
 
 
 def send_events_to_eventbridge(eb_client, events: list[dict]) -> list[EventBridgeFailure]:
@@ -24,5 +26,6 @@ def _handle_eventbridge_failures(events: list[dict], response: list[dict]) -> li
             error_code=r['ErrorCode'],
             error_message=r['ErrorMessage'],
             event=e,
-        ) for e, r in zip(events, response) if 'ErrorCode' in r
+            index=i,
+        ) for i, (e, r) in enumerate(zip(events, response)) if 'ErrorCode' in r
     ]
@@ -0,0 +1,118 @@
+""" Tenants whose resources are behind the current stack version, and the progress of upgrading them """
+
+from typing import Optional
+
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.queues import MAX_KEYS_PER_BATCH, VERSION_INDEX, StepFunctionAction
+from common.data.stack_versions import get_stack_versions
+
+
+def get_tenants_to_upgrade(table,
+                           version: str,
+                           page_size: int,
+                           start_key: Optional[dict] = None,
+                           use_version_index: bool = False) -> tuple[dict[str, str], Optional[dict]]:
+    """
+    Reads one page of the tenants whose METADATA row is not at the given version. Once MetadataVersion has been
+    backfilled, the version index is queried for each older version, so only those tenants are read. Until then, the
+    table is scanned.
+
+    :param page_size: the number of rows to read, not the number of tenants to return
+    :param start_key: where the previous page ended
+    :param use_version_index: whether MetadataVersion has been backfilled, so that every tenant is in the version index
+    :return: the version of each tenant found, and where the page ended, or None if this was the last page
+    """
+    if use_version_index:
+        return _query_stale_versions(table, version, page_size, start_key)
+
+    scan_args = {
+        'FilterExpression': 'sk = :sk AND Version <> :version',
+        'ProjectionExpression': 'pk, Version',
+        'ExpressionAttributeValues': {
+            ':sk': 'METADATA',
+            ':version': version,
+        },
+        'Limit': page_size,
+    }
+    if start_key:
+        scan_args['ExclusiveStartKey'] = start_key
+
+    response = table.scan(**scan_args)
+    tenants = {
+        item['pk'].removeprefix('TENANT_ID#'): item['Version']
+        for item in response['Items']
+    }
+    return tenants, response.get('LastEvaluatedKey')
+
+
+def _query_stale_versions(table, version: str, page_size: int,
+                          start_key: Optional[dict]) -> tuple[dict[str, str], Optional[dict]]:
+    """
+    Queries the version index for each registered version other than the given one, in version order, until a page of
+    rows has been read. A start key without a pk starts at the beginning of its version.
+    """
+    stale_versions = [stale_version for stale_version in get_stack_versions(table) if stale_version != version]
+    if start_key:
+        stale_versions = [
+            stale_version for stale_version in stale_versions if stale_version >= start_key['MetadataVersion']
+        ]
+
+    tenants: dict[str, str] = {}
+    for index, stale_version in enumerate(stale_versions):
+        query_args = {
+            'IndexName': VERSION_INDEX,
+            'KeyConditionExpression': 'MetadataVersion = :version',
+            'ProjectionExpression': 'pk, MetadataVersion',
+            'ExpressionAttributeValues': {
+                ':version': stale_version
+            },
+            'Limit': page_size - len(tenants),
+        }
+        if start_key and 'pk' in start_key and start_key['MetadataVersion'] == stale_version:
+            query_args['ExclusiveStartKey'] = start_key
+
+        response = table.query(**query_args)
+        tenants.update((item['pk'].removeprefix('TENANT_ID#'), stale_version) for item in response['Items'])
+        if 'LastEvaluatedKey' in response:
+            return tenants, response['LastEvaluatedKey']
+
+        if len(tenants) >= page_size:
+            next_versions = stale_versions[index + 1:]
+            return tenants, ({
+                'MetadataVersion': next_versions[0]
+            } if next_versions else None)
+
+    return tenants, None
+
+
+def get_upgrade_statuses(dynamodb, table, tenant_ids: list[str], version: str) -> dict[str, str]:
+    """
+    Gets the status of each tenant's upgrade to the given version, from the audit rows the update step function writes
+
+    :param dynamodb: the DynamoDB service resource
+    :return: the status of each tenant with an audit row
+    """
+    statuses = {}
+    for offset in range(0, len(tenant_ids), MAX_KEYS_PER_BATCH):
+        request_items = {
+            table.name: {
+                'Keys': [{
+                    'pk': f'TENANT_ID#{tenant_id}',
+                    'sk': f'AUDIT#{StepFunctionAction.UPDATE}#{version}',
+                } for tenant_id in tenant_ids[offset:offset + MAX_KEYS_PER_BATCH]],
+                'ProjectionExpression': 'pk, #status',
+                'ExpressionAttributeNames': {
+                    '#status': 'Status'
+                },
+            }
+        }
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response['Responses'].get(table.name, []):
+                statuses[item['pk'].removeprefix('TENANT_ID#')] = item['Status']
+            request_items = response.get('UnprocessedKeys')
+            if request_items:
+                logger.info('DataLayer: Retrying %d unprocessed audit rows', len(request_items[table.name]['Keys']))
+
+    return statuses
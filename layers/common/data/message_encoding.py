@@ -0,0 +1,58 @@
+""" Encoding of message bodies delivered to tenant inbound queues """
+
+import base64
+import gzip
+from enum import Enum
+
+# SQS message attribute telling the consumer how the body was encoded. Bodies without this attribute are plain JSON.
+CONTENT_ENCODING_ATTRIBUTE = 'ContentEncoding'
+
+# Compressing tiny bodies isn't worth it; base64 adds a third to the size, which can outweigh the gzip savings.
+MIN_COMPRESSED_BODY_BYTES = 1024
+
+
+class MessageEncoding(Enum):
+    IDENTITY = 'identity'
+    GZIP = 'gzip'
+
+    @staticmethod
+    def from_string(label: str):
+        lc_label = label.lower()
+        for encoding in MessageEncoding:
+            if encoding.value == lc_label:
+                return encoding
+        raise ValueError('Unknown message encoding: ' + label)
+
+
+def encode_message_body(body: str, encoding: MessageEncoding) -> tuple[str, dict]:
+    """
+    Encodes a message body using the tenant's negotiated encoding.
+
+    :return: the body to send, and the SQS message attributes describing its encoding
+    """
+    raw_body = body.encode('utf-8')
+    if encoding == MessageEncoding.IDENTITY or len(raw_body) < MIN_COMPRESSED_BODY_BYTES:
+        return body, {}
+
+    compressed_body = base64.b64encode(gzip.compress(raw_body)).decode('ascii')
+    return compressed_body, {
+        CONTENT_ENCODING_ATTRIBUTE: {
+            'DataType': 'String',
+            'StringValue': encoding.value,
+        }
+    }
+
+
+def decode_message_body(body: str, attributes: dict) -> str:
+    """
+    Reverses encode_message_body, given the SQS message attributes the message was received with.
+    """
+    encoding_attribute = attributes.get(CONTENT_ENCODING_ATTRIBUTE)
+    if not encoding_attribute:
+        return body
+
+    # Lambda event records use camelCase keys, while the SQS API uses PascalCase
+    label = encoding_attribute.get('StringValue') or encoding_attribute.get('stringValue')
+    if MessageEncoding.from_string(label) == MessageEncoding.GZIP:
+        return gzip.decompress(base64.b64decode(body)).decode('utf-8')
+    return body
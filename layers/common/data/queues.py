@@ -1,13 +1,34 @@
 import json
+import time
 import uuid
-from dataclasses import dataclass
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from enum import Enum
-from typing import Optional
+from typing import Any, Optional
 
 from bb_ent_data_services_shared.lambdas.logger import logger
 
-from common.dates import parse_iso8601_date
+from common.data.message_encoding import MessageEncoding
+from common.dates import format_iso8601_date, parse_iso8601_date
+
+# Sparse index of METADATA rows by their MetadataVersion, a copy of Version only METADATA rows have. Audit rows also
+# have a Version, so it can't be the key.
+VERSION_INDEX = 'VersionIndex'
+
+# Sparse index of audit rows whose execution is still running, by their InFlight action and UpdatedAt. The action is
+# removed when the execution records its outcome.
+IN_FLIGHT_INDEX = 'InFlightIndex'
+
+# BatchGetItem accepts at most 100 keys per request
+MAX_KEYS_PER_BATCH = 100
+BATCH_GET_WORKERS = 4
+# Keys left unprocessed by throttling are retried after 50ms, then twice as long each time, up to about a second in all
+BATCH_GET_MAX_ATTEMPTS = 5
+BATCH_GET_BACKOFF_SECONDS = 0.05
+
+# How long a request's claim to start a creation attempt holds off other requests
+CREATE_CLAIM_SECONDS = 60
 
 
 class QueueType(Enum):
@@ -49,6 +70,8 @@ class Queue:
     url: str
     created_date: Optional[str]
     modified_date: Optional[str]
+    encoding: MessageEncoding = MessageEncoding.IDENTITY
+    version: Optional[str] = None
 
 
 @dataclass
@@ -58,6 +81,19 @@ class AuditInformation:
     retry_count: int = 0
 
 
+class UnprocessedTenants(Exception):
+    """ Raised when some tenants' rows are still unprocessed after every attempt to read them """
+    def __init__(self, tenant_ids: list[str]):
+        super().__init__(f'{len(tenant_ids)} tenants could not be read')
+        self.tenant_ids = tenant_ids
+
+
+@dataclass
+class TenantQueues:
+    queues: list[Queue] = field(default_factory=list)
+    delete_status: Optional[str] = None
+
+
 def get_metadata(table, tenant_id: str) -> Optional[dict]:
     query_response = table.get_item(Key={
         'pk': f"TENANT_ID#{tenant_id}",
@@ -79,6 +115,41 @@ def get_queue(table, tenant_id: str, queue_type: QueueType) -> Optional[Queue]:
     return item_to_queue(tenant_id, metadata, queue_type)
 
 
+def wait_for_queue(table, tenant_id: str, queue_type: QueueType, timeout_seconds: float,
+                   poll_seconds: float) -> Optional[Queue]:
+    """
+    Waits for a tenant's queue to be provisioned, reading its METADATA and AUDIT#CREATE rows together until the queue
+    exists or the create finishes without one.
+
+    :return: the queue, or None if it was not provisioned in time
+    """
+    logger.info('DataLayer: Waiting up to %.1f seconds for tenant %s to be provisioned', timeout_seconds, tenant_id)
+    deadline = time.monotonic() + timeout_seconds
+    keys = [{
+        'pk': f"TENANT_ID#{tenant_id}",
+        'sk': sort_key,
+    } for sort_key in ['METADATA', f'AUDIT#{StepFunctionAction.CREATE}']]
+
+    while True:
+        # Provisioning writes METADATA before recording Success, so consistent reads never see Success alone
+        response = table.meta.client.batch_get_item(RequestItems={
+            table.name: {
+                'Keys': keys,
+                'ConsistentRead': True,
+            }
+        })
+        items = dict((item['sk'], item) for item in response['Responses'].get(table.name, []))
+        if metadata := items.get('METADATA'):
+            return item_to_queue(tenant_id, metadata, queue_type)
+        # Unprocessed keys are simply read again on the next attempt
+        if items.get(f'AUDIT#{StepFunctionAction.CREATE}', {}).get('Status') in ['Success', 'Failure']:
+            return None
+
+        if time.monotonic() + poll_seconds > deadline:
+            return None
+        time.sleep(poll_seconds)
+
+
 def get_shared_outbound_queue(tenant_id: str, outbound_queue_arn: str, outbound_queue_url: str) -> Queue:
     # We have a central queue for all events outbound from Learn
     return Queue(tenant_id=tenant_id,
@@ -105,6 +176,64 @@ def get_queues(table, tenant_id: str) -> list[Queue]:
     return item_to_queues(tenant_id, metadata)
 
 
+def batch_get_queues(table, tenant_ids: list[str], max_workers: int = BATCH_GET_WORKERS) -> dict[str, TenantQueues]:
+    """
+    Gets the queues of many tenants, and the status of their deletion, at once. Each tenant's METADATA and AUDIT#DELETE
+    rows are read with BatchGetItem, with the batches read concurrently.
+
+    :param tenant_ids: tenants to look up, without duplicates
+    :return: the queues of each tenant; tenants without a METADATA row have no queues
+    :raises UnprocessedTenants: if throttling left some tenants unread
+    """
+    logger.info('DataLayer: Seeking queues for %d tenants', len(tenant_ids))
+
+    tenants_per_batch = MAX_KEYS_PER_BATCH // 2
+    batches = [tenant_ids[offset:offset + tenants_per_batch] for offset in range(0, len(tenant_ids), tenants_per_batch)]
+    results = dict((tenant_id, TenantQueues()) for tenant_id in tenant_ids)
+    # The resource's client is thread-safe, unlike the table itself
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for items in executor.map(lambda batch: _batch_get_tenant_rows(table, batch), batches):
+            for item in items:
+                tenant_id = item['pk'].removeprefix('TENANT_ID#')
+                if item['sk'] == 'METADATA':
+                    results[tenant_id].queues = item_to_queues(tenant_id, item)
+                else:
+                    results[tenant_id].delete_status = item['Status']
+    return results
+
+
+def _batch_get_tenant_rows(table, tenant_ids: list[str]) -> list[dict]:
+    sort_keys = ['METADATA', f'AUDIT#{StepFunctionAction.DELETE}']
+    request_items: dict[str, Any] = {
+        table.name: {
+            'Keys': [{
+                'pk': f'TENANT_ID#{tenant_id}',
+                'sk': sort_key
+            } for tenant_id in tenant_ids for sort_key in sort_keys],
+            'ProjectionExpression': ('pk, sk, InboundQueueArn, InboundQueueUrl, OutboundQueueArn, OutboundQueueUrl, '
+                                     'MessageEncoding, CreatedAt, UpdatedAt, Version, #status'),
+            'ExpressionAttributeNames': {
+                '#status': 'Status'
+            },
+        }
+    }
+
+    items = []
+    for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(BATCH_GET_BACKOFF_SECONDS * 2**(attempt - 1))
+        response = table.meta.client.batch_get_item(RequestItems=request_items)
+        items.extend(response['Responses'].get(table.name, []))
+        request_items = response.get('UnprocessedKeys')
+        if not request_items:
+            return items
+        logger.info('DataLayer: %d tenant rows unprocessed', len(request_items[table.name]['Keys']))
+
+    unprocessed = list(dict.fromkeys(key['pk'].removeprefix('TENANT_ID#') for key in request_items[table.name]['Keys']))
+    logger.warning('DataLayer: Gave up reading %d tenants after %d attempts', len(unprocessed), BATCH_GET_MAX_ATTEMPTS)
+    raise UnprocessedTenants(unprocessed)
+
+
 def _get_audit_information(table, tenant_id: str, action: StepFunctionAction, version=None) -> Optional[dict]:
     if action == StepFunctionAction.UPDATE:
         assert version, "Version is required"
@@ -135,15 +264,81 @@ def get_status_and_retry_information(table,
     return AuditInformation()
 
 
-def create_queues(sfn_client, provision_arn: str, tenant_id: str, client_id: str, retry_count: int = 0):
-    """ Create a queue for a given tenant and type """
-    sfn_client.start_execution(stateMachineArn=provision_arn,
-                               input=json.dumps({
-                                   'tenantId': tenant_id,
-                                   'currentCount': str(retry_count),
-                                   'retryCount': str(retry_count + 1),
-                                   "clientId": client_id,
-                               }))
+def set_message_encoding(table, tenant_id: str, encoding: MessageEncoding) -> None:
+    """ Records the body encoding a tenant has negotiated for its inbound queue """
+    logger.info('DataLayer: Setting message encoding for tenant %s to %s', tenant_id, encoding.value)
+    table.update_item(
+        Key={
+            'pk': f"TENANT_ID#{tenant_id}",
+            'sk': "METADATA",
+        },
+        UpdateExpression='SET MessageEncoding = :encoding, UpdatedAt = :updatedAt',
+        ExpressionAttributeValues={
+            ':encoding': encoding.value,
+            ':updatedAt': format_iso8601_date(datetime.now()),
+        },
+        # Never create a partial metadata row; the queue must have been provisioned first
+        ConditionExpression='attribute_exists(pk)',
+    )
+
+
+def create_queues(sfn_client, table, provision_arn: str, tenant_id: str, client_id: str, retry_count: int = 0) -> bool:
+    """
+    Create a queue for a given tenant and type. Several requests for a new tenant may arrive at once, so each attempt is
+    claimed before its execution is started, and the execution is named after the attempt.
+
+    :param retry_count: the number of attempts that have failed before this one
+    :return: whether this call started the attempt, rather than another request
+    """
+    if not _claim_create(table, tenant_id, retry_count):
+        logger.info('DataLayer: Creation attempt %d for tenant %s already claimed', retry_count, tenant_id)
+        return False
+
+    execution_input = json.dumps({
+        'tenantId': tenant_id,
+        'currentCount': str(retry_count),
+        'retryCount': str(retry_count + 1),
+        "clientId": client_id,
+    })
+    try:
+        # Starting an execution with the name and input of a running one starts nothing new
+        sfn_client.start_execution(stateMachineArn=provision_arn,
+                                   name=f'{tenant_id}-{retry_count}',
+                                   input=execution_input)
+    except sfn_client.exceptions.ExecutionAlreadyExists:
+        # The claim guarantees no other request is starting this attempt, so the name was used by a tenant whose rows
+        # have since been removed, e.g. by an operator resetting it
+        logger.warning('DataLayer: Creation attempt %d for tenant %s was run before; starting it afresh', retry_count,
+                       tenant_id)
+        sfn_client.start_execution(stateMachineArn=provision_arn,
+                                   name=f'{tenant_id}-{retry_count}-{str(uuid.uuid4())[:8]}',
+                                   input=execution_input)
+    return True
+
+
+def _claim_create(table, tenant_id: str, attempt: int) -> bool:
+    """
+    Claims a creation attempt with a conditional write. A claim lapses after CREATE_CLAIM_SECONDS, long after its
+    execution would have written the audit row, in case the request holding it failed before starting the execution.
+    """
+    now = datetime.now()
+    try:
+        table.put_item(
+            Item={
+                'pk': f"TENANT_ID#{tenant_id}",
+                'sk': f"CLAIM#{StepFunctionAction.CREATE}",
+                'Attempt': attempt,
+                'ClaimedAt': format_iso8601_date(now),
+            },
+            ConditionExpression='attribute_not_exists(pk) OR Attempt < :attempt OR ClaimedAt < :lapsed',
+            ExpressionAttributeValues={
+                ':attempt': attempt,
+                ':lapsed': format_iso8601_date(now - timedelta(seconds=CREATE_CLAIM_SECONDS)),
+            },
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
 
 
 def delete_queues(sfn_client, delete_arn, tenant_id: str) -> None:
@@ -206,13 +401,20 @@ def item_to_queue(tenant_id: str, queue_dict: dict, queue_type: QueueType) -> Op
     if queue_type == QueueType.Outbound and 'OutboundQueueArn' not in queue_dict:
         return None
 
+    # Only the tenant's inbound queue is written by us, so it is the only one that may be encoded
+    encoding = MessageEncoding.IDENTITY
+    if queue_type == QueueType.Inbound and 'MessageEncoding' in queue_dict:
+        encoding = MessageEncoding.from_string(queue_dict['MessageEncoding'])
+
     return Queue(
         tenant_id=tenant_id,
         queue_type=queue_type,
         sqs_arn=queue_dict['InboundQueueArn'] if queue_type == QueueType.Inbound else queue_dict['OutboundQueueArn'],
         url=queue_dict['InboundQueueUrl'] if queue_type == QueueType.Inbound else queue_dict['OutboundQueueUrl'],
         created_date=queue_dict['CreatedAt'],
-        modified_date=queue_dict.get('UpdatedAt'))
+        modified_date=queue_dict.get('UpdatedAt'),
+        encoding=encoding,
+        version=queue_dict.get('Version'))
 
 
 def item_to_queues(tenant_id, queue_dict) -> list[Queue]:
@@ -0,0 +1,51 @@
+""" The tenant stack template, and how CloudFormation calls refer to it """
+
+import hashlib
+from typing import Optional
+
+# Parameter recording which template a tenant stack was last deployed with
+TEMPLATE_HASH_PARAMETER = 'TemplateHash'
+
+# Only stacks in these statuses reflect the template and parameters they were last deployed with
+STABLE_STATUSES = {
+    'CREATE_COMPLETE',
+    'UPDATE_COMPLETE',
+}
+
+
+class StackTemplate:
+    """
+    A tenant stack template staged in S3 by content hash, so CloudFormation calls only need its URL. Without a URL, as
+    when running locally or in tests, the full template body is sent instead.
+    """
+    def __init__(self, body: str, url: Optional[str] = None):
+        self.body = body
+        self.url = url
+        self.hash = hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+    def template_args(self) -> dict[str, str]:
+        """ The arguments of CreateStack and UpdateStack specifying the template """
+        if self.url:
+            return {
+                'TemplateURL': self.url
+            }
+        return {
+            'TemplateBody': self.body
+        }
+
+
+def is_stack_up_to_date(stack, parameters: dict[str, str], tags: dict[str, str]) -> bool:
+    """
+    Whether updating the stack would change nothing, as it's settled with the same template, parameters and tags.
+    CloudFormation rejects such updates.
+
+    :param stack: the stack, as a CloudFormation resource
+    :param parameters: the parameters of the update, including the template hash
+    :param tags: the tags of the update
+    """
+    if stack.stack_status not in STABLE_STATUSES:
+        return False
+
+    current_parameters = dict((p['ParameterKey'], p['ParameterValue']) for p in (stack.parameters or []))
+    current_tags = dict((t['Key'], t['Value']) for t in (stack.tags or []))
+    return current_parameters == parameters and current_tags == tags
@@ -0,0 +1,39 @@
+""" The tenant stack versions METADATA rows have been written with, so the tenants on each can be queried by version """
+
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+STACK_VERSION_PARTITION_KEY = 'STACK_VERSION'
+
+# Versions this container has already registered, so each tenant write doesn't cost another one
+_registered_versions: set[str] = set()
+
+
+def register_stack_version(table, version: str):
+    """ Records a version before METADATA rows are written with it. Safe to repeat. """
+    if version in _registered_versions:
+        return
+
+    logger.info('DataLayer: Registering stack version %s', version)
+    table.put_item(Item={
+        'pk': STACK_VERSION_PARTITION_KEY,
+        'sk': version,
+    })
+    _registered_versions.add(version)
+
+
+def get_stack_versions(table) -> list[str]:
+    """ Every registered version, in sort key order """
+    versions: list[str] = []
+    query_args = {
+        'KeyConditionExpression': 'pk = :pk',
+        'ExpressionAttributeValues': {
+            ':pk': STACK_VERSION_PARTITION_KEY
+        },
+        'ProjectionExpression': 'sk',
+    }
+    while True:
+        response = table.query(**query_args)
+        versions.extend(item['sk'] for item in response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return versions
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,225 @@
+""" Tenant CloudFormation stack statuses, and the task tokens of step functions waiting on them """
+
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Optional
+
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.dates import format_iso8601_date, parse_iso8601_date
+
+FAILURE_STATUSES = {
+    'CREATE_FAILED',
+    'ROLLBACK_FAILED',
+    'ROLLBACK_COMPLETE',
+    'DELETE_FAILED',
+    'UPDATE_ROLLBACK_FAILED',
+    'UPDATE_ROLLBACK_COMPLETE',
+    'IMPORT_ROLLBACK_FAILED',
+    'IMPORT_ROLLBACK_COMPLETE',
+}
+
+# Tenant stacks are created with OnFailure=DELETE, so CloudFormation always follows these statuses with a delete
+AUTO_CLEANUP_STATUSES = {
+    'CREATE_FAILED',
+}
+
+STACK_TASK_TOKEN_SORT_KEY = 'STACK_TASK_TOKEN'
+# The tenant's last stack operation counted in the stack stats, so each execution is only counted once
+LAST_STACK_OPERATION_SORT_KEY = 'LAST_STACK_OPERATION'
+
+STACK_STATS_PARTITION_KEY = 'STACK_STATS'
+
+MIN_POLL_SECONDS = 5
+MAX_POLL_SECONDS = 60
+
+
+def stack_status_result(status: str, next_poll_seconds: int = MIN_POLL_SECONDS) -> dict:
+    """ The result step functions use to decide what to do after checking a stack's status """
+    return {
+        'status': status,
+        'isComplete': ('IN_PROGRESS' not in status),
+        'isFailure': (status in FAILURE_STATUSES),
+        'nextPollSeconds': next_poll_seconds,
+    }
+
+
+def recommend_next_poll_seconds(status: str, elapsed_seconds: float, typical_seconds: Optional[float],
+                                default_seconds: int) -> int:
+    """
+    Recommends how long a step function should wait before checking the stack's status again. Polls get more frequent
+    as the stack approaches its typical completion time, waiting half of the expected remaining time, then back off
+    the longer the stack overruns it.
+
+    :param status: the current stack status
+    :param elapsed_seconds: how long the stack operation has been running
+    :param typical_seconds: how long the stack operation typically takes, if known
+    :param default_seconds: the delay to use when the typical duration isn't known yet
+    """
+    seconds: float
+    if status.endswith('_CLEANUP_IN_PROGRESS'):
+        # The stack has finished changing, and is only removing old resources
+        seconds = MIN_POLL_SECONDS
+    elif typical_seconds is None:
+        seconds = default_seconds
+    else:
+        seconds = abs(typical_seconds - elapsed_seconds) / 2
+
+    return int(min(max(seconds, MIN_POLL_SECONDS), MAX_POLL_SECONDS))
+
+
+def get_typical_stack_seconds(table, operation: str) -> Optional[float]:
+    """ The mean duration of the stack operation, across all tenants """
+    response = table.get_item(Key={
+        'pk': STACK_STATS_PARTITION_KEY,
+        'sk': operation,
+    })
+    item = response.get('Item')
+    if not item or not item.get('CompletedCount'):
+        return None
+    return float(item['TotalSeconds'] / item['CompletedCount'])
+
+
+def record_stack_seconds(table, tenant_id: str, execution: str, operation: str, seconds: float) -> bool:
+    """
+    Adds a completed stack operation to its typical duration. Concurrent step functions can't lose updates, and each
+    execution is only counted once, however many times its completion is reported, e.g. by a retried status check.
+
+    :return: False if the execution's stack operation had already been recorded
+    """
+    logger.info('DataLayer: Recording %s stack operation took %d seconds', operation, seconds)
+    try:
+        table.meta.client.transact_write_items(TransactItems=[{
+            'Put': {
+                'TableName': table.name,
+                'Item': {
+                    'pk': f'TENANT_ID#{tenant_id}',
+                    'sk': LAST_STACK_OPERATION_SORT_KEY,
+                    'Execution': execution,
+                    'Operation': operation,
+                    'Seconds': Decimal(int(seconds)),
+                },
+                'ConditionExpression': 'attribute_not_exists(pk) OR Execution <> :execution',
+                'ExpressionAttributeValues': {
+                    ':execution': execution
+                },
+            }
+        }, {
+            'Update': {
+                'TableName': table.name,
+                'Key': {
+                    'pk': STACK_STATS_PARTITION_KEY,
+                    'sk': operation,
+                },
+                'UpdateExpression': 'ADD CompletedCount :one, TotalSeconds :seconds',
+                'ExpressionAttributeValues': {
+                    ':one': 1,
+                    ':seconds': Decimal(int(seconds)),
+                },
+            }
+        }])
+    except table.meta.client.exceptions.TransactionCanceledException as e:
+        if e.response['CancellationReasons'][0].get('Code') != 'ConditionalCheckFailed':
+            raise
+        logger.info('DataLayer: %s stack operation of execution %s was already recorded', operation, execution)
+        return False
+    return True
+
+
+def record_stack_completion(table, tenant_id: str, execution: str, operation: Optional[str], started_at: Optional[str],
+                            status: str):
+    """ Records the duration of a stack operation reported by a status change, if it completed successfully """
+    if not operation or not started_at or status != f'{operation}_COMPLETE':
+        return
+    # Slightly overestimates the duration, by however long the status took to be reported
+    elapsed_seconds = (datetime.now(timezone.utc) - parse_iso8601_date(started_at)).total_seconds()
+    record_stack_seconds(table, tenant_id, execution, operation, elapsed_seconds)
+
+
+def is_settled(status: str) -> bool:
+    """ Whether the stack has finished changing, so a step function waiting on it can be resumed """
+    return 'IN_PROGRESS' not in status and status not in AUTO_CLEANUP_STATUSES
+
+
+def tenant_id_from_stack_name(parent_stack_name: str, stack_name: str) -> Optional[str]:
+    prefix = f'{parent_stack_name}-'
+    if not stack_name.startswith(prefix):
+        return None
+    return stack_name[len(prefix):]
+
+
+def to_stack_name(stack_name_or_id: str) -> str:
+    """ Gets the name of a stack, given either its name or its ID """
+    if not stack_name_or_id.startswith('arn:'):
+        return stack_name_or_id
+    # arn:aws:cloudformation:{region}:{account}:stack/{stack name}/{uuid}
+    return stack_name_or_id.split(':')[-1].split('/')[1]
+
+
+def put_stack_task_token(table,
+                         tenant_id: str,
+                         stack_name: str,
+                         task_token: str,
+                         execution: str,
+                         operation: Optional[str] = None,
+                         started_at: Optional[str] = None):
+    """
+    Registers the task token of a step function waiting for the tenant's stack to settle. A tenant only has one stack,
+    so a newer execution replaces the token of an older one, which then falls back to polling when its wait times out.
+
+    :param operation: the stack operation being waited on, and started_at when its execution started, so the listener
+        can record how long it took
+    """
+    stack_name = to_stack_name(stack_name)
+    logger.info('DataLayer: Registering task token for stack %s', stack_name)
+    item = {
+        'pk': f'TENANT_ID#{tenant_id}',
+        'sk': STACK_TASK_TOKEN_SORT_KEY,
+        'StackName': stack_name,
+        'TaskToken': task_token,
+        'Execution': execution,
+        'CreatedAt': format_iso8601_date(datetime.now()),
+    }
+    if operation and started_at:
+        item['Operation'] = operation
+        item['StartedAt'] = started_at
+    table.put_item(Item=item)
+
+
+def get_stack_task_token(table, tenant_id: str) -> Optional[dict]:
+    response = table.get_item(Key={
+        'pk': f'TENANT_ID#{tenant_id}',
+        'sk': STACK_TASK_TOKEN_SORT_KEY,
+    })
+    return response.get('Item')
+
+
+def complete_stack_task(table, sfn_client, tenant_id: str, task_token: str, status: str) -> bool:
+    """
+    Resumes the step function waiting on the tenant's stack, and removes its task token.
+
+    :return: False if the step function was no longer waiting, e.g. if it was already resumed or its wait timed out
+    """
+    completed = True
+    try:
+        sfn_client.send_task_success(taskToken=task_token, output=json.dumps(stack_status_result(status)))
+    except (sfn_client.exceptions.InvalidToken, sfn_client.exceptions.TaskDoesNotExist,
+            sfn_client.exceptions.TaskTimedOut):
+        logger.info('Step function for tenant %s is no longer waiting on its stack', tenant_id)
+        completed = False
+
+    key = {
+        'pk': f'TENANT_ID#{tenant_id}',
+        'sk': STACK_TASK_TOKEN_SORT_KEY,
+    }
+    values = {
+        ':taskToken': task_token
+    }
+    try:
+        # Leave the token alone if a newer execution has replaced it
+        table.delete_item(Key=key, ConditionExpression='TaskToken = :taskToken', ExpressionAttributeValues=values)
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+    return completed
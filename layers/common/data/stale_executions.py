@@ -0,0 +1,81 @@
+""" Audit rows left in progress by tenant step function executions that have been running for longer than expected """
+
+from datetime import datetime
+from typing import Optional
+
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.queues import IN_FLIGHT_INDEX, StepFunctionAction
+from common.dates import format_iso8601_date
+
+# The audit row status recorded for each way an execution can finish. Executions that are still running, or waiting to
+# be redriven, have no outcome yet.
+EXECUTION_OUTCOMES = {
+    'SUCCEEDED': 'Success',
+    'FAILED': 'Failure',
+    'TIMED_OUT': 'Failure',
+    'ABORTED': 'Failure',
+}
+
+
+def get_stale_audit_rows(table, action: StepFunctionAction, updated_before: datetime) -> list[dict]:
+    """ Gets the in-progress audit rows of the action not updated since the given time, least recently updated first """
+    items = []
+    query_args = {
+        'IndexName': IN_FLIGHT_INDEX,
+        'KeyConditionExpression': 'InFlight = :action AND UpdatedAt < :updatedBefore',
+        'ExpressionAttributeValues': {
+            ':action': str(action),
+            ':updatedBefore': format_iso8601_date(updated_before),
+        },
+    }
+    while True:
+        response = table.query(**query_args)
+        items.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def get_execution_outcome(sfn_client, execution_arn: str) -> Optional[str]:
+    """
+    Gets the audit row status the execution should have recorded
+
+    :return: Success or Failure, or None if the execution is still running
+    """
+    try:
+        status = sfn_client.describe_execution(executionArn=execution_arn)['status']
+    except sfn_client.exceptions.ExecutionDoesNotExist:
+        # Step Functions only keeps executions for 90 days after they finish, so it's long gone
+        logger.info('Execution %s no longer exists', execution_arn)
+        return 'Failure'
+    return EXECUTION_OUTCOMES.get(status)
+
+
+def record_execution_outcome(table, audit_row: dict, status: str) -> bool:
+    """
+    Records the outcome of a finished execution on its audit row, taking the row out of the in-flight index
+
+    :return: False if the row has changed since it was read, e.g. a new execution has taken it over
+    """
+    logger.info('DataLayer: Setting status of %s %s to %s', audit_row['pk'], audit_row['sk'], status)
+    try:
+        table.update_item(
+            Key={
+                'pk': audit_row['pk'],
+                'sk': audit_row['sk'],
+            },
+            UpdateExpression='SET #status = :status, UpdatedAt = :updatedAt REMOVE InFlight',
+            ConditionExpression='attribute_exists(InFlight) AND Execution = :execution',
+            ExpressionAttributeNames={
+                '#status': 'Status'
+            },
+            ExpressionAttributeValues={
+                ':status': status,
+                ':updatedAt': format_iso8601_date(datetime.now()),
+                ':execution': audit_row['Execution'],
+            },
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
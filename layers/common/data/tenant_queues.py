@@ -0,0 +1,178 @@
+""" Tenant inbound queues managed directly through the SQS API, rather than by a tenant stack """
+
+import json
+from datetime import datetime
+from typing import Any, Optional, TypeGuard
+
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.queues import VERSION_INDEX
+from common.data.stack_versions import register_stack_version
+from common.dates import format_iso8601_date
+
+CLOUDFORMATION_PROVISIONER = 'CloudFormation'
+# METADATA rows of tenants whose inbound queue isn't part of a tenant stack have their Provisioner set to this
+DIRECT_PROVISIONER = 'Direct'
+
+
+def is_directly_provisioned(metadata: Optional[dict]) -> TypeGuard[dict]:
+    return metadata is not None and metadata.get('Provisioner') == DIRECT_PROVISIONER
+
+
+def tenant_tags(stack_tags: dict[str, str], tenant_id: str, client_id: str) -> dict[str, str]:
+    """ The tags of a tenant's resources, matching those deploy_stack puts on tenant stacks """
+    return {
+        **stack_tags,
+        'TenantId': tenant_id,
+        'ClientId': client_id,
+    }
+
+
+def inbound_queue_attributes(inbound_dlq_arn: str) -> dict[str, str]:
+    """ Must match the InboundQueue defined in the tenant stack template """
+    return {
+        'KmsMasterKeyId': 'alias/aws/sqs',
+        'MessageRetentionPeriod': '1209600',
+        'VisibilityTimeout': '900',
+        'RedrivePolicy': json.dumps({
+            'deadLetterTargetArn': inbound_dlq_arn,
+            'maxReceiveCount': 10,
+        }),
+    }
+
+
+def create_inbound_queue(sqs_client, queue_name: str, inbound_dlq_arn: str, tags: dict[str, str]) -> tuple[str, str]:
+    """
+    Creates an inbound queue, or reconciles an existing one with the same name
+
+    :return: the URL and ARN of the queue
+    """
+    logger.info('Creating inbound queue %s', queue_name)
+    try:
+        queue_url = sqs_client.create_queue(QueueName=queue_name,
+                                            Attributes=inbound_queue_attributes(inbound_dlq_arn),
+                                            tags=tags)['QueueUrl']
+    except sqs_client.exceptions.QueueNameExists:
+        # Created by an earlier attempt, but with attributes that have changed since
+        queue_url = sqs_client.get_queue_url(QueueName=queue_name)['QueueUrl']
+        reconcile_inbound_queue(sqs_client, queue_url, inbound_dlq_arn, tags)
+
+    response = sqs_client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['QueueArn'])
+    return queue_url, response['Attributes']['QueueArn']
+
+
+def reconcile_inbound_queue(sqs_client, queue_url: str, inbound_dlq_arn: str, tags: dict[str, str]):
+    """ Brings an existing inbound queue's attributes and tags up to date """
+    logger.info('Reconciling inbound queue %s', queue_url)
+    sqs_client.set_queue_attributes(QueueUrl=queue_url, Attributes=inbound_queue_attributes(inbound_dlq_arn))
+    retag_queue(sqs_client, queue_url, tags)
+
+
+def retag_queue(sqs_client, queue_url: str, tags: dict[str, str]):
+    """ Replaces all tags on the queue """
+    current_tags = sqs_client.list_queue_tags(QueueUrl=queue_url).get('Tags', {})
+    stale_keys = [key for key in current_tags if key not in tags]
+    if stale_keys:
+        sqs_client.untag_queue(QueueUrl=queue_url, TagKeys=stale_keys)
+    sqs_client.tag_queue(QueueUrl=queue_url, Tags=tags)
+
+
+def delete_inbound_queue(sqs_client, queue_url: str):
+    logger.info('Deleting inbound queue %s', queue_url)
+    try:
+        sqs_client.delete_queue(QueueUrl=queue_url)
+    except sqs_client.exceptions.QueueDoesNotExist:
+        logger.info('Inbound queue %s was already deleted', queue_url)
+
+
+def put_direct_metadata(table, tenant_id: str, client_id: str, version: str, queue_url: str, queue_arn: str):
+    """
+    Creates or updates the METADATA row of a directly provisioned tenant. Safe to repeat, and keeps attributes set
+    since creation, such as the message encoding.
+    """
+    logger.info('DataLayer: Writing metadata of directly provisioned tenant %s', tenant_id)
+    register_stack_version(table, version)
+    now = format_iso8601_date(datetime.now())
+    table.update_item(
+        Key={
+            'pk': f'TENANT_ID#{tenant_id}',
+            'sk': 'METADATA',
+        },
+        UpdateExpression='SET ClientId = :clientId'
+        ', Version = :version'
+        ', MetadataVersion = :version'
+        ', InboundQueueArn = :inArn'
+        ', InboundQueueUrl = :inUrl'
+        ', Provisioner = :provisioner'
+        ', CreatedAt = if_not_exists(CreatedAt, :updatedAt)'
+        ', UpdatedAt = :updatedAt',
+        ExpressionAttributeValues={
+            ':clientId': client_id,
+            ':version': version,
+            ':inArn': queue_arn,
+            ':inUrl': queue_url,
+            ':provisioner': DIRECT_PROVISIONER,
+            ':updatedAt': now,
+        },
+    )
+
+
+def set_metadata_version(table, tenant_id: str, version: str):
+    """ Records that a directly provisioned tenant's queue has been reconciled with the given version """
+    logger.info('DataLayer: Setting version of tenant %s to %s', tenant_id, version)
+    register_stack_version(table, version)
+    table.update_item(
+        Key={
+            'pk': f'TENANT_ID#{tenant_id}',
+            'sk': 'METADATA',
+        },
+        UpdateExpression='SET Version = :version, MetadataVersion = :version, UpdatedAt = :updatedAt',
+        ExpressionAttributeValues={
+            ':version': version,
+            ':updatedAt': format_iso8601_date(datetime.now()),
+        },
+        ConditionExpression='attribute_exists(pk)',
+    )
+
+
+def delete_metadata(table, tenant_id: str):
+    logger.info('DataLayer: Deleting metadata of tenant %s', tenant_id)
+    table.delete_item(Key={
+        'pk': f'TENANT_ID#{tenant_id}',
+        'sk': 'METADATA',
+    })
+
+
+def get_inbound_queue_tenants(table, use_version_index: bool = False) -> dict[str, str]:
+    """
+    Maps the name of every tenant's inbound queue, however it was provisioned, to the tenant's ID. Every tenant is
+    read either way, but scanning the version index skips the audit rows.
+
+    :param use_version_index: whether MetadataVersion has been backfilled, so that every tenant is in the version index
+    """
+    queue_tenants = {}
+    scan_args: dict[str, Any]
+    if use_version_index:
+        # The version index only holds METADATA rows
+        scan_args = {
+            'IndexName': VERSION_INDEX,
+            'FilterExpression': 'attribute_exists(InboundQueueArn)',
+            'ProjectionExpression': 'pk, InboundQueueArn',
+        }
+    else:
+        scan_args = {
+            'FilterExpression': 'sk = :sk AND attribute_exists(InboundQueueArn)',
+            'ProjectionExpression': 'pk, InboundQueueArn',
+            'ExpressionAttributeValues': {
+                ':sk': 'METADATA'
+            },
+        }
+    while True:
+        response = table.scan(**scan_args)
+        for item in response['Items']:
+            # arn:aws:sqs:{region}:{account}:{queue name}
+            queue_name = item['InboundQueueArn'].split(':')[-1]
+            queue_tenants[queue_name] = item['pk'].removeprefix('TENANT_ID#')
+        if 'LastEvaluatedKey' not in response:
+            return queue_tenants
+        scan_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,138 @@
+""" A pool of unassigned inbound queues, created ahead of time so new tenants don't wait for a stack """
+
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.data.queues import get_metadata
+from common.data.stack_versions import register_stack_version
+from common.data.tenant_queues import DIRECT_PROVISIONER, is_directly_provisioned
+from common.dates import format_iso8601_date
+
+WARM_POOL_PARTITION_KEY = 'WARM_POOL'
+
+# Tag marking a queue as unassigned, so leaked pool queues can be told apart from tenant queues
+WARM_POOL_TAG = 'WarmPool'
+
+
+def pooled_queue_name(parent_stack_name: str) -> str:
+    # SQS won't reuse a queue name for 60 seconds after a delete, so never reuse them
+    return f'{parent_stack_name}-pool-{uuid.uuid4().hex}-inbound'
+
+
+def get_pooled_queues(table) -> list[dict]:
+    items = []
+    query_args = {
+        'KeyConditionExpression': 'pk = :pk',
+        'ExpressionAttributeValues': {
+            ':pk': WARM_POOL_PARTITION_KEY
+        },
+    }
+    while True:
+        response = table.query(**query_args)
+        items.extend(response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def add_pooled_queue(table, queue_name: str, queue_url: str, queue_arn: str, version: str):
+    logger.info('DataLayer: Adding queue %s to the warm pool', queue_name)
+    # Registered now, as the version is written to the METADATA row of whichever tenant claims the queue
+    register_stack_version(table, version)
+    now = format_iso8601_date(datetime.now())
+    table.put_item(
+        Item={
+            'pk': WARM_POOL_PARTITION_KEY,
+            'sk': queue_name,
+            'InboundQueueArn': queue_arn,
+            'InboundQueueUrl': queue_url,
+            'Version': version,
+            'CreatedAt': now,
+        })
+
+
+def remove_pooled_queue(table, queue_name: str) -> bool:
+    """
+    Removes a queue from the pool, unless it has been claimed in the meantime
+
+    :return: False if the queue was no longer in the pool
+    """
+    try:
+        table.delete_item(Key={
+            'pk': WARM_POOL_PARTITION_KEY,
+            'sk': queue_name,
+        },
+                          ConditionExpression='attribute_exists(pk)')
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+
+def claim_pooled_queue(table, tenant_id: str, client_id: str, candidates: int = 5) -> Optional[dict]:
+    """
+    Assigns a pooled queue to the tenant by removing it from the pool and writing the tenant's METADATA row in a single
+    transaction, so a queue can never be given to two tenants or a tenant given two queues.
+
+    :return: the tenant's METADATA row, or None if the pool is empty or the tenant already has a queue from a stack
+    """
+    existing = get_metadata(table, tenant_id)
+    if existing:
+        # Claimed by an earlier attempt, or provisioned some other way
+        return existing if is_directly_provisioned(existing) else None
+
+    pool_key = {
+        ':pk': WARM_POOL_PARTITION_KEY
+    }
+    response = table.query(KeyConditionExpression='pk = :pk', ExpressionAttributeValues=pool_key, Limit=candidates)
+
+    for pooled_queue in response['Items']:
+        now = format_iso8601_date(datetime.now())
+        metadata = {
+            'pk': f'TENANT_ID#{tenant_id}',
+            'sk': 'METADATA',
+            'ClientId': client_id,
+            'Version': pooled_queue['Version'],
+            'MetadataVersion': pooled_queue['Version'],
+            'InboundQueueArn': pooled_queue['InboundQueueArn'],
+            'InboundQueueUrl': pooled_queue['InboundQueueUrl'],
+            'Provisioner': DIRECT_PROVISIONER,
+            'CreatedAt': now,
+            'UpdatedAt': now,
+        }
+
+        try:
+            table.meta.client.transact_write_items(TransactItems=[{
+                'Delete': {
+                    'TableName': table.name,
+                    'Key': {
+                        'pk': WARM_POOL_PARTITION_KEY,
+                        'sk': pooled_queue['sk'],
+                    },
+                    'ConditionExpression': 'attribute_exists(pk)',
+                }
+            }, {
+                'Put': {
+                    'TableName': table.name,
+                    'Item': metadata,
+                    'ConditionExpression': 'attribute_not_exists(pk)',
+                }
+            }])
+        except table.meta.client.exceptions.TransactionCanceledException as e:
+            pool_reason, metadata_reason = [reason.get('Code') for reason in e.response['CancellationReasons']]
+            if metadata_reason == 'ConditionalCheckFailed':
+                # Claimed by a concurrent attempt
+                existing = get_metadata(table, tenant_id)
+                return existing if is_directly_provisioned(existing) else None
+            if pool_reason == 'ConditionalCheckFailed':
+                logger.info('Pooled queue %s was claimed by another tenant', pooled_queue['sk'])
+                continue
+            raise
+
+        logger.info('DataLayer: Claimed pooled queue %s for tenant %s', pooled_queue['sk'], tenant_id)
+        return metadata
+
+    logger.info('DataLayer: Warm pool is empty')
+    return None
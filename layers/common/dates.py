@@ -29,3 +29,18 @@ def time_minute_difference(end_date: datetime, start_date: datetime):
         start_date = start_date.replace(tzinfo=timezone.utc)
 
     return (end_date - start_date).total_seconds() / 60
+
+
+def parse_epoch_millis(epoch_millis) -> datetime:
+    """
+    Converts milliseconds since the epoch, as used by SQS message attributes, to a UTC datetime
+    """
+    return datetime.fromtimestamp(int(epoch_millis) / 1000, timezone.utc)
+
+
+def milliseconds_between(end_date: datetime, start_date: datetime) -> float:
+    """
+    Gets the difference in milliseconds between two dates. Clock skew between producers can make the start date appear
+    to be after the end date, in which case 0 is returned.
+    """
+    return max((end_date - start_date).total_seconds() * 1000, 0)
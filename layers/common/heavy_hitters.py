@@ -0,0 +1,123 @@
+""" Detection of the busiest tenants without per-tenant metrics for every tenant """
+
+import os
+import time
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Optional
+
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+from common.metrics import MetricUnit, Metrics
+
+
+@dataclass
+class Counter:
+    key: str
+    count: int
+    # Upper bound on how much of the count was inherited from an evicted key
+    error: int
+
+
+class SpaceSaving:
+    """
+    Space-Saving sketch estimating the heaviest keys in a stream using a fixed number of counters. Any key whose true
+    weight exceeds total_weight / capacity is guaranteed to be tracked, and counts are never underestimated.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counters: dict[str, Counter] = {}
+
+    def add(self, key: str, weight: int = 1):
+        counter = self.counters.get(key)
+        if counter:
+            counter.count += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[key] = Counter(key=key, count=weight, error=0)
+        else:
+            # Replace the smallest counter, assuming the new key may have accounted for all of its weight
+            smallest = min(self.counters.values(), key=lambda c: c.count)
+            del self.counters[smallest.key]
+            self.counters[key] = Counter(key=key, count=smallest.count + weight, error=smallest.count)
+
+    def top(self, n: int) -> list[Counter]:
+        return sorted(self.counters.values(), key=lambda c: c.count, reverse=True)[:n]
+
+    def clear(self):
+        self.counters = {}
+
+
+class HeavyHitters:
+    """
+    Tracks events and bytes per tenant for the lifetime of a Lambda container, and periodically publishes only the top
+    tenants as metrics with a TenantId dimension, keeping the number of custom metrics bounded.
+    """
+    def __init__(self, metrics: Metrics, top_n: Optional[int] = None, flush_interval_seconds: Optional[float] = None):
+        self.metrics = metrics
+        self.top_n = top_n or int(os.getenv('HEAVY_HITTERS_TOP_N', '10'))
+        self.flush_interval_seconds = flush_interval_seconds or float(os.getenv('HEAVY_HITTERS_FLUSH_SECONDS', '60'))
+        # Extra counters keep the estimates for the top N accurate when the stream has a long tail
+        self.events = SpaceSaving(capacity=self.top_n * 10)
+        self.bytes = SpaceSaving(capacity=self.top_n * 10)
+        self.last_flush = time.monotonic()
+
+    def record(self, tenant_id: str, size_bytes: int):
+        self.events.add(tenant_id)
+        self.bytes.add(tenant_id, size_bytes)
+
+    def flush_if_due(self):
+        if time.monotonic() - self.last_flush >= self.flush_interval_seconds:
+            self.flush()
+
+    def flush(self):
+        top_events = self.events.top(self.top_n)
+        top_bytes = self.bytes.top(self.top_n)
+
+        # Both are totals over the flush interval, so record them alike
+        for counter in top_events:
+            self.metrics.add_sample('TenantEvents',
+                                    counter.count,
+                                    MetricUnit.COUNT,
+                                    dimensions={
+                                        'TenantId': counter.key
+                                    })
+        for counter in top_bytes:
+            self.metrics.add_sample('TenantBytes',
+                                    counter.count,
+                                    MetricUnit.BYTES,
+                                    dimensions={
+                                        'TenantId': counter.key
+                                    })
+
+        if top_events:
+            logger.info('Heavy hitter tenants over the last %.3f seconds',
+                        time.monotonic() - self.last_flush,
+                        extra={
+                            'heavy_hitters': {
+                                'events': [_to_log(c) for c in top_events],
+                                'bytes': [_to_log(c) for c in top_bytes],
+                            }
+                        })
+
+        self.events.clear()
+        self.bytes.clear()
+        self.last_flush = time.monotonic()
+
+    def flush_periodically(self, handler: Callable):
+        """ Decorator flushing the heavy hitters after an invocation if the flush interval has passed """
+        @wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                self.flush_if_due()
+
+        return wrapper
+
+
+def _to_log(counter: Counter) -> dict:
+    return {
+        'tenantId': counter.key,
+        'count': counter.count,
+        'error': counter.error,
+    }
@@ -0,0 +1,117 @@
+""" Custom CloudWatch metrics written as Embedded Metric Format (EMF) log lines """
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Optional
+
+# EMF rejects documents with more than 100 values for a single metric
+MAX_VALUES_PER_METRIC = 100
+
+
+class MetricUnit:
+    COUNT = 'Count'
+    MILLISECONDS = 'Milliseconds'
+    SECONDS = 'Seconds'
+    BYTES = 'Bytes'
+
+
+@dataclass
+class _Metric:
+    unit: str
+    values: list[float] = field(default_factory=list)
+
+
+class Metrics:
+    """
+    Collects metrics during an invocation and writes them to stdout as EMF documents, which CloudWatch Logs converts to
+    metrics without any API calls. Counts and durations recorded several times with the same name and dimensions are
+    summed, so a batch produces a single value per stage; samples keep every value so CloudWatch can compute percentiles.
+    """
+    def __init__(self, service: str, namespace: Optional[str] = None):
+        self.service = service
+        self.namespace = namespace or os.getenv('METRICS_NAMESPACE', 'FoundationsConnector')
+        self._metrics: dict[tuple, dict[str, _Metric]] = {}
+
+    def add_count(self, name: str, value: int = 1, dimensions: Optional[dict[str, str]] = None):
+        self._add_summed(name, MetricUnit.COUNT, value, dimensions)
+
+    def add_duration(self, name: str, milliseconds: float, dimensions: Optional[dict[str, str]] = None):
+        self._add_summed(name, MetricUnit.MILLISECONDS, milliseconds, dimensions)
+
+    def add_sample(self, name: str, value: float, unit: str, dimensions: Optional[dict[str, str]] = None):
+        self._get_metric(name, unit, dimensions).values.append(value)
+
+    @contextmanager
+    def timer(self, name: str, dimensions: Optional[dict[str, str]] = None):
+        """ Adds the time spent in the block to a duration metric, whether the block succeeds or not """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_duration(name, (time.perf_counter() - start) * 1000, dimensions)
+
+    def flush(self):
+        """ Writes all collected metrics and resets the collector """
+        timestamp = int(time.time() * 1000)
+        for dimensions_key, metrics in self._metrics.items():
+            for document in self._to_documents(timestamp, dict(dimensions_key), metrics):
+                print(json.dumps(document))
+        self._metrics = {}
+
+    def log_metrics(self, handler: Callable):
+        """ Decorator flushing the metrics when the Lambda handler returns or raises """
+        @wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                self.flush()
+
+        return wrapper
+
+    def _add_summed(self, name: str, unit: str, value: float, dimensions: Optional[dict[str, str]]):
+        metric = self._get_metric(name, unit, dimensions)
+        if metric.values:
+            metric.values[0] += value
+        else:
+            metric.values.append(value)
+
+    def _get_metric(self, name: str, unit: str, dimensions: Optional[dict[str, str]]) -> _Metric:
+        dimensions_key = tuple(sorted({
+            'Service': self.service,
+            **(dimensions or {})
+        }.items()))
+        metrics = self._metrics.setdefault(dimensions_key, {})
+        return metrics.setdefault(name, _Metric(unit=unit))
+
+    def _to_documents(self, timestamp: int, dimensions: dict[str, str], metrics: dict[str, _Metric]) -> list[dict]:
+        documents = []
+        max_values = max(len(metric.values) for metric in metrics.values())
+        for offset in range(0, max_values, MAX_VALUES_PER_METRIC):
+            chunk = {
+                name: metric.values[offset:offset + MAX_VALUES_PER_METRIC]
+                for name, metric in metrics.items() if len(metric.values) > offset
+            }
+            documents.append({
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': self.namespace,
+                        'Dimensions': [list(dimensions.keys())],
+                        'Metrics': [{
+                            'Name': name,
+                            'Unit': metrics[name].unit
+                        } for name in chunk],
+                    }],
+                },
+                **dimensions,
+                **{
+                    name: values[0] if len(values) == 1 else values
+                    for name, values in chunk.items()
+                },
+            })
+        return documents
@@ -0,0 +1,125 @@
+""" SQS metrics of tenant queues, read from CloudWatch in bulk and evaluated in memory """
+
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Iterable
+
+# GetMetricData accepts at most 500 queries per request
+MAX_QUERIES_PER_REQUEST = 500
+
+# Matches the period of the per-tenant alarms tenant stacks used to have
+METRIC_PERIOD_SECONDS = 60
+
+
+@dataclass
+class QueueAgeSummary:
+    # Number of queues with a recent ApproximateAgeOfOldestMessage datapoint
+    reporting: int = 0
+    over_threshold: int = 0
+    max_age_seconds: float = 0
+    # (queue name, age) of the oldest queues over the threshold, oldest first
+    worst_offenders: list[tuple[str, float]] = field(default_factory=list)
+
+
+def get_oldest_message_ages(cloudwatch_client, queue_names: Iterable[str], start_time: datetime,
+                            end_time: datetime) -> dict[str, float]:
+    """
+    Gets the latest ApproximateAgeOfOldestMessage of each queue. Queues without a datapoint in the time range, e.g. idle
+    queues SQS has stopped reporting on, are left out.
+    """
+    return get_queue_metrics(cloudwatch_client, queue_names, 'ApproximateAgeOfOldestMessage', 'Maximum',
+                             METRIC_PERIOD_SECONDS, start_time, end_time)
+
+
+def latest(values: list[float]) -> float:
+    """ Aggregates a queue's datapoints to the newest one """
+    return values[0]
+
+
+def get_queue_metrics(cloudwatch_client,
+                      queue_names: Iterable[str],
+                      metric_name: str,
+                      stat: str,
+                      period_seconds: int,
+                      start_time: datetime,
+                      end_time: datetime,
+                      aggregate: Callable[[list[float]], float] = latest,
+                      max_workers: int = 1) -> dict[str, float]:
+    """
+    Gets an AWS/SQS metric for each queue, fetching up to 500 queues per request. Queues without a datapoint in the time
+    range are left out.
+
+    :param aggregate: reduces a queue's datapoints, newest first, to one value, e.g. latest or sum
+    :param max_workers: the number of requests made at once
+    """
+    queue_names = list(queue_names)
+    batches = [
+        queue_names[offset:offset + MAX_QUERIES_PER_REQUEST]
+        for offset in range(0, len(queue_names), MAX_QUERIES_PER_REQUEST)
+    ]
+
+    values: dict[str, float] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for datapoints in executor.map(
+                lambda batch: _get_batch_datapoints(cloudwatch_client, batch, metric_name, stat, period_seconds,
+                                                    start_time, end_time), batches):
+            values.update((queue_name, aggregate(queue_values)) for queue_name, queue_values in datapoints.items())
+    return values
+
+
+def summarize_queue_ages(ages: dict[str, float], threshold_seconds: float, worst_offenders: int) -> QueueAgeSummary:
+    """ Evaluates every queue against the threshold, which the per-tenant alarms used to do one queue at a time """
+    over_threshold = [(queue_name, age) for queue_name, age in ages.items() if age >= threshold_seconds]
+    return QueueAgeSummary(
+        reporting=len(ages),
+        over_threshold=len(over_threshold),
+        max_age_seconds=max(ages.values(), default=0),
+        worst_offenders=heapq.nlargest(worst_offenders, over_threshold, key=lambda queue_age: queue_age[1]),
+    )
+
+
+def _get_batch_datapoints(cloudwatch_client, queue_names: list[str], metric_name: str, stat: str, period_seconds: int,
+                          start_time: datetime, end_time: datetime) -> dict[str, list[float]]:
+    # Query IDs must start with a lowercase letter, so can't be the queue names themselves
+    queries = [
+        _queue_metric_query(f'q{i}', queue_name, metric_name, stat, period_seconds)
+        for i, queue_name in enumerate(queue_names)
+    ]
+
+    request_args = {
+        'MetricDataQueries': queries,
+        'StartTime': start_time,
+        'EndTime': end_time,
+        'ScanBy': 'TimestampDescending',
+    }
+    datapoints: dict[str, list[float]] = {}
+    while True:
+        response = cloudwatch_client.get_metric_data(**request_args)
+        for result in response['MetricDataResults']:
+            if result['Values']:
+                # Newest first, and later pages only hold older datapoints
+                datapoints.setdefault(queue_names[int(result['Id'][1:])], []).extend(result['Values'])
+        if 'NextToken' not in response:
+            return datapoints
+        request_args['NextToken'] = response['NextToken']
+
+
+def _queue_metric_query(query_id: str, queue_name: str, metric_name: str, stat: str, period_seconds: int) -> dict:
+    return {
+        'Id': query_id,
+        'MetricStat': {
+            'Metric': {
+                'Namespace': 'AWS/SQS',
+                'MetricName': metric_name,
+                'Dimensions': [{
+                    'Name': 'QueueName',
+                    'Value': queue_name
+                }],
+            },
+            'Period': period_seconds,
+            'Stat': stat,
+        },
+        'ReturnData': True,
+    }
@@ -1,3 +1,3 @@
 from .api_wrapper import RestApiWrapper
-from .exceptions import BadRequest, NotFound
-from .helpers import rest_response
+from .exceptions import BadRequest, NotFound, ServiceUnavailable
+from .helpers import cache_headers, is_not_modified, rest_response
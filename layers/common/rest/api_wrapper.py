@@ -5,6 +5,7 @@ from bb_ent_data_services_shared.lambdas.logger import logger
 
 from .exceptions import RestException
 from .helpers import rest_response
+from .timing import metrics, request_timing
 
 
 class RestApiWrapper:
@@ -12,6 +13,9 @@ class RestApiWrapper:
     This decorator wraps API Gateway Lambdas, intercepting known e types
     and converting them to strongly typed es. Unknown e types will be
     converted to 500s.
+
+    Each request is timed, with the latency of the endpoint and of each phase its handler marks written as metrics and
+    returned in a Server-Timing header.
     """
     def __init__(self, endpoint_name):
         self.endpoint_name = endpoint_name
@@ -24,15 +28,27 @@ class RestApiWrapper:
                 parameters = event['pathParameters']
                 logger.info('%s in with pathParameters=%s', self.endpoint_name, parameters)
 
-            try:
-                return func(event, context)
-            except RestException as e:
-                logger.info('Returning HTTP %d: %s', e.http_status, e.message)
-                return rest_response(e.http_status, e.to_api_error())
-            except BaseException as e:  # pylint: disable=broad-except
-                logger.exception('Unexpected exception')
-                return rest_response(HTTPStatus.INTERNAL_SERVER_ERROR, {
-                    'message': str(e)
-                })
+            with request_timing(self.endpoint_name) as timing:
+                response = self._call(func, event, context)
+                if timing:
+                    timing.add_metrics()
+                    metrics.flush()
+                    response['headers'] = {
+                        **(response.get('headers') or {}), 'Server-Timing': timing.server_timing()
+                    }
+            return response
 
         return do_wrap
+
+    @staticmethod
+    def _call(func, event, context) -> dict:
+        try:
+            return func(event, context)
+        except RestException as e:
+            logger.info('Returning HTTP %d: %s', e.http_status, e.message)
+            return rest_response(e.http_status, e.to_api_error())
+        except BaseException as e:  # pylint: disable=broad-except
+            logger.exception('Unexpected exception')
+            return rest_response(HTTPStatus.INTERNAL_SERVER_ERROR, {
+                'message': str(e)
+            })
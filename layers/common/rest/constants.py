@@ -1,3 +1,11 @@
 # Constants when accessing the get_queue endpoint
 GET_QUEUE_MAX_RETRIES = 5
 GET_QUEUE_RETRY_FACTOR = 3
+# Longest a get_queue request may wait for its queue to be provisioned, within the API Gateway timeout of 29 seconds
+GET_QUEUE_MAX_WAIT_SECONDS = 20
+GET_QUEUE_WAIT_POLL_SECONDS = 1
+# Time left after waiting to issue credentials and respond
+GET_QUEUE_WAIT_MARGIN_SECONDS = 3
+
+# Constants when accessing the batch get queues endpoint
+BATCH_GET_MAX_TENANTS = 100
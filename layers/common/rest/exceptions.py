@@ -51,3 +51,11 @@ class NotFound(RestException):
     """
     def __init__(self, message: str, details: Optional[str] = None) -> None:
         super().__init__(HTTPStatus.NOT_FOUND, message, details)
+
+
+class ServiceUnavailable(RestException):
+    """
+    Thrown when a dependency is throttling or unavailable, so the client should retry later.
+    """
+    def __init__(self, message: str, details: Optional[str] = None) -> None:
+        super().__init__(HTTPStatus.SERVICE_UNAVAILABLE, message, details)
@@ -1,8 +1,13 @@
+import hashlib
 import json
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from typing import Optional, Any
 
+from common.dates import parse_iso8601_date
 
-def rest_response(status_code: int, body: Optional[dict] = None):
+
+def rest_response(status_code: int, body: Optional[dict] = None, headers: Optional[dict[str, str]] = None):
     """
     Builds an API Gateway-compatible REST response for a Lambda.
     """
@@ -10,7 +15,61 @@ def rest_response(status_code: int, body: Optional[dict] = None):
     response: dict[str, Any] = {
         'statusCode': status_code
     }
+    if headers:
+        response['headers'] = headers
     if body is not None:
         response['body'] = json.dumps(body)
 
     return response
+
+
+def cache_headers(version: Optional[str], updated_at: Optional[str], cache_control: str) -> dict[str, str]:
+    """
+    Builds the caching headers of a response derived from a tenant's METADATA row. Every write to the row changes its
+    UpdatedAt or Version, so together they validate the response without it having to be built.
+
+    :param updated_at: ISO-8601 UpdatedAt of the row
+    :param cache_control: the Cache-Control directives of the response
+    """
+    headers = {
+        'Cache-Control': cache_control
+    }
+    if version or updated_at:
+        digest = hashlib.sha256(f'{version}|{updated_at}'.encode()).hexdigest()[:16]
+        headers['ETag'] = f'"{digest}"'
+    if updated_at:
+        try:
+            modified = parse_iso8601_date(updated_at)
+            if not modified.tzinfo:
+                modified = modified.replace(tzinfo=timezone.utc)
+            headers['Last-Modified'] = format_datetime(modified.astimezone(timezone.utc), usegmt=True)
+        except ValueError:
+            # Rows written before UpdatedAt was ISO-8601 are still validated by their ETag
+            pass
+    return headers
+
+
+def is_not_modified(event: dict, headers: dict[str, str]) -> bool:
+    """
+    Whether the client already has the response with these caching headers, as told by its If-None-Match header, or
+    failing that its If-Modified-Since header.
+    """
+    request_headers = dict((name.lower(), value) for name, value in (event.get('headers') or {}).items())
+
+    if (if_none_match := request_headers.get('if-none-match')) is not None:
+        etag = headers.get('ETag')
+        if not etag:
+            return False
+        # GET compares entity tags weakly, ignoring any W/ prefix
+        tags = set(tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+        return '*' in tags or etag in tags
+
+    if_modified_since = request_headers.get('if-modified-since')
+    last_modified = headers.get('Last-Modified')
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
@@ -0,0 +1,104 @@
+"""
+Request-scoped timing of REST endpoints, broken down by the dependency each part of a request waits on.
+
+RestApiWrapper starts a timing for each request. Handlers mark the calls they make with phase, and when the request
+completes the wrapper writes the latency of the endpoint and of each phase as EMF metrics, and returns them to the
+caller in a Server-Timing header.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from common.metrics import Metrics
+
+# Phases marked by the endpoints
+DYNAMODB = 'dynamodb'
+STEP_FUNCTIONS = 'stepfunctions'
+STS = 'sts'
+TENANT_API = 'tenant_api'
+# Waiting for a queue being provisioned, which is mostly sleeping between reads
+WAIT = 'wait'
+
+# The phase covering the whole request
+TOTAL = 'total'
+
+metrics = Metrics(service='rest_api')
+
+_current: ContextVar[Optional['RequestTiming']] = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """
+    Sums the time spent in each phase of a request. A phase marked several times, such as a table read and a later
+    write, is reported once with its total.
+    """
+    def __init__(self, endpoint_name: str):
+        self.endpoint_name = endpoint_name
+        self.phases: dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._elapsed: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + (time.perf_counter() - start) * 1000
+
+    def stop(self) -> float:
+        """ Stops the request's clock, returning its total in milliseconds """
+        if self._elapsed is None:
+            self._elapsed = (time.perf_counter() - self._start) * 1000
+        return self._elapsed
+
+    def server_timing(self) -> str:
+        """ The value of the Server-Timing header, listing each phase and the total """
+        durations = {
+            **self.phases, TOTAL: self.stop()
+        }
+        return ', '.join(f'{name};dur={milliseconds:.1f}' for name, milliseconds in durations.items())
+
+    def add_metrics(self):
+        """ Adds the latency of the endpoint and of each phase, so each dependency's share of p95 can be graphed """
+        for name, milliseconds in {
+                **self.phases, TOTAL: self.stop()
+        }.items():
+            metrics.add_duration('Latency', milliseconds, {
+                'Endpoint': self.endpoint_name,
+                'Phase': name
+            })
+
+
+@contextmanager
+def request_timing(endpoint_name: str):
+    """
+    Times a request, yielding None when a request is already being timed. This is the case for endpoints served by the
+    REST router, whose request is timed by the router under the endpoint's name.
+    """
+    timing = _current.get()
+    if timing:
+        timing.endpoint_name = endpoint_name
+        yield None
+        return
+
+    timing = RequestTiming(endpoint_name)
+    token = _current.set(timing)
+    try:
+        yield timing
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name: str):
+    """ Adds the time spent in the block to a phase of the current request, if a request is being timed """
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+
+    with timing.phase(name):
+        yield
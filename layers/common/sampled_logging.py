@@ -0,0 +1,63 @@
+""" Sampled logging for messages written once per record in hot loops """
+
+import os
+import random
+from collections import Counter
+from functools import wraps
+from typing import Callable, Optional
+
+from bb_ent_data_services_shared.lambdas.logger import logger
+
+
+class SampledLogger:
+    """
+    Writes only a sample of per-record info and debug messages, as set by LOG_SAMPLE_RATE (default 1, logging
+    everything). When sampling, a single summary line is written per invocation with how many times each message was
+    seen, so volumes stay visible. Warnings and errors are never sampled.
+    """
+    def __init__(self, sample_rate: Optional[float] = None):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv('LOG_SAMPLE_RATE', '1'))
+        self.counts: Counter[str] = Counter()
+
+    def debug(self, msg: str, *args):
+        self._log(logger.debug, msg, *args)
+
+    def info(self, msg: str, *args):
+        self._log(logger.info, msg, *args)
+
+    def warning(self, msg: str, *args):
+        logger.warning(msg, *args)
+
+    def error(self, msg: str, *args):
+        logger.error(msg, *args)
+
+    def exception(self, msg: str, *args):
+        logger.exception(msg, *args)
+
+    def log_summary(self):
+        """ Writes how often each sampled message was seen since the last summary """
+        if self.counts and self.sample_rate < 1:
+            logger.info('Sampled %d log messages at rate %s',
+                        sum(self.counts.values()),
+                        self.sample_rate,
+                        extra={
+                            'sampled_log_counts': dict(self.counts)
+                        })
+        self.counts.clear()
+
+    def summarize(self, handler: Callable):
+        """ Decorator writing the summary line when the Lambda handler returns or raises """
+        @wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                self.log_summary()
+
+        return wrapper
+
+    def _log(self, log: Callable, msg: str, *args):
+        # Counting by the unformatted message keeps the summary small
+        self.counts[msg] += 1
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            log(msg, *args)
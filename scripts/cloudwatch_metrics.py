@@ -0,0 +1,58 @@
+"""
+Bulk reads of SQS queue metrics for the ops scripts.
+
+Rather than one GetMetricStatistics call per queue, queues are looked up 500 at a time with GetMetricData by the same
+helper the Lambdas use, and the batches are fetched concurrently.
+"""
+
+import os
+import sys
+from datetime import datetime
+from typing import Iterable
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'layers'))
+
+from common.queue_ages import get_queue_metrics  # pylint: disable=wrong-import-position
+
+DEFAULT_WORKERS = 4
+
+
+def get_queue_metric_sums(client,
+                          queue_names: Iterable[str],
+                          metric_name: str,
+                          start_time: datetime,
+                          end_time: datetime,
+                          max_workers: int = DEFAULT_WORKERS) -> dict[str, float]:
+    """
+    Sums an AWS/SQS metric of each queue over the time range. Queues without any datapoints, e.g. deleted or idle
+    queues SQS has stopped reporting on, are 0.
+
+    :param client: a CloudWatch client
+    """
+    queue_names = list(queue_names)
+    # One period covering the whole range, in the whole minutes GetMetricData requires
+    period = max(-(-int((end_time - start_time).total_seconds()) // 60) * 60, 60)
+
+    sums = dict((queue_name, 0.0) for queue_name in queue_names)
+    # The range may straddle two periods, so add up every datapoint
+    sums.update(
+        get_queue_metrics(client,
+                          queue_names,
+                          metric_name,
+                          "Sum",
+                          period,
+                          start_time,
+                          end_time,
+                          aggregate=sum,
+                          max_workers=max_workers))
+    return sums
+
+
+def get_active_queues(client,
+                      queue_names: Iterable[str],
+                      start_time: datetime,
+                      end_time: datetime,
+                      max_workers: int = DEFAULT_WORKERS) -> dict[str, bool]:
+    """ Whether any messages were sent to each queue in the time range """
+    sums = get_queue_metric_sums(client, queue_names, "NumberOfMessagesSent", start_time, end_time, max_workers)
+    return dict((queue_name, total > 0) for queue_name, total in sums.items())
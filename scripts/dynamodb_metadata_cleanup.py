@@ -25,7 +25,8 @@ Usage:
 import argparse
 
 import boto3
-from boto3.dynamodb.types import TypeDeserializer
+
+from table_scan import DEFAULT_SEGMENTS, BatchedWriter, scan_partitions
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--parent-stack", dest="parent_stack", help="The stack to analyze")
@@ -34,6 +35,11 @@ parser.add_argument("--commit",
                     action="store_true",
                     default=False,
                     help="If set, changes will be applied; otherwise we will only audit the existing keys")
+parser.add_argument("--segments",
+                    dest="segments",
+                    type=int,
+                    default=DEFAULT_SEGMENTS,
+                    help="The number of parts of the table to scan at once")
 args = parser.parse_args()
 
 
@@ -50,102 +56,151 @@ def get_resource_names():
 
 def scan_table(table_name):
     print(f"Scanning table {table_name}")
-    # Raw client for paged queries
     client = boto3.client("dynamodb")
-    paginator = client.get_paginator("scan")
-    page_iterator = paginator.paginate(TableName=table_name)
-    deserializer = TypeDeserializer()
 
     # Rich client so we can be lazy and avoid manual serialization
     dynamodb = boto3.resource("dynamodb")
     table = dynamodb.Table(table_name)
 
-    # Load information about all tenants
-    tenants = {}
-    for page in page_iterator:
-        for item in page["Items"]:
-            tenant_id = deserializer.deserialize(item["pk"])
-            sort_key = deserializer.deserialize(item["sk"])
-
-            tenant = tenants.get(tenant_id, {})
-            if sort_key == "METADATA":
-                tenant["metadata"] = item
-            elif sort_key.startswith("AUDIT#CREATE"):
-                tenant["create"] = item
-            elif sort_key.startswith("AUDIT#DELETE"):
-                tenant["delete"] = item
-            tenants[tenant_id] = tenant
+    # Each tenant is checked as soon as all of its rows have been read, rather than loading the whole table first
+    partitions = scan_partitions(client,
+                                 segments=args.segments,
+                                 TableName=table_name,
+                                 ProjectionExpression="pk, sk, ClientId, CreatedAt, UpdatedAt, Version, MetadataVersion"
+                                 ", #status, InFlight",
+                                 ExpressionAttributeNames={"#status": "Status"})
 
     changes_required = False
+    versions = set()
+    with BatchedWriter(table) as writer:
+        for tenant_id, items in partitions:
+            if check_tenant(writer, tenant_id, items):
+                changes_required = True
+            # Pooled queues pass their version on to the tenant that claims them
+            versions.update(item["Version"] for item in items
+                            if "Version" in item and (item["sk"] == "METADATA" or tenant_id == "WARM_POOL"))
+
+    # 2026-10-19: The fleet upgrade queries the VersionIndex for each registered version, so versions written before
+    # they were registered must be too
+    response = table.query(KeyConditionExpression="pk = :pk", ExpressionAttributeValues={":pk": "STACK_VERSION"})
+    registered_versions = set(item["sk"] for item in response["Items"])
+    for version in sorted(versions - registered_versions):
+        print(f"Stack version {version} is not registered")
+        changes_required = True
+
+        if args.commit:
+            print(f"- Registering stack version {version}")
+            table.put_item(Item={"pk": "STACK_VERSION", "sk": version})
+
+    if args.commit:
+        print(f"{writer.updated} rows updated, {writer.skipped} skipped as already changed, {writer.deleted} deleted")
 
-    for tenant_id, tenant in tenants.items():
-        metadata = tenant.get("metadata")
-        audit_create = tenant.get("create")
-        audit_delete = tenant.get("delete")
-
-        metadata_key = {
-            "pk": tenant_id,
-            "sk": "AUDIT#METADATA",
-        }
-        audit_create_key = {
-            "pk": tenant_id,
-            "sk": "AUDIT#CREATE"
-        }
-
-        # 2020-12-11: 0.1.17 now requires a ClientId attribute
-        if metadata and "ClientId" not in metadata:
-            print(f"{tenant_id} is missing its ClientId")
+    return changes_required
+
+
+def check_tenant(writer, tenant_id, items) -> bool:
+    metadata = None
+    audit_create = None
+    audit_delete = None
+    started_audit_rows = []
+    for item in items:
+        sort_key = item["sk"]
+        if sort_key == "METADATA":
+            metadata = item
+        elif sort_key.startswith("AUDIT#CREATE"):
+            audit_create = item
+        elif sort_key.startswith("AUDIT#DELETE"):
+            audit_delete = item
+
+        if sort_key.startswith("AUDIT#") and item.get("Status") == "Started" and "InFlight" not in item:
+            started_audit_rows.append(sort_key)
+
+    changes_required = False
+
+    metadata_key = {
+        "pk": tenant_id,
+        "sk": "METADATA",
+    }
+    audit_create_key = {
+        "pk": tenant_id,
+        "sk": "AUDIT#CREATE"
+    }
+
+    # 2020-12-11: 0.1.17 now requires a ClientId attribute
+    if metadata and "ClientId" not in metadata:
+        print(f"{tenant_id} is missing its ClientId")
+        changes_required = True
+
+        if args.commit:
+            print("- Injecting a fake ClientId")
+            writer.update(Key=metadata_key,
+                          UpdateExpression="SET ClientId=:clientId",
+                          ExpressionAttributeValues={":clientId": "Developer"},
+                          ConditionExpression="attribute_not_exists(ClientId)")
+
+    # 2020-12-11: LRN-170519 can potentially create a metadata row that's missing this attribute
+    if metadata and "CreatedAt" not in metadata:
+        print(f"{tenant_id} is missing its CreatedAt timestamp")
+        changes_required = True
+
+        if "UpdatedAt" not in metadata:
+            print("- Error: Record doesn't have an UpdatedAt value either; no correction can be made")
+        elif args.commit:
+            print("- Fixing the CreatedAt timestamp")
+            writer.update(Key=metadata_key,
+                          UpdateExpression="SET CreatedAt=:createdAt",
+                          ExpressionAttributeValues={":createdAt": metadata["UpdatedAt"]},
+                          ConditionExpression="attribute_not_exists(CreatedAt)")
+
+    # 2021-01-26: We hit the 5000 alarm limit in Dev. A number of stacks failed to create, but the step function
+    # was incorrectly marked as successful
+    if not metadata and audit_create and not audit_delete:
+        if audit_create["Status"] == "Success":
+            print(f"{tenant_id} is missing its metadata")
             changes_required = True
 
             if args.commit:
-                print("- Injecting a fake ClientId")
-                table.update_item(Key=metadata_key,
-                                  UpdateExpression="SET ClientId=:clientId",
-                                  ExpressionAttributeValues={":clientId": "Developer"},
-                                  ConditionExpression="attribute_not_exists(ClientId)")
-
-        # 2020-12-11: LRN-170519 can potentially create a metadata row that's missing this attribute
-        if metadata and "CreatedAt" not in metadata:
-            print(f"{tenant_id} is missing its CreatedAt timestamp")
+                print(f"- Deleting audit#create row for {tenant_id}")
+                writer.delete(audit_create_key)
+
+    # 2021-02-05: We hit the 5000 alarm limit in Prod. A number of stacks were successful created, but errors
+    # checking the status caused the step function to mark the audit record as failed.
+    if metadata and audit_create and not audit_delete:
+        if audit_create["Status"] == "Failure":
+            print(f"{tenant_id} was successfully created but marked as a failure")
             changes_required = True
 
-            if "UpdatedAt" not in metadata:
-                print("- Error: Record doesn't have an UpdatedAt value either; no correction can be made")
-            else:
-                created_at = deserializer.deserialize(metadata["UpdatedAt"])
-                if args.commit:
-                    print("- Fixing the CreatedAt timestamp")
-                    table.update_item(Key=metadata_key,
-                                      UpdateExpression="SET CreatedAt=:createdAt",
-                                      ExpressionAttributeValues={":createdAt": created_at},
-                                      ConditionExpression="attribute_not_exists(CreatedAt)")
-
-        # 2021-01-26: We hit the 5000 alarm limit in Dev. A number of stacks failed to create, but the step function
-        # was incorrectly marked as successful
-        if not metadata and audit_create and not audit_delete:
-            create_status = deserializer.deserialize(audit_create["Status"])
-            if create_status == "Success":
-                print(f"{tenant_id} is missing its metadata")
-                changes_required = True
+            if args.commit:
+                print(f"- Updating audit#create row for {tenant_id}")
+                writer.update(Key=audit_create_key,
+                              UpdateExpression="SET #status=:status",
+                              ExpressionAttributeNames={"#status": "Status"},
+                              ExpressionAttributeValues={":status": "Success"})
 
-                if args.commit:
-                    print(f"- Deleting audit#create row for {tenant_id}")
-                    table.delete_item(Key=audit_create_key)
+    # 2026-10-19: The VersionIndex only holds METADATA rows with a MetadataVersion, which older rows don't have
+    if metadata and "Version" in metadata and "MetadataVersion" not in metadata:
+        print(f"{tenant_id} is missing from the version index")
+        changes_required = True
 
-        # 2021-02-05: We hit the 5000 alarm limit in Prod. A number of stacks were successful created, but errors
-        # checking the status caused the step function to mark the audit record as failed.
-        if metadata and audit_create and not audit_delete:
-            create_status = deserializer.deserialize(audit_create["Status"])
-            if create_status == "Failure":
-                print(f"{tenant_id} was successfully created but marked as a failure")
-                changes_required = True
+        if args.commit:
+            print("- Copying the Version to MetadataVersion")
+            writer.update(Key=metadata_key,
+                          UpdateExpression="SET MetadataVersion = Version",
+                          ConditionExpression="attribute_exists(pk)")
 
-                if args.commit:
-                    print(f"- Updating audit#create row for {tenant_id}")
-                    table.update_item(Key=audit_create_key,
-                                      UpdateExpression="SET #status=:status",
-                                      ExpressionAttributeNames={"#status": "Status"},
-                                      ExpressionAttributeValues={":status": "Success"})
+    # 2026-10-19: The InFlightIndex only holds audit rows with an InFlight action, which rows started by older step
+    # functions don't have, so the audit sweeper can't find them
+    for sort_key in started_audit_rows:
+        print(f"{tenant_id} {sort_key} is missing from the in-flight index")
+        changes_required = True
+
+        if args.commit:
+            print("- Setting the InFlight action")
+            writer.update(Key={"pk": tenant_id, "sk": sort_key},
+                          UpdateExpression="SET InFlight = :action",
+                          ExpressionAttributeValues={":action": sort_key.split("#")[1], ":status": "Started"},
+                          ExpressionAttributeNames={"#status": "Status"},
+                          ConditionExpression="#status = :status")
 
     return changes_required
 
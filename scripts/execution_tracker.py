@@ -0,0 +1,79 @@
+"""
+Runs many step function executions from the ops scripts, with a limit on how many run at once.
+
+Rather than a thread per execution sleeping between DescribeExecution calls, a single loop checks on every running
+execution at once with ListExecutions, only describing the executions that have left the running list. Finished
+executions are replaced as soon as they are noticed.
+"""
+
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from time import sleep
+
+DEFAULT_POLL_SECONDS = 15
+
+
+@dataclass
+class TrackedExecution:
+    label: str
+    arn: str
+    started: datetime
+
+
+class ExecutionTracker:
+    """
+    Call start for each execution, which waits for a free slot if the limit has been reached, then wait_all. Counts of
+    how the executions finished are kept by status.
+    """
+    def __init__(self, sfn_client, state_machine_arn: str, limit: int, poll_seconds: float = DEFAULT_POLL_SECONDS):
+        self.sfn_client = sfn_client
+        self.state_machine_arn = state_machine_arn
+        self.limit = limit
+        self.poll_seconds = poll_seconds
+        self.running: dict[str, TrackedExecution] = {}
+        self.finished: dict[str, int] = {}
+
+    def start(self, label: str, execution_input: dict) -> str:
+        """
+        Starts an execution once fewer than the limit are running
+
+        :param label: how the execution is referred to in the output
+        :return: the ARN of the execution
+        """
+        while len(self.running) >= self.limit:
+            self._poll()
+
+        started = datetime.now()
+        execution_arn = self.sfn_client.start_execution(stateMachineArn=self.state_machine_arn,
+                                                        input=json.dumps(execution_input))['executionArn']
+        self.running[execution_arn] = TrackedExecution(label=label, arn=execution_arn, started=started)
+        print(f"{label}: started at {started}", flush=True)
+        return execution_arn
+
+    def wait_all(self):
+        """ Waits for every execution started to finish """
+        while self.running:
+            self._poll()
+
+    def _poll(self):
+        sleep(self.poll_seconds)
+
+        still_running = set()
+        paginator = self.sfn_client.get_paginator("list_executions")
+        for page in paginator.paginate(stateMachineArn=self.state_machine_arn, statusFilter="RUNNING"):
+            still_running.update(execution["executionArn"] for execution in page["executions"])
+
+        for execution_arn in [arn for arn in self.running if arn not in still_running]:
+            # ListExecutions is eventually consistent, so may not list executions that have just started
+            status = self.sfn_client.describe_execution(executionArn=execution_arn)["status"]
+            if status == "RUNNING":
+                continue
+
+            execution = self.running.pop(execution_arn)
+            self.finished[status] = self.finished.get(status, 0) + 1
+            print(f"{execution.label}: {status} after {datetime.now() - execution.started}", flush=True)
+            if status != "SUCCEEDED":
+                print(f"- Check execution {execution_arn}")
+
+        print(f"{len(self.running)} executions running at {datetime.now()}", flush=True)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+"""
+This script exports an inventory of the tenant fleet to a local SQLite file, so operational questions can be answered
+with queries taking milliseconds instead of fresh scans of DynamoDB, CloudFormation and CloudWatch.
+
+The inventory holds the tenant resources table's METADATA and audit rows, the tenant stacks, and the messages sent to
+and received from each inbound queue over the last day.
+
+Usage:
+
+  # Export the Prod us-east-1 fleet
+  AWS_PROFILE=dsg-prod-read AWS_REGION=us-east-1 \
+    scripts/fleet_inventory.py export --parent-stack=fnds-connector-prod --output=prod.sqlite
+
+  # Run a canned query, or any SQL
+  scripts/fleet_inventory.py query --inventory=prod.sqlite versions
+  scripts/fleet_inventory.py query --inventory=prod.sqlite \
+    "SELECT provisioner, COUNT(*) FROM metadata GROUP BY provisioner"
+
+  # List the canned queries
+  scripts/fleet_inventory.py query --inventory=prod.sqlite --list
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Iterable, Iterator
+
+import boto3
+from botocore.config import Config
+
+from cloudwatch_metrics import get_queue_metric_sums
+from table_scan import DEFAULT_SEGMENTS, scan_items
+
+# Rows inserted per statement while exporting, so the scan never has to be held in memory
+INSERT_BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE export (
+    parent_stack TEXT NOT NULL,
+    exported_at TEXT NOT NULL
+);
+CREATE TABLE metadata (
+    tenant_id TEXT PRIMARY KEY,
+    client_id TEXT,
+    version TEXT,
+    provisioner TEXT,
+    inbound_queue_name TEXT,
+    message_encoding TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX metadata_version ON metadata (version);
+CREATE INDEX metadata_inbound_queue_name ON metadata (inbound_queue_name);
+CREATE TABLE audit_rows (
+    tenant_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    version TEXT,
+    status TEXT,
+    retry_count INTEGER,
+    updated_at TEXT,
+    execution TEXT,
+    PRIMARY KEY (tenant_id, action, version)
+);
+CREATE INDEX audit_rows_status ON audit_rows (status, updated_at);
+CREATE TABLE stacks (
+    name TEXT PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created TEXT NOT NULL,
+    updated TEXT
+);
+CREATE INDEX stacks_tenant_id ON stacks (tenant_id);
+CREATE INDEX stacks_status ON stacks (status);
+CREATE TABLE queue_metrics (
+    queue_name TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (queue_name, metric)
+);
+"""
+
+CANNED_QUERIES = {
+    "versions": (
+        "Tenants on each stack version",
+        "SELECT version, COUNT(*) AS tenants FROM metadata GROUP BY version ORDER BY version",
+    ),
+    "stacks-without-metadata": (
+        "Tenant stacks with no METADATA row",
+        "SELECT s.name, s.status, s.created FROM stacks s"
+        " LEFT JOIN metadata m ON m.tenant_id = s.tenant_id WHERE m.tenant_id IS NULL ORDER BY s.created",
+    ),
+    "metadata-without-stacks": (
+        "Tenants provisioned by CloudFormation with no stack",
+        "SELECT m.tenant_id, m.version, m.updated_at FROM metadata m"
+        " LEFT JOIN stacks s ON s.tenant_id = m.tenant_id"
+        " WHERE s.name IS NULL AND COALESCE(m.provisioner, 'CloudFormation') = 'CloudFormation'"
+        " ORDER BY m.updated_at",
+    ),
+    "stuck-audits": (
+        "Audit rows still Started an hour after their last update",
+        "SELECT tenant_id, action, version, updated_at, execution FROM audit_rows"
+        " WHERE status = 'Started' AND updated_at < strftime('%Y-%m-%dT%H:%M:%fZ', 'now', '-1 hour')"
+        " ORDER BY updated_at",
+    ),
+    "failed-audits": (
+        "Tenants whose latest create, update or delete failed, by action",
+        "SELECT action, version, COUNT(*) AS tenants FROM audit_rows WHERE status = 'Failure'"
+        " GROUP BY action, version ORDER BY action, version",
+    ),
+    "idle-inbound-queues": (
+        "Tenants whose inbound queue had no messages sent or received over the last day",
+        "SELECT m.tenant_id, m.version, m.inbound_queue_name FROM metadata m"
+        " LEFT JOIN queue_metrics q ON q.queue_name = m.inbound_queue_name AND q.value > 0"
+        " WHERE m.inbound_queue_name IS NOT NULL AND q.queue_name IS NULL ORDER BY m.tenant_id",
+    ),
+}
+
+parser = argparse.ArgumentParser()
+subparsers = parser.add_subparsers(dest="command", required=True)
+
+export_parser = subparsers.add_parser("export", help="Export the fleet to a new inventory file")
+export_parser.add_argument("--parent-stack", dest="parent_stack", required=True, help="The stack to export")
+export_parser.add_argument("--output", dest="output", required=True, help="The inventory file to create")
+export_parser.add_argument("--segments",
+                           dest="segments",
+                           type=int,
+                           default=DEFAULT_SEGMENTS,
+                           help="The number of parts of the table to scan at once")
+
+query_parser = subparsers.add_parser("query", help="Query an inventory file")
+query_parser.add_argument("--inventory", dest="inventory", required=True, help="The inventory file to query")
+query_parser.add_argument("--list", dest="list", action="store_true", default=False, help="List the canned queries")
+query_parser.add_argument("query", nargs="?", help="The name of a canned query, or SQL")
+
+
+def get_table_name(parent_stack: str) -> str:
+    cloudformation = boto3.resource("cloudformation")
+    stack = cloudformation.Stack(parent_stack)
+    table_resource = next(r for r in stack.resource_summaries.all() if r.resource_type == "AWS::DynamoDB::Table")
+    return table_resource.physical_resource_id
+
+
+def export(args):
+    started = time.perf_counter()
+    connection = sqlite3.connect(args.output)
+    if connection.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0]:
+        print(f"{args.output} already holds an inventory; choose a new file")
+        sys.exit(1)
+    connection.executescript(SCHEMA)
+
+    with connection:
+        connection.execute("INSERT INTO export VALUES (?, ?)",
+                           (args.parent_stack, datetime.now(timezone.utc).isoformat()))
+        export_table(connection, get_table_name(args.parent_stack), args.segments)
+        export_stacks(connection, args.parent_stack)
+        export_queue_metrics(connection)
+
+    connection.execute("ANALYZE")
+    connection.close()
+    print(f"Exported to {args.output} in {time.perf_counter() - started:.1f} seconds")
+
+
+def export_table(connection, table_name: str, segments: int):
+    print(f"Scanning table {table_name}")
+    items = scan_items(boto3.client("dynamodb"),
+                       segments=segments,
+                       TableName=table_name,
+                       ProjectionExpression="pk, sk, ClientId, Version, Provisioner, InboundQueueArn, MessageEncoding"
+                       ", CreatedAt, UpdatedAt, #status, RetryCount, Execution",
+                       ExpressionAttributeNames={"#status": "Status"})
+
+    metadata_rows = 0
+    audit_rows = 0
+    for batch in _batches(items, INSERT_BATCH_SIZE):
+        metadata = [_metadata_row(item) for item in batch if item["sk"] == "METADATA"]
+        audits = [_audit_row(item) for item in batch if item["sk"].startswith("AUDIT#")]
+        connection.executemany("INSERT INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?)", metadata)
+        connection.executemany("INSERT INTO audit_rows VALUES (?, ?, ?, ?, ?, ?, ?)", audits)
+        metadata_rows += len(metadata)
+        audit_rows += len(audits)
+
+    print(f"- {metadata_rows} tenants, {audit_rows} audit rows")
+
+
+def _metadata_row(item: dict) -> tuple:
+    queue_arn = item.get("InboundQueueArn")
+    return (
+        item["pk"].replace("TENANT_ID#", ""),
+        item.get("ClientId"),
+        item.get("Version"),
+        item.get("Provisioner"),
+        # arn:aws:sqs:{region}:{account}:{queue name}
+        queue_arn.split(":")[-1] if queue_arn else None,
+        item.get("MessageEncoding"),
+        item.get("CreatedAt"),
+        item.get("UpdatedAt"),
+    )
+
+
+def _audit_row(item: dict) -> tuple:
+    # AUDIT#{action}, or AUDIT#UPDATE#{version}
+    _, action, *version = item["sk"].split("#", 2)
+    retry_count = item.get("RetryCount")
+    return (
+        item["pk"].replace("TENANT_ID#", ""),
+        action,
+        version[0] if version else "",
+        item.get("Status"),
+        int(retry_count) if retry_count is not None else None,
+        item.get("UpdatedAt"),
+        item.get("Execution"),
+    )
+
+
+def export_stacks(connection, parent_stack: str):
+    print("Listing tenant stacks")
+    cloudformation = boto3.client("cloudformation")
+    stacks = 0
+    for page in cloudformation.get_paginator("list_stacks").paginate():
+        rows = []
+        for summary in page["StackSummaries"]:
+            stack_name: str = summary["StackName"]
+            # Tenant stacks are named after the parent stack and the tenant ID
+            if (summary["StackStatus"] == "DELETE_COMPLETE" or not stack_name.startswith(parent_stack)
+                    or len(stack_name) != len(parent_stack) + 37):
+                continue
+            updated = summary.get("LastUpdatedTime")
+            rows.append((stack_name, stack_name.replace(f"{parent_stack}-", ""), summary["StackStatus"],
+                         summary["CreationTime"].isoformat(), updated.isoformat() if updated else None))
+        connection.executemany("INSERT INTO stacks VALUES (?, ?, ?, ?, ?)", rows)
+        stacks += len(rows)
+
+    print(f"- {stacks} stacks")
+
+
+def export_queue_metrics(connection):
+    queue_names = [row[0] for row in connection.execute("SELECT inbound_queue_name FROM metadata "
+                                                        "WHERE inbound_queue_name IS NOT NULL")]
+    print(f"Reading metrics of {len(queue_names)} inbound queues")
+    cloudwatch_client = boto3.client("cloudwatch", config=Config(retries={"mode": "adaptive"}))
+    end_time = datetime.now(timezone.utc)
+    for metric_name in ["NumberOfMessagesSent", "NumberOfMessagesReceived"]:
+        sums = get_queue_metric_sums(cloudwatch_client, queue_names, metric_name, end_time - timedelta(days=1),
+                                     end_time)
+        connection.executemany("INSERT INTO queue_metrics VALUES (?, ?, ?)",
+                               [(queue_name, metric_name, value) for queue_name, value in sums.items()])
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def query(args):
+    if args.list or not args.query:
+        for name, (description, _) in CANNED_QUERIES.items():
+            print(f"{name:<26}{description}")
+        return
+
+    connection = sqlite3.connect(f"file:{args.inventory}?mode=ro", uri=True)
+    parent_stack, exported_at = connection.execute("SELECT parent_stack, exported_at FROM export").fetchone()
+    print(f"Inventory of {parent_stack} exported at {exported_at}", file=sys.stderr)
+
+    sql = CANNED_QUERIES[args.query][1] if args.query in CANNED_QUERIES else args.query
+    started = time.perf_counter()
+    cursor = connection.execute(sql)
+    rows = cursor.fetchall()
+    elapsed = (time.perf_counter() - started) * 1000
+
+    columns = [column[0] for column in cursor.description]
+    widths = [max([len(column)] + [len(str(row[i])) for row in rows]) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(value).ljust(width) for value, width in zip(row, widths)))
+    print(f"{len(rows)} rows in {elapsed:.1f} ms", file=sys.stderr)
+
+
+def main():
+    args = parser.parse_args()
+    if args.command == "export":
+        export(args)
+    else:
+        query(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+A local SQLite snapshot of tenant stacks and Registrar tenants, kept between incremental runs of
+orphan_stack_cleanup.py.
+
+Stacks are recorded with when they were first and last listed, so a run can tell which stacks an earlier run had
+already seen. Registrar tenants are recorded with when they were last confirmed to exist, so they don't need to be
+looked up again on every run. Timestamps are UTC ISO-8601 strings, which sort in time order.
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Iterable, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stacks (
+    name TEXT PRIMARY KEY,
+    tenant_id TEXT NOT NULL,
+    created TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS registrar_tenants (
+    tenant_id TEXT PRIMARY KEY,
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS registrar_tenants_last_seen ON registrar_tenants (last_seen);
+CREATE TABLE IF NOT EXISTS runs (
+    started TEXT PRIMARY KEY,
+    registrar_scanned INTEGER NOT NULL
+);
+"""
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def last_run(self) -> Optional[str]:
+        row = self.connection.execute("SELECT MAX(started) FROM runs").fetchone()
+        return row[0]
+
+    def record_stacks(self, stacks: dict[str, tuple[str, datetime]], seen: str) -> set[str]:
+        """
+        Replaces the stacks with those just listed, keeping when each was first seen
+
+        :param stacks: the tenant ID and creation time of each stack, by name
+        :return: the names of the stacks an earlier run had already seen
+        """
+        with self.connection:
+            known = set(row[0] for row in self.connection.execute("SELECT name FROM stacks"))
+            self.connection.executemany(
+                "INSERT INTO stacks (name, tenant_id, created, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET last_seen = excluded.last_seen",
+                [(name, tenant_id, created.isoformat(), seen, seen) for name, (tenant_id, created) in stacks.items()])
+            # Stacks no longer listed have been deleted
+            self.connection.execute("DELETE FROM stacks WHERE last_seen < ?", (seen, ))
+        return known & stacks.keys()
+
+    def tenants_seen_since(self, since: str) -> set[str]:
+        rows = self.connection.execute("SELECT tenant_id FROM registrar_tenants WHERE last_seen >= ?", (since, ))
+        return set(row[0] for row in rows)
+
+    def record_tenants(self, present: Iterable[str], absent: Iterable[str], seen: str):
+        """ Records the Registrar tenants just looked up """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO registrar_tenants (tenant_id, last_seen) VALUES (?, ?)"
+                " ON CONFLICT (tenant_id) DO UPDATE SET last_seen = excluded.last_seen",
+                [(tenant_id, seen) for tenant_id in present])
+            self.connection.executemany("DELETE FROM registrar_tenants WHERE tenant_id = ?",
+                                        [(tenant_id, ) for tenant_id in absent])
+
+    def replace_tenants(self, tenant_ids: Iterable[str], seen: str):
+        """ Replaces the Registrar tenants with those of a full scan """
+        with self.connection:
+            self.connection.execute("DELETE FROM registrar_tenants")
+            self.connection.executemany("INSERT INTO registrar_tenants (tenant_id, last_seen) VALUES (?, ?)",
+                                        [(tenant_id, seen) for tenant_id in tenant_ids])
+
+    def record_run(self, started: str, registrar_scanned: bool):
+        with self.connection:
+            self.connection.execute("INSERT INTO runs (started, registrar_scanned) VALUES (?, ?)",
+                                    (started, int(registrar_scanned)))
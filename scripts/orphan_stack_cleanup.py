@@ -1,18 +1,27 @@
 #!/usr/bin/env python
 """
 This script looks for tenant stacks that have been orphaned because the upstream site no longer exists in Registrar.
+
+With --incremental, stacks and Registrar tenants are kept in a local snapshot between runs, which makes routine sweeps
+cheap enough to run daily. The stacks are listed once, and only stacks an earlier run had already seen are inspected.
+Registrar tenants confirmed within --recheck-hours are trusted. Any others are looked up one by one if the Registrar
+table is keyed or indexed by tenantId, and otherwise found with a full scan. The first incremental run only builds the
+snapshot.
 """
 
 import argparse
-import json
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime
-from time import sleep
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 import boto3
-from boto3.dynamodb.types import TypeDeserializer
 
+from execution_tracker import ExecutionTracker
+from orphan_snapshot import Snapshot
+from table_scan import scan_items
+
+# Concurrent tenant stack deletes, kept below the point where CloudFormation starts throttling them
 MAX_EXECUTIONS = 25
 
 parser = argparse.ArgumentParser()
@@ -29,6 +38,25 @@ parser.add_argument(
     default=False,
     help='If set, changes will be applied; otherwise we will only log',
 )
+parser.add_argument(
+    '--incremental',
+    dest='incremental',
+    action='store_true',
+    default=False,
+    help='If set, only changes since the last incremental run are fetched',
+)
+parser.add_argument(
+    '--snapshot',
+    dest='snapshot',
+    help='The snapshot file of incremental runs; defaults to orphan_stacks_{environment}.sqlite',
+)
+parser.add_argument(
+    '--recheck-hours',
+    dest='recheck_hours',
+    type=int,
+    default=168,
+    help='How long a Registrar tenant is trusted to exist after it was last seen, in incremental runs',
+)
 args = parser.parse_args()
 
 
@@ -86,6 +114,18 @@ dynamodb = registrar_session.client('dynamodb')
 
 
 def main():
+    if args.incremental:
+        stacks_to_delete = find_orphans_incrementally()
+    else:
+        stacks_to_delete = find_orphans()
+
+    if args.commit:
+        print('Deleting stacks...')
+        delete_stacks(stacks_to_delete)
+        print('Done')
+
+
+def find_orphans() -> list[StackInfo]:
     # List our tenant stacks
     stacks_before = list_stacks()
 
@@ -96,12 +136,86 @@ def main():
     stacks_after = list_stacks()
 
     # Compare stacks with the tenants present in Registrar
-    stacks_to_delete = compare_tenants(registrar_tenants, stacks_before, stacks_after)
-
-    if args.commit:
-        print('Deleting stacks...')
-        delete_stacks(stacks_to_delete)
-        print('Done')
+    return compare_tenants(registrar_tenants, stacks_before, stacks_after)
+
+
+def find_orphans_incrementally() -> list[StackInfo]:
+    snapshot = Snapshot(args.snapshot or f'orphan_stacks_{args.environment}.sqlite')
+    last_run = snapshot.last_run()
+    print(f'Last incremental run: {last_run or "never"}')
+    run_started = datetime.now(timezone.utc)
+
+    # Stacks an earlier run had already seen stand in for those present both before and after querying Registrar
+    stacks = list_stacks()
+    known_stack_names = snapshot.record_stacks(
+        dict((name, (get_tenant_id(name), stack.created)) for name, stack in stacks.items()), run_started.isoformat())
+    known_stacks = dict((name, stacks[name]) for name in known_stack_names)
+
+    tenant_ids = set(get_tenant_id(name) for name in known_stacks)
+    registrar_tenants, registrar_scanned = refresh_registrar_tenants(snapshot, tenant_ids, run_started)
+    snapshot.record_run(run_started.isoformat(), registrar_scanned)
+
+    if last_run is None:
+        print('Snapshot created; orphans are reported from the next run')
+    return compare_tenants(registrar_tenants, known_stacks, stacks)
+
+
+def refresh_registrar_tenants(snapshot: Snapshot, tenant_ids: set[str], run_started: datetime) -> tuple[set[str], bool]:
+    """
+    Finds which of the tenants still exist in Registrar, only looking up those not confirmed recently
+
+    :return: the tenants that exist, and whether the Registrar table had to be scanned
+    """
+    confirmed = snapshot.tenants_seen_since((run_started - timedelta(hours=args.recheck_hours)).isoformat())
+    to_check = tenant_ids - confirmed
+
+    query_args = registrar_tenant_query_args()
+    if query_args is None:
+        print('Registrar has no tenantId key or index, so falling back to a full scan')
+        registrar_tenants = list_registrar_tenants()
+        snapshot.replace_tenants(registrar_tenants, run_started.isoformat())
+        return registrar_tenants, True
+
+    print(f"Looking up {len(to_check)} of {len(tenant_ids)} tenants in Registrar...")
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        exists = dict(zip(to_check, executor.map(lambda tenant_id: registrar_tenant_exists(query_args, tenant_id),
+                                                 to_check)))
+    present = set(tenant_id for tenant_id, found in exists.items() if found)
+    snapshot.record_tenants(present, to_check - present, run_started.isoformat())
+    return (tenant_ids & confirmed) | present, False
+
+
+def registrar_tenant_query_args() -> Optional[dict]:
+    """ The arguments of a Query finding a tenant in Registrar, if it has a key or index with tenantId as partition key """
+    table = dynamodb.describe_table(TableName=fnds_env.registrar_dynamo_table)['Table']
+    if _partition_key(table['KeySchema']) == 'tenantId':
+        return {
+            'TableName': fnds_env.registrar_dynamo_table
+        }
+    for index in table.get('GlobalSecondaryIndexes', []):
+        if _partition_key(index['KeySchema']) == 'tenantId':
+            return {
+                'TableName': fnds_env.registrar_dynamo_table,
+                'IndexName': index['IndexName'],
+            }
+    return None
+
+
+def _partition_key(key_schema: list[dict]) -> str:
+    return next(key['AttributeName'] for key in key_schema if key['KeyType'] == 'HASH')
+
+
+def registrar_tenant_exists(query_args: dict, tenant_id: str) -> bool:
+    response = dynamodb.query(**query_args,
+                              KeyConditionExpression='tenantId = :tenantId',
+                              ExpressionAttributeValues={
+                                  ':tenantId': {
+                                      'S': tenant_id
+                                  }
+                              },
+                              Select='COUNT',
+                              Limit=1)
+    return response['Count'] > 0
 
 
 def list_stacks() -> dict[str, StackInfo]:
@@ -150,20 +264,12 @@ def list_stacks() -> dict[str, StackInfo]:
 def list_registrar_tenants() -> set[str]:
     print("Listing Registrar's tenants...")
 
-    paginator = dynamodb.get_paginator('scan')
-    page_iterator = paginator.paginate(
+    items = scan_items(
+        dynamodb,
         TableName=fnds_env.registrar_dynamo_table,
-        AttributesToGet=['tenantId'],
+        ProjectionExpression='tenantId',
     )
-    deserializer = TypeDeserializer()
-
-    tenant_ids = set()
-    for page in page_iterator:
-        for item in page['Items']:
-            if tenant_id := item.get('tenantId'):
-                tenant_ids.add(deserializer.deserialize(tenant_id))
-
-    return tenant_ids
+    return set(item['tenantId'] for item in items if item.get('tenantId'))
 
 
 def get_tenant_id(stack_name: str) -> str:
@@ -175,43 +281,13 @@ def build_stack_name(tenant_id: str) -> str:
 
 
 def delete_stacks(stacks: list[StackInfo]):
-    with ThreadPoolExecutor(max_workers=MAX_EXECUTIONS) as executor:
-        for index, stack in enumerate(stacks):
-            executor.submit(delete_stack, index, stack.name)
-
-
-def delete_stack(index: int, stack_name: str):
-    print(f'{index}. Deleting stack {stack_name} at {datetime.now()}', flush=True)
-
-    execution_arn = trigger_delete(stack_name)
-    while True:
-        sleep(20)
-        if step_function_running(execution_arn):
-            print(f'{index}. Waiting at {datetime.now()}')
-        else:
-            print(f'{index}. Complete')
-            return
-
-
-def trigger_delete(stack_name: str) -> str:
-    tenant_id = get_tenant_id(stack_name)
-    result = sfn_client.start_execution(
-        stateMachineArn=fnds_env.step_function,
-        input=json.dumps({
-            'tenantId': tenant_id
-        }),
-    )
-    return result['executionArn']
-
-
-def step_function_running(execution_arn: str) -> bool:
-    result = sfn_client.describe_execution(executionArn=execution_arn)
-    status = result['status']
-    if status == 'RUNNING':
-        return True
-    if status == 'SUCCEEDED':
-        return False
-    raise Exception(f'Unexpected status {status} for execution {execution_arn}')
+    tracker = ExecutionTracker(sfn_client, fnds_env.step_function, MAX_EXECUTIONS, poll_seconds=20)
+    for index, stack in enumerate(stacks):
+        tracker.start(f'{index}. Delete of stack {stack.name}', {
+            'tenantId': get_tenant_id(stack.name)
+        })
+    tracker.wait_all()
+    print(f'Deletes finished: {tracker.finished}')
 
 
 def compare_tenants(registrar_tenants: set[str], stacks_before: dict[str, StackInfo],
@@ -0,0 +1,166 @@
+"""
+Parallel scans of DynamoDB tables and batched writes back to them, shared by the ops scripts.
+
+A scan is split into segments read concurrently, each by its own thread. Items are handed over through a bounded
+queue, so memory use doesn't grow with the size of the table however slowly they are processed. Within a segment, all
+items with the same partition key are read one after the other, which lets scan_partitions group them without holding
+the rest of the table.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Full, Queue
+from threading import BoundedSemaphore, Event, Lock
+from typing import Iterator, Optional
+
+from boto3.dynamodb.types import TypeDeserializer
+
+DEFAULT_SEGMENTS = 8
+DEFAULT_WRITERS = 16
+
+# Pages buffered per segment before its thread waits for them to be processed
+PAGES_PER_SEGMENT = 2
+
+_SEGMENT_DONE = object()
+
+
+def scan_items(client, segments: int = DEFAULT_SEGMENTS, **scan_args) -> Iterator[dict]:
+    """
+    Scans the table, yielding each item deserialized to Python types, in no particular order
+
+    :param client: a DynamoDB client
+    :param scan_args: arguments of Scan, such as TableName, IndexName and ProjectionExpression
+    """
+    for items in _scan_segments(client, segments, None, scan_args):
+        yield from items
+
+
+def scan_partitions(client,
+                    segments: int = DEFAULT_SEGMENTS,
+                    partition_key: str = "pk",
+                    **scan_args) -> Iterator[tuple[str, list[dict]]]:
+    """
+    Scans the table, yielding the key of each partition with all of its items, in no particular order. The partition
+    key must be projected.
+
+    :param client: a DynamoDB client
+    :param scan_args: arguments of Scan, such as TableName, IndexName and ProjectionExpression
+    """
+    for partitions in _scan_segments(client, segments, partition_key, scan_args):
+        yield from partitions
+
+
+def _scan_segments(client, segments: int, partition_key: Optional[str], scan_args: dict) -> Iterator[list]:
+    output = Queue(maxsize=segments * PAGES_PER_SEGMENT)
+    stopped = Event()
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        for segment in range(segments):
+            executor.submit(_scan_segment, client, segment, segments, partition_key, scan_args, output, stopped)
+
+        try:
+            remaining = segments
+            while remaining:
+                value = output.get()
+                if value is _SEGMENT_DONE:
+                    remaining -= 1
+                elif isinstance(value, Exception):
+                    raise value
+                else:
+                    yield value
+        finally:
+            # Lets the other segments' threads finish if the caller stopped early or a segment failed
+            stopped.set()
+
+
+def _scan_segment(client, segment: int, segments: int, partition_key: Optional[str], scan_args: dict, output: Queue,
+                  stopped: Event):
+    deserializer = TypeDeserializer()
+    current_key, current_items = None, []
+    try:
+        paginator = client.get_paginator("scan")
+        for page in paginator.paginate(Segment=segment, TotalSegments=segments, **scan_args):
+            items = [
+                dict((name, deserializer.deserialize(value)) for name, value in item.items()) for item in page["Items"]
+            ]
+            if partition_key is None:
+                if items and not _put(output, items, stopped):
+                    return
+                continue
+
+            partitions = []
+            for item in items:
+                if item[partition_key] != current_key:
+                    if current_items:
+                        partitions.append((current_key, current_items))
+                    current_key, current_items = item[partition_key], []
+                current_items.append(item)
+            # The last partition of the page may continue on the next page
+            if partitions and not _put(output, partitions, stopped):
+                return
+
+        if current_items and not _put(output, [(current_key, current_items)], stopped):
+            return
+        _put(output, _SEGMENT_DONE, stopped)
+    except Exception as error:  # pylint: disable=broad-except
+        _put(output, error, stopped)
+
+
+def _put(output: Queue, value, stopped: Event) -> bool:
+    """ Waits for space in the queue, unless the scan has been stopped """
+    while not stopped.is_set():
+        try:
+            output.put(value, timeout=1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+class BatchedWriter:
+    """
+    Applies changes to a table while it is being scanned. Deletes are sent 25 at a time with BatchWriteItem. DynamoDB
+    can't batch updates, so they are sent concurrently instead, with at most max_pending waiting at once. Use as a
+    context manager, which waits for all changes to be applied on exit.
+    """
+    def __init__(self, table, max_workers: int = DEFAULT_WRITERS, max_pending: Optional[int] = None):
+        self.table = table
+        # Resources aren't thread safe, but their client is, and it still takes Python types as the resource does
+        self._client = table.meta.client
+        self.updated = 0
+        self.skipped = 0
+        self.deleted = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = BoundedSemaphore(max_pending or max_workers * 4)
+        self._batch_writer = table.batch_writer()
+        self._errors: list[Exception] = []
+        self._lock = Lock()
+
+    def __enter__(self):
+        self._batch_writer.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._executor.shutdown(wait=True)
+        self._batch_writer.__exit__(exc_type, exc_value, traceback)
+        if self._errors and exc_type is None:
+            raise self._errors[0]
+
+    def delete(self, key: dict):
+        self._batch_writer.delete_item(Key=key)
+        self.deleted += 1
+
+    def update(self, **update_args):
+        """ Updates an item with the arguments of UpdateItem. Updates failing their condition are counted as skipped. """
+        self._pending.acquire()  # pylint: disable=consider-using-with
+        future = self._executor.submit(self._client.update_item, TableName=self.table.name, **update_args)
+        future.add_done_callback(self._update_done)
+
+    def _update_done(self, future: Future):
+        self._pending.release()
+        error = future.exception()
+        with self._lock:
+            if error is None:
+                self.updated += 1
+            elif isinstance(error, self._client.exceptions.ConditionalCheckFailedException):
+                self.skipped += 1
+            else:
+                self._errors.append(error)
@@ -1,20 +1,28 @@
 #!/usr/bin/env python
 """
 This script looks for tenants running old versions of the stack template and upgrades them.
+
+Prefer the upgrade-fleet step function, which does the same server-side; see docs/ResourceLifecycle.md.
 """
 
 import argparse
-import json
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from time import sleep
 
 import boto3
-from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
+
+from cloudwatch_metrics import get_active_queues
+from execution_tracker import ExecutionTracker
+from table_scan import DEFAULT_SEGMENTS, scan_items
 
+# Above about 30 concurrent tenant stack updates, CloudFormation starts throttling them. Watching the executions costs a
+# couple of calls per poll however many are running, so isn't what limits this.
 MAX_EXECUTIONS = 30
+# GetMetricData looks up 500 queues per request
+LEGACY_CHECK_BATCH_SIZE = 500
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--parent-stack", dest="parent_stack", help="The stack to analyze")
@@ -28,14 +36,25 @@ parser.add_argument("--commit",
                     action="store_true",
                     default=False,
                     help="If set, changes will be applied; otherwise we will only log")
+parser.add_argument("--segments",
+                    dest="segments",
+                    type=int,
+                    default=DEFAULT_SEGMENTS,
+                    help="The number of parts of the table to scan at once")
+parser.add_argument("--use-version-index",
+                    dest="use_version_index",
+                    action="store_true",
+                    default=False,
+                    help="Query the VersionIndex rather than scan the table, once MetadataVersion is backfilled")
 args = parser.parse_args()
 
 if args.commit and args.limit > MAX_EXECUTIONS:
-    print(f"--limit can't exceed {MAX_EXECUTIONS}, or we will trigger AWS rate limiting")
+    print(f"--limit can't exceed {MAX_EXECUTIONS}, or we will trigger CloudFormation rate limiting")
     sys.exit(1)
 
 sfn_client = boto3.client("stepfunctions")
-cloudwatch_client = boto3.client("cloudwatch")
+# GetMetricData calls run concurrently, so back off together if CloudWatch throttles them
+cloudwatch_client = boto3.client("cloudwatch", config=Config(retries={"mode": "adaptive"}))
 
 
 def get_resource_names():
@@ -60,37 +79,6 @@ def get_current_version():
         return file.readline().rstrip("\n")
 
 
-def upgrade_tenant(index: int, old_version: str, upgrade_step_function_arn: str, tenant_id: str):
-    print(f"{index}. Upgrading tenant {tenant_id} from {old_version}", flush=True)
-    execution_arn = trigger_upgrade(upgrade_step_function_arn, tenant_id)
-
-    while True:
-        sleep(15)
-        if step_function_running(execution_arn):
-            print(f"{index}. Waiting at {datetime.now()}")
-        else:
-            print(f"{index}. Complete")
-            return
-
-
-def trigger_upgrade(upgrade_step_function_arn, tenant_id) -> str:
-    result = sfn_client.start_execution(
-        stateMachineArn=upgrade_step_function_arn,
-        input=json.dumps({"tenantId": tenant_id}),
-    )
-    return result['executionArn']
-
-
-def step_function_running(execution_arn: str) -> bool:
-    result = sfn_client.describe_execution(executionArn=execution_arn)
-    status = result["status"]
-    if status == "RUNNING":
-        return True
-    if status == "SUCCEEDED":
-        return False
-    raise Exception(f"Unexpected status {status} for execution {execution_arn}")
-
-
 def upgrade_in_progress(table, current_version, tenant_id) -> bool:
     response = table.get_item(Key={
         "pk": f"TENANT_ID#{tenant_id}",
@@ -104,71 +92,115 @@ def upgrade_in_progress(table, current_version, tenant_id) -> bool:
     return item['Status'] in {'Started', 'Success'}
 
 
-def legacy_outbound_queue_active(tenant_id: str) -> bool:
+def legacy_outbound_queue_activity(tenant_ids: list[str]) -> dict[str, bool]:
     """
     Tenant stack version: 0.3.0
 
     We don't want to remove the outbound queues if they are still active. This looks for any recent events flowing
-    through the legacy outbound queue.
+    through the legacy outbound queues of the given tenants at once.
+
+    :return: whether each tenant's legacy outbound queue is active
     """
-    queue_name = f'{args.parent_stack}-{tenant_id}-outbound'
-    statistics = cloudwatch_client.get_metric_statistics(Namespace='AWS/SQS',
-                                                         MetricName='NumberOfMessagesSent',
-                                                         Dimensions=[{
-                                                             'Name': 'QueueName',
-                                                             'Value': queue_name,
-                                                         }],
-                                                         StartTime=datetime.now() - timedelta(days=1),
-                                                         EndTime=datetime.now(),
-                                                         Period=3600,
-                                                         Statistics=['Sum'])
-    if not statistics:
-        raise Exception(f'No stats for {queue_name}')
-
-    non_zero_datapoints = [dp for dp in statistics['Datapoints'] if dp['Sum'] > 0]
-    return len(non_zero_datapoints) > 0
+    queue_tenants = dict((f"{args.parent_stack}-{tenant_id}-outbound", tenant_id) for tenant_id in tenant_ids)
+    print(f"Checking {len(queue_tenants)} legacy outbound queues for activity")
+    active_queues = get_active_queues(cloudwatch_client, queue_tenants.keys(), datetime.now() - timedelta(days=1),
+                                      datetime.now())
+    return dict((queue_tenants[queue_name], active) for queue_name, active in active_queues.items())
 
 
-def scan_table(table_name, upgrade_step_function, current_version):
-    serializer = TypeSerializer()
-    deserializer = TypeDeserializer()
-
-    paginator = boto3.client("dynamodb").get_paginator("scan")
-    page_iterator = paginator.paginate(
-        TableName=table_name,
-        FilterExpression="sk = :sk and Version <> :version",
-        ExpressionAttributeValues={
-            ":sk": serializer.serialize("METADATA"),
-            ":version": serializer.serialize(current_version),
+def query_stale_versions(table, current_version):
+    """
+    Queries the version index for the tenants on each registered version other than the current one, so tenants
+    already on the current version aren't read
+    """
+    versions_query = {
+        "KeyConditionExpression": "pk = :pk",
+        "ExpressionAttributeValues": {
+            ":pk": "STACK_VERSION"
         },
-    )
+    }
+    stale_versions = [item["sk"] for item in query_items(table, **versions_query) if item["sk"] != current_version]
+    print(f"Querying tenants on versions {', '.join(stale_versions)}")
+
+    for stale_version in stale_versions:
+        yield from query_items(table,
+                               IndexName="VersionIndex",
+                               KeyConditionExpression="MetadataVersion = :version",
+                               ProjectionExpression="pk, MetadataVersion",
+                               ExpressionAttributeValues={":version": stale_version})
+
 
+def query_items(table, **query_args):
+    while True:
+        response = table.query(**query_args)
+        yield from response["Items"]
+        if "LastEvaluatedKey" not in response:
+            return
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def scan_table(table_name, upgrade_step_function, current_version):
     table = boto3.resource("dynamodb").Table(table_name)
 
-    with ThreadPoolExecutor(max_workers=args.limit) as executor:
-        need_upgrade = 0
-
-        for page in page_iterator:
-            items = page["Items"]
-            for item in items:
-                tenant_id: str = deserializer.deserialize(item["pk"]).replace("TENANT_ID#", "")
-                version: str = deserializer.deserialize(item["Version"])
-                if (version.startswith('0.1') or version.startswith('0.2')) and legacy_outbound_queue_active(tenant_id):
-                    print(f'Skipping tenant {tenant_id} with active legacy outbound queue')
-                    continue
-
-                need_upgrade += 1
-
-                if upgrade_in_progress(table, current_version, tenant_id):
-                    # Upgrade is already in progress; count this towards our limit
-                    print(f"Tenant {tenant_id} is already upgrading from {version}")
-                elif args.commit:
-                    executor.submit(upgrade_tenant, need_upgrade, version, upgrade_step_function, tenant_id)
-                else:
-                    print(f"Tenant {tenant_id} needs upgrading from {version}")
-
-        if args.commit and need_upgrade:
-            print(f"{need_upgrade} upgrades scheduled, waiting for futures at {datetime.now()}")
+    if args.use_version_index:
+        version_attribute = "MetadataVersion"
+        items = query_stale_versions(table, current_version)
+    else:
+        serializer = TypeSerializer()
+        version_attribute = "Version"
+        items = scan_items(boto3.client("dynamodb"),
+                           segments=args.segments,
+                           TableName=table_name,
+                           ProjectionExpression="pk, Version",
+                           FilterExpression="sk = :sk and Version <> :version",
+                           ExpressionAttributeValues={
+                               ":sk": serializer.serialize("METADATA"),
+                               ":version": serializer.serialize(current_version),
+                           })
+
+    tracker = ExecutionTracker(sfn_client, upgrade_step_function, args.limit)
+    need_upgrade = 0
+
+    def upgrade(tenant_id, version):
+        nonlocal need_upgrade
+        need_upgrade += 1
+
+        if upgrade_in_progress(table, current_version, tenant_id):
+            print(f"Tenant {tenant_id} is already upgrading from {version}")
+        elif args.commit:
+            tracker.start(f"{need_upgrade}. Upgrade of tenant {tenant_id} from {version}", {"tenantId": tenant_id})
+        else:
+            print(f"Tenant {tenant_id} needs upgrading from {version}")
+
+    def upgrade_legacy(tenants):
+        legacy_activity = legacy_outbound_queue_activity([tenant_id for tenant_id, _ in tenants])
+        for tenant_id, version in tenants:
+            if legacy_activity.get(tenant_id):
+                print(f'Skipping tenant {tenant_id} with active legacy outbound queue')
+            else:
+                upgrade(tenant_id, version)
+
+    # Upgrades start as the scan finds tenants. Legacy tenants are held back until there are enough to check their
+    # outbound queues for activity in a single GetMetricData call.
+    legacy_tenants: list[tuple[str, str]] = []
+    for item in items:
+        tenant_id, version = item["pk"].replace("TENANT_ID#", ""), item[version_attribute]
+        if not version.startswith(('0.1', '0.2')):
+            upgrade(tenant_id, version)
+            continue
+
+        legacy_tenants.append((tenant_id, version))
+        if len(legacy_tenants) == LEGACY_CHECK_BATCH_SIZE:
+            upgrade_legacy(legacy_tenants)
+            legacy_tenants = []
+
+    if legacy_tenants:
+        upgrade_legacy(legacy_tenants)
+
+    if args.commit and need_upgrade:
+        print(f"{need_upgrade} upgrades scheduled, waiting for the last to finish at {datetime.now()}")
+        tracker.wait_all()
+        print(f"Upgrades finished: {tracker.finished}")
 
     return need_upgrade > 0
 
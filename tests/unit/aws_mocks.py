@@ -28,7 +28,7 @@ def capture_put_events():
         yield put_events_calls
 
 
-def apigw_event(tenant_id='tenant123', queue_type=None):
+def apigw_event(tenant_id='tenant123', queue_type=None, query_parameters=None):
     """
     Generates an API Gateway event.
 
@@ -37,6 +37,7 @@ def apigw_event(tenant_id='tenant123', queue_type=None):
 
     :param tenant_id: tenant to include in the request url
     :param queue_type: (optional) queue type to include in the request url
+    :param query_parameters: (optional) dictionary of query string parameters
     """
 
     path_parameters = {
@@ -67,8 +68,11 @@ def apigw_event(tenant_id='tenant123', queue_type=None):
             'X-Forwarded-Port': ['443'],
             'X-Forwarded-Proto': ['https']
         },
-        'queryStringParameters': None,
-        'multiValueQueryStringParameters': None,
+        'queryStringParameters': query_parameters,
+        'multiValueQueryStringParameters': {
+            k: [v]
+            for k, v in query_parameters.items()
+        } if query_parameters else None,
         'pathParameters': path_parameters,
         'stageVariables': None,
         'requestContext': {
@@ -26,10 +26,12 @@ def test_handle_eventbridge_failures():
     assert response == [
         EventBridgeFailure(event=events[1],
                            error_code=eventbridge_response['Entries'][1]['ErrorCode'],
-                           error_message=eventbridge_response['Entries'][1]['ErrorMessage']),
+                           error_message=eventbridge_response['Entries'][1]['ErrorMessage'],
+                           index=1),
         EventBridgeFailure(event=events[2],
                            error_code=eventbridge_response['Entries'][2]['ErrorCode'],
-                           error_message=eventbridge_response['Entries'][2]['ErrorMessage'])
+                           error_message=eventbridge_response['Entries'][2]['ErrorMessage'],
+                           index=2)
     ]
 
 
@@ -0,0 +1,211 @@
+from unittest.mock import MagicMock
+
+from common.data.fleet_upgrade import MAX_KEYS_PER_BATCH, get_tenants_to_upgrade, get_upgrade_statuses
+
+TABLE_NAME = 'bb-foundations-connector-table'
+
+
+def _table():
+    table = MagicMock()
+    table.name = TABLE_NAME
+    return table
+
+
+def _audit_row(tenant_id: str, status: str) -> dict:
+    return {
+        'pk': f'TENANT_ID#{tenant_id}',
+        'Status': status,
+    }
+
+
+def _query_index(versions: list[str], pages: dict[str, list[dict]]):
+    """ Answers the stack versions query, then each version index query with that version's pages in turn """
+    def query(**query_args):
+        if 'IndexName' not in query_args:
+            return {
+                'Items': [{
+                    'sk': version
+                } for version in versions]
+            }
+        return pages[query_args['ExpressionAttributeValues'][':version']].pop(0)
+
+    return query
+
+
+def test_get_tenants_to_upgrade():
+    table = _table()
+    table.query.side_effect = _query_index(
+        ['0.2.1', '0.3.0', '0.4.0'], {
+            '0.2.1': [{
+                'Items': [{
+                    'pk': 'TENANT_ID#tenant-1',
+                    'MetadataVersion': '0.2.1'
+                }]
+            }],
+            '0.3.0': [{
+                'Items': [{
+                    'pk': 'TENANT_ID#tenant-2',
+                    'MetadataVersion': '0.3.0'
+                }],
+                'LastEvaluatedKey': {
+                    'pk': 'TENANT_ID#tenant-2',
+                    'sk': 'METADATA',
+                    'MetadataVersion': '0.3.0'
+                },
+            }],
+        })
+
+    tenants, next_key = get_tenants_to_upgrade(table, '0.4.0', 1000, use_version_index=True)
+
+    assert tenants == {
+        'tenant-1': '0.2.1',
+        'tenant-2': '0.3.0',
+    }
+    assert next_key == {
+        'pk': 'TENANT_ID#tenant-2',
+        'sk': 'METADATA',
+        'MetadataVersion': '0.3.0'
+    }
+    table.scan.assert_not_called()
+    first, second = [call.kwargs for call in table.query.call_args_list[1:]]
+    assert first['IndexName'] == 'VersionIndex'
+    assert first['KeyConditionExpression'] == 'MetadataVersion = :version'
+    assert first['Limit'] == 1000
+    # The rest of the page goes to the next version
+    assert second['ExpressionAttributeValues'][':version'] == '0.3.0'
+    assert second['Limit'] == 999
+
+
+def test_get_tenants_to_upgrade_resumes_version():
+    table = _table()
+    table.query.side_effect = _query_index(['0.2.1', '0.3.0', '0.4.0'], {
+        '0.3.0': [{
+            'Items': []
+        }]
+    })
+    start_key = {
+        'pk': 'TENANT_ID#tenant-2',
+        'sk': 'METADATA',
+        'MetadataVersion': '0.3.0'
+    }
+
+    assert get_tenants_to_upgrade(table, '0.4.0', 1000, start_key, use_version_index=True) == ({}, None)
+    # Versions before the start key are finished, and the current version is never read
+    query = table.query.call_args.kwargs
+    assert table.query.call_count == 2
+    assert query['ExclusiveStartKey'] == start_key
+
+
+def test_get_tenants_to_upgrade_page_ends_with_version():
+    table = _table()
+    table.query.side_effect = _query_index(['0.2.1', '0.3.0', '0.4.0'], {
+        '0.2.1': [{
+            'Items': [{
+                'pk': 'TENANT_ID#tenant-1',
+                'MetadataVersion': '0.2.1'
+            }]
+        }]
+    })
+
+    tenants, next_key = get_tenants_to_upgrade(table, '0.4.0', 1, use_version_index=True)
+
+    assert tenants == {
+        'tenant-1': '0.2.1'
+    }
+    # Starts the next page at the beginning of the next version
+    assert next_key == {
+        'MetadataVersion': '0.3.0'
+    }
+
+
+def test_get_tenants_to_upgrade_last_page():
+    table = _table()
+    table.scan.return_value = {
+        'Items': []
+    }
+
+    assert get_tenants_to_upgrade(table, '0.4.0', 1000) == ({}, None)
+    assert 'ExclusiveStartKey' not in table.scan.call_args.kwargs
+
+
+def test_get_tenants_to_upgrade_before_backfill():
+    table = _table()
+    table.scan.return_value = {
+        'Items': [{
+            'pk': 'TENANT_ID#tenant-1',
+            'Version': '0.3.0'
+        }]
+    }
+
+    tenants, _ = get_tenants_to_upgrade(table, '0.4.0', 1000)
+
+    # Tenants without a MetadataVersion aren't in the version index yet
+    assert tenants == {
+        'tenant-1': '0.3.0'
+    }
+    scan = table.scan.call_args.kwargs
+    assert 'IndexName' not in scan
+    assert scan['ExpressionAttributeValues'] == {
+        ':sk': 'METADATA',
+        ':version': '0.4.0'
+    }
+
+
+def test_get_upgrade_statuses_batches_keys():
+    tenant_ids = [f'tenant-{i}' for i in range(MAX_KEYS_PER_BATCH + 1)]
+    dynamodb = MagicMock()
+    dynamodb.batch_get_item.side_effect = [{
+        'Responses': {
+            TABLE_NAME: [_audit_row('tenant-0', 'Success'),
+                         _audit_row('tenant-1', 'Failure')]
+        },
+    }, {
+        'Responses': {
+            TABLE_NAME: [_audit_row(f'tenant-{MAX_KEYS_PER_BATCH}', 'Started')]
+        },
+    }]
+
+    statuses = get_upgrade_statuses(dynamodb, _table(), tenant_ids, '0.4.0')
+
+    assert statuses == {
+        'tenant-0': 'Success',
+        'tenant-1': 'Failure',
+        f'tenant-{MAX_KEYS_PER_BATCH}': 'Started',
+    }
+    first, second = [call.kwargs['RequestItems'][TABLE_NAME]['Keys'] for call in dynamodb.batch_get_item.call_args_list]
+    assert len(first) == MAX_KEYS_PER_BATCH
+    assert second == [{
+        'pk': f'TENANT_ID#tenant-{MAX_KEYS_PER_BATCH}',
+        'sk': 'AUDIT#UPDATE#0.4.0'
+    }]
+
+
+def test_get_upgrade_statuses_retries_unprocessed_keys():
+    unprocessed = {
+        TABLE_NAME: {
+            'Keys': [{
+                'pk': 'TENANT_ID#tenant-1',
+                'sk': 'AUDIT#UPDATE#0.4.0'
+            }]
+        }
+    }
+    dynamodb = MagicMock()
+    dynamodb.batch_get_item.side_effect = [{
+        'Responses': {
+            TABLE_NAME: [_audit_row('tenant-0', 'Success')]
+        },
+        'UnprocessedKeys': unprocessed,
+    }, {
+        'Responses': {
+            TABLE_NAME: [_audit_row('tenant-1', 'Success')]
+        },
+        'UnprocessedKeys': {},
+    }]
+
+    statuses = get_upgrade_statuses(dynamodb, _table(), ['tenant-0', 'tenant-1'], '0.4.0')
+
+    assert statuses == {
+        'tenant-0': 'Success',
+        'tenant-1': 'Success',
+    }
+    assert dynamodb.batch_get_item.call_args.kwargs['RequestItems'] == unprocessed
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from common.data.message_encoding import MessageEncoding, decode_message_body, encode_message_body
+
+
+def test_message_encoding_from_string():
+    assert MessageEncoding.from_string('identity') == MessageEncoding.IDENTITY
+    assert MessageEncoding.from_string('GZip') == MessageEncoding.GZIP
+
+    with pytest.raises(ValueError):
+        MessageEncoding.from_string('brotli')
+
+
+def test_encode_identity():
+    body = json.dumps({
+        'payload': 'x' * 4096
+    })
+
+    assert encode_message_body(body, MessageEncoding.IDENTITY) == (body, {})
+
+
+def test_encode_small_body_is_not_compressed():
+    body = json.dumps({
+        'payload': 'small'
+    })
+
+    assert encode_message_body(body, MessageEncoding.GZIP) == (body, {})
+
+
+def test_encode_gzip_round_trip():
+    body = json.dumps({
+        'payload': 'x' * 4096
+    })
+
+    encoded_body, attributes = encode_message_body(body, MessageEncoding.GZIP)
+
+    assert attributes == {
+        'ContentEncoding': {
+            'DataType': 'String',
+            'StringValue': 'gzip',
+        }
+    }
+    assert len(encoded_body) < len(body)
+    assert decode_message_body(encoded_body, attributes) == body
+
+
+def test_decode_lambda_record_attributes():
+    body = json.dumps({
+        'payload': 'x' * 4096
+    })
+    encoded_body, _ = encode_message_body(body, MessageEncoding.GZIP)
+
+    record_attributes = {
+        'ContentEncoding': {
+            'dataType': 'String',
+            'stringValue': 'gzip',
+        }
+    }
+    assert decode_message_body(encoded_body, record_attributes) == body
+    assert decode_message_body(body, {}) == body
@@ -1,8 +1,11 @@
 from unittest.mock import patch, Mock, MagicMock
 import json
+
+import boto3
 import pytest
 
-from common.data.queues import Queue, QueueType, item_to_queues, item_to_queue, get_sqs_credentials
+from common.data.queues import BATCH_GET_MAX_ATTEMPTS, Queue, QueueType, UnprocessedTenants, item_to_queues, \
+    item_to_queue, get_sqs_credentials, batch_get_queues, wait_for_queue, create_queues
 
 TENANT_ID = "00000000-0000-0000-0000-000000000000"
 
@@ -160,3 +163,223 @@ def test_assume_sts_inbound():
             }]
         }),
     )
+
+
+@patch('common.data.queues.time.sleep')
+def test_batch_get_queues(mock_sleep):
+    tenant_ids = [f'tenant-{i}' for i in range(60)]
+    table = MagicMock()
+    table.name = 'bb-foundations-connector-table'
+
+    def batch_get_item(RequestItems):  # pylint: disable=invalid-name
+        keys = RequestItems[table.name]['Keys']
+        if keys[0]['pk'] == 'TENANT_ID#tenant-0':
+            # Leave one key unprocessed to be retried
+            items = [{
+                'pk': 'TENANT_ID#tenant-0',
+                'sk': 'METADATA',
+                'InboundQueueArn': 'arn:inbound',
+                'InboundQueueUrl': 'https://inbound',
+                'CreatedAt': 'timestamp',
+            }]
+            return {
+                'Responses': {
+                    table.name: items
+                },
+                'UnprocessedKeys': {
+                    table.name: {
+                        **RequestItems[table.name], 'Keys': [{
+                            'pk': 'TENANT_ID#tenant-1',
+                            'sk': 'AUDIT#DELETE'
+                        }]
+                    }
+                },
+            }
+        if keys[0]['pk'] == 'TENANT_ID#tenant-1':
+            return {
+                'Responses': {
+                    table.name: [{
+                        'pk': 'TENANT_ID#tenant-1',
+                        'sk': 'AUDIT#DELETE',
+                        'Status': 'Started'
+                    }]
+                }
+            }
+        return {
+            'Responses': {}
+        }
+
+    table.meta.client.batch_get_item.side_effect = batch_get_item
+
+    results = batch_get_queues(table, tenant_ids)
+
+    # 50 tenants, with two rows each, per batch, plus the retry
+    assert table.meta.client.batch_get_item.call_count == 3
+    batch_sizes = sorted(
+        len(call.kwargs['RequestItems'][table.name]['Keys'])
+        for call in table.meta.client.batch_get_item.call_args_list)
+    assert batch_sizes == [1, 20, 100]
+
+    assert list(results.keys()) == tenant_ids
+    assert [queue.sqs_arn for queue in results['tenant-0'].queues] == ['arn:inbound']
+    assert results['tenant-0'].delete_status is None
+    assert results['tenant-1'].queues == []
+    assert results['tenant-1'].delete_status == 'Started'
+    assert results['tenant-59'].queues == []
+    mock_sleep.assert_called_once_with(0.05)
+
+
+@patch('common.data.queues.time.sleep')
+def test_batch_get_queues_still_unprocessed(mock_sleep):
+    table = MagicMock()
+    table.name = 'bb-foundations-connector-table'
+    # Throttled on every attempt
+    table.meta.client.batch_get_item.side_effect = lambda RequestItems: {  # pylint: disable=invalid-name
+        'Responses': {},
+        'UnprocessedKeys': RequestItems,
+    }
+
+    with pytest.raises(UnprocessedTenants) as error:
+        batch_get_queues(table, ['tenant-0', 'tenant-1'])
+
+    assert error.value.tenant_ids == ['tenant-0', 'tenant-1']
+    assert table.meta.client.batch_get_item.call_count == BATCH_GET_MAX_ATTEMPTS
+    # Backing off exponentially between attempts
+    assert [call.args[0] for call in mock_sleep.call_args_list] == [0.05, 0.1, 0.2, 0.4]
+
+
+@patch('common.data.queues.time.sleep')
+def test_wait_for_queue(mock_sleep):
+    table = MagicMock()
+    table.name = 'bb-foundations-connector-table'
+    metadata = {
+        'sk': 'METADATA',
+        'InboundQueueArn': 'arn:inbound',
+        'InboundQueueUrl': 'https://inbound',
+        'CreatedAt': 'timestamp',
+    }
+    table.meta.client.batch_get_item.side_effect = [
+        {
+            'Responses': {
+                table.name: [{
+                    'sk': 'AUDIT#CREATE',
+                    'Status': 'Started'
+                }]
+            }
+        },
+        {
+            'Responses': {},
+            'UnprocessedKeys': {}
+        },
+        {
+            'Responses': {
+                table.name: [metadata, {
+                    'sk': 'AUDIT#CREATE',
+                    'Status': 'Started'
+                }]
+            }
+        },
+    ]
+
+    queue = wait_for_queue(table, TENANT_ID, QueueType.Inbound, timeout_seconds=10, poll_seconds=1)
+
+    assert queue.sqs_arn == 'arn:inbound'
+    assert mock_sleep.call_count == 2
+    request_items = table.meta.client.batch_get_item.call_args.kwargs['RequestItems'][table.name]
+    assert request_items['ConsistentRead'] is True
+    assert [key['sk'] for key in request_items['Keys']] == ['METADATA', 'AUDIT#CREATE']
+
+
+@patch('common.data.queues.time.sleep')
+def test_wait_for_queue_failed_or_timed_out(mock_sleep):
+    table = MagicMock()
+    table.name = 'bb-foundations-connector-table'
+
+    table.meta.client.batch_get_item.return_value = {
+        'Responses': {
+            table.name: [{
+                'sk': 'AUDIT#CREATE',
+                'Status': 'Failure'
+            }]
+        }
+    }
+    assert wait_for_queue(table, TENANT_ID, QueueType.Inbound, timeout_seconds=10, poll_seconds=1) is None
+    mock_sleep.assert_not_called()
+
+    table.meta.client.batch_get_item.return_value = {
+        'Responses': {
+            table.name: [{
+                'sk': 'AUDIT#CREATE',
+                'Status': 'Started'
+            }]
+        }
+    }
+    assert wait_for_queue(table, TENANT_ID, QueueType.Inbound, timeout_seconds=0.5, poll_seconds=1) is None
+    mock_sleep.assert_not_called()
+
+
+def _claim_table():
+    table = MagicMock()
+    table.meta.client.exceptions = boto3.client('dynamodb', region_name='us-east-1').exceptions
+    return table
+
+
+def _sfn_client():
+    sfn_client = MagicMock()
+    sfn_client.exceptions = boto3.client('stepfunctions', region_name='us-east-1').exceptions
+    return sfn_client
+
+
+def test_create_queues():
+    table = _claim_table()
+    sfn_client = _sfn_client()
+
+    assert create_queues(sfn_client, table, 'provisioner_arn', TENANT_ID, 'client-id', retry_count=2)
+
+    claim = table.put_item.call_args.kwargs
+    assert claim['Item']['sk'] == 'CLAIM#CREATE'
+    assert claim['Item']['Attempt'] == 2
+    assert claim['ExpressionAttributeValues'][':attempt'] == 2
+    sfn_client.start_execution.assert_called_once_with(stateMachineArn='provisioner_arn',
+                                                       name=f'{TENANT_ID}-2',
+                                                       input=json.dumps({
+                                                           'tenantId': TENANT_ID,
+                                                           'currentCount': '2',
+                                                           'retryCount': '3',
+                                                           'clientId': 'client-id',
+                                                       }))
+
+
+def test_create_queues_already_claimed():
+    table = _claim_table()
+    table.put_item.side_effect = table.meta.client.exceptions.ConditionalCheckFailedException(
+        {
+            'Error': {
+                'Code': 'ConditionalCheckFailedException'
+            }
+        }, 'PutItem')
+    sfn_client = _sfn_client()
+
+    assert not create_queues(sfn_client, table, 'provisioner_arn', TENANT_ID, 'client-id')
+    sfn_client.start_execution.assert_not_called()
+
+
+def test_create_queues_name_already_used():
+    table = _claim_table()
+    sfn_client = _sfn_client()
+    sfn_client.start_execution.side_effect = [
+        sfn_client.exceptions.ExecutionAlreadyExists({
+            'Error': {
+                'Code': 'ExecutionAlreadyExists'
+            }
+        }, 'StartExecution'),
+        {
+            'executionArn': 'arn'
+        },
+    ]
+
+    assert create_queues(sfn_client, table, 'provisioner_arn', TENANT_ID, 'client-id')
+
+    names = [call.kwargs['name'] for call in sfn_client.start_execution.call_args_list]
+    assert names[0] == f'{TENANT_ID}-0'
+    assert names[1].startswith(f'{TENANT_ID}-0-')
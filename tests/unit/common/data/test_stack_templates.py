@@ -0,0 +1,60 @@
+import hashlib
+from unittest.mock import MagicMock
+
+from common.data.stack_templates import StackTemplate, is_stack_up_to_date
+
+TEMPLATE_BODY = 'Resources: {}\n'
+TEMPLATE_URL = 'https://s3.us-east-1.amazonaws.com/assets/0123.yaml'
+
+
+def _stack(status='UPDATE_COMPLETE', template_hash='0123'):
+    stack = MagicMock()
+    stack.stack_status = status
+    stack.parameters = [{
+        'ParameterKey': 'TenantId',
+        'ParameterValue': 'tenant'
+    }, {
+        'ParameterKey': 'TemplateHash',
+        'ParameterValue': template_hash
+    }]
+    stack.tags = [{
+        'Key': 'TenantId',
+        'Value': 'tenant'
+    }]
+    return stack
+
+
+def test_template_hash_is_of_content():
+    assert StackTemplate(TEMPLATE_BODY).hash == hashlib.sha256(TEMPLATE_BODY.encode('utf-8')).hexdigest()
+    assert StackTemplate(TEMPLATE_BODY).hash == StackTemplate(TEMPLATE_BODY, url=TEMPLATE_URL).hash
+
+
+def test_staged_template_is_referenced_by_url():
+    assert StackTemplate(TEMPLATE_BODY, url=TEMPLATE_URL).template_args() == {
+        'TemplateURL': TEMPLATE_URL
+    }
+
+
+def test_local_template_sends_body():
+    assert StackTemplate(TEMPLATE_BODY).template_args() == {
+        'TemplateBody': TEMPLATE_BODY
+    }
+
+
+def test_is_stack_up_to_date():
+    parameters = {
+        'TenantId': 'tenant',
+        'TemplateHash': '0123',
+    }
+    tags = {
+        'TenantId': 'tenant'
+    }
+
+    assert is_stack_up_to_date(_stack(), parameters, tags)
+    assert is_stack_up_to_date(_stack(status='CREATE_COMPLETE'), parameters, tags)
+
+    assert not is_stack_up_to_date(_stack(template_hash='4567'), parameters, tags)
+    assert not is_stack_up_to_date(_stack(), parameters, dict(tags, Team='fnds'))
+    # Parameters are those of the rolled back update, or not yet those of the update in progress
+    assert not is_stack_up_to_date(_stack(status='UPDATE_ROLLBACK_COMPLETE'), parameters, tags)
+    assert not is_stack_up_to_date(_stack(status='UPDATE_IN_PROGRESS'), parameters, tags)
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from common.data import stack_versions
+from common.data.stack_versions import get_stack_versions, register_stack_version
+
+
+@pytest.fixture(autouse=True)
+def clear_registered_versions():
+    stack_versions._registered_versions.clear()  # pylint: disable=protected-access
+
+
+def test_register_stack_version():
+    table = MagicMock()
+
+    register_stack_version(table, '0.4.0')
+    register_stack_version(table, '0.4.0')
+
+    # Only written once by each container
+    table.put_item.assert_called_once_with(Item={
+        'pk': 'STACK_VERSION',
+        'sk': '0.4.0',
+    })
+
+
+def test_get_stack_versions():
+    table = MagicMock()
+    table.query.side_effect = [{
+        'Items': [{
+            'sk': '0.3.0'
+        }],
+        'LastEvaluatedKey': {
+            'pk': 'STACK_VERSION',
+            'sk': '0.3.0'
+        },
+    }, {
+        'Items': [{
+            'sk': '0.4.0'
+        }]
+    }]
+
+    assert get_stack_versions(table) == ['0.3.0', '0.4.0']
+    assert table.query.call_args.kwargs['ExclusiveStartKey'] == {
+        'pk': 'STACK_VERSION',
+        'sk': '0.3.0'
+    }
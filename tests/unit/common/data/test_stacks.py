@@ -0,0 +1,202 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import boto3
+
+from common.data.stacks import complete_stack_task, get_typical_stack_seconds, is_settled, put_stack_task_token, \
+    recommend_next_poll_seconds, record_stack_completion, record_stack_seconds, stack_status_result, \
+    tenant_id_from_stack_name, to_stack_name
+from common.dates import format_iso8601_date
+
+TENANT_ID = '00000000-0000-0000-0000-000000000000'
+EXECUTION = 'arn:aws:states:us-east-1:123456789012:execution:bb-automations-update:0000'
+STACK_NAME = f'bb-automations-{TENANT_ID}'
+STACK_ID = f'arn:aws:cloudformation:us-east-1:123456789012:stack/{STACK_NAME}/5d5c1c10-0000-0000-0000-000000000000'
+
+
+def test_stack_status_result():
+    assert stack_status_result('CREATE_IN_PROGRESS') == {
+        'status': 'CREATE_IN_PROGRESS',
+        'isComplete': False,
+        'isFailure': False,
+        'nextPollSeconds': 5
+    }
+    assert stack_status_result('UPDATE_COMPLETE') == {
+        'status': 'UPDATE_COMPLETE',
+        'isComplete': True,
+        'isFailure': False,
+        'nextPollSeconds': 5
+    }
+    assert stack_status_result('ROLLBACK_COMPLETE') == {
+        'status': 'ROLLBACK_COMPLETE',
+        'isComplete': True,
+        'isFailure': True,
+        'nextPollSeconds': 5
+    }
+
+
+def test_recommend_next_poll_seconds():
+    # Unknown typical duration
+    assert recommend_next_poll_seconds('CREATE_IN_PROGRESS', 10, None, 15) == 15
+
+    # Approaching the typical duration
+    assert recommend_next_poll_seconds('CREATE_IN_PROGRESS', 0, 400, 15) == 60
+    assert recommend_next_poll_seconds('CREATE_IN_PROGRESS', 60, 100, 15) == 20
+    assert recommend_next_poll_seconds('CREATE_IN_PROGRESS', 95, 100, 15) == 5
+
+    # Overrunning the typical duration
+    assert recommend_next_poll_seconds('DELETE_IN_PROGRESS', 140, 100, 30) == 20
+    assert recommend_next_poll_seconds('DELETE_IN_PROGRESS', 1000, 100, 30) == 60
+
+    # Nearly done
+    assert recommend_next_poll_seconds('UPDATE_COMPLETE_CLEANUP_IN_PROGRESS', 0, 400, 15) == 5
+
+
+def test_typical_stack_seconds():
+    table = MagicMock()
+
+    table.get_item.return_value = {}
+    assert get_typical_stack_seconds(table, 'CREATE') is None
+
+    table.get_item.return_value = {
+        'Item': {
+            'CompletedCount': Decimal(4),
+            'TotalSeconds': Decimal(300)
+        }
+    }
+    assert get_typical_stack_seconds(table, 'CREATE') == 75
+    table.get_item.assert_called_with(Key={
+        'pk': 'STACK_STATS',
+        'sk': 'CREATE'
+    })
+
+
+def _stats_table():
+    table = MagicMock()
+    table.name = 'bb-foundations-connector-table'
+    table.meta.client.exceptions = boto3.client('dynamodb', region_name='us-east-1').exceptions
+    return table
+
+
+def test_record_stack_seconds():
+    table = _stats_table()
+
+    assert record_stack_seconds(table, TENANT_ID, EXECUTION, 'UPDATE', 42.7)
+
+    marker, stats = table.meta.client.transact_write_items.call_args.kwargs['TransactItems']
+    assert marker['Put']['Item'] == {
+        'pk': f'TENANT_ID#{TENANT_ID}',
+        'sk': 'LAST_STACK_OPERATION',
+        'Execution': EXECUTION,
+        'Operation': 'UPDATE',
+        'Seconds': Decimal(42),
+    }
+    # Each execution is counted once
+    assert marker['Put']['ConditionExpression'] == 'attribute_not_exists(pk) OR Execution <> :execution'
+    assert stats['Update']['Key'] == {
+        'pk': 'STACK_STATS',
+        'sk': 'UPDATE'
+    }
+    assert stats['Update']['UpdateExpression'] == 'ADD CompletedCount :one, TotalSeconds :seconds'
+    assert stats['Update']['ExpressionAttributeValues'] == {
+        ':one': 1,
+        ':seconds': Decimal(42)
+    }
+
+
+def test_record_stack_seconds_already_recorded():
+    table = _stats_table()
+    table.meta.client.transact_write_items.side_effect = table.meta.client.exceptions.TransactionCanceledException(
+        {
+            'Error': {
+                'Code': 'TransactionCanceledException'
+            },
+            'CancellationReasons': [{
+                'Code': 'ConditionalCheckFailed'
+            }, {
+                'Code': 'None'
+            }],
+        }, 'TransactWriteItems')
+
+    assert not record_stack_seconds(table, TENANT_ID, EXECUTION, 'UPDATE', 42.7)
+
+
+@patch('common.data.stacks.record_stack_seconds')
+def test_record_stack_completion(mock_record_stack_seconds):
+    table = MagicMock()
+    started_at = format_iso8601_date(datetime.now(timezone.utc) - timedelta(minutes=2))
+
+    record_stack_completion(table, TENANT_ID, EXECUTION, 'CREATE', started_at, 'CREATE_COMPLETE')
+
+    _, tenant_id, execution, operation, seconds = mock_record_stack_seconds.call_args.args
+    assert (tenant_id, execution, operation) == (TENANT_ID, EXECUTION, 'CREATE')
+    assert 120 <= seconds < 130
+
+    # Failed operations, and tokens registered before the operation was, aren't recorded
+    mock_record_stack_seconds.reset_mock()
+    record_stack_completion(table, TENANT_ID, EXECUTION, 'CREATE', started_at, 'ROLLBACK_COMPLETE')
+    record_stack_completion(table, TENANT_ID, EXECUTION, None, None, 'CREATE_COMPLETE')
+    mock_record_stack_seconds.assert_not_called()
+
+
+def test_is_settled():
+    assert not is_settled('CREATE_IN_PROGRESS')
+    assert not is_settled('UPDATE_COMPLETE_CLEANUP_IN_PROGRESS')
+    # CloudFormation deletes the stack next, so keep waiting
+    assert not is_settled('CREATE_FAILED')
+    assert is_settled('CREATE_COMPLETE')
+    assert is_settled('UPDATE_ROLLBACK_COMPLETE')
+    assert is_settled('DELETE_COMPLETE')
+
+
+def test_stack_names():
+    assert to_stack_name(STACK_ID) == STACK_NAME
+    assert to_stack_name(STACK_NAME) == STACK_NAME
+    assert tenant_id_from_stack_name('bb-automations', STACK_NAME) == TENANT_ID
+    assert tenant_id_from_stack_name('bb-automations', 'other-stack') is None
+
+
+def test_put_stack_task_token():
+    table = MagicMock()
+
+    put_stack_task_token(table, TENANT_ID, STACK_ID, 'token', 'arn:execution', 'CREATE', '2020-08-31T16:02:16.808Z')
+
+    item = table.put_item.call_args.kwargs['Item']
+    assert item['pk'] == f'TENANT_ID#{TENANT_ID}'
+    assert item['sk'] == 'STACK_TASK_TOKEN'
+    assert item['StackName'] == STACK_NAME
+    assert item['TaskToken'] == 'token'
+    assert item['Execution'] == 'arn:execution'
+    assert item['Operation'] == 'CREATE'
+    assert item['StartedAt'] == '2020-08-31T16:02:16.808Z'
+
+
+def test_complete_stack_task():
+    table = MagicMock()
+    sfn_client = MagicMock()
+
+    assert complete_stack_task(table, sfn_client, TENANT_ID, 'token', 'CREATE_COMPLETE')
+
+    sfn_client.send_task_success.assert_called_once_with(
+        taskToken='token',
+        output='{"status": "CREATE_COMPLETE", "isComplete": true, "isFailure": false, "nextPollSeconds": 5}')
+    # Only removes the token if a newer execution hasn't replaced it
+    delete = table.delete_item.call_args.kwargs
+    assert delete['Key'] == {
+        'pk': f'TENANT_ID#{TENANT_ID}',
+        'sk': 'STACK_TASK_TOKEN'
+    }
+    assert delete['ConditionExpression'] == 'TaskToken = :taskToken'
+    assert delete['ExpressionAttributeValues'] == {
+        ':taskToken': 'token'
+    }
+
+
+def test_complete_stack_task_no_longer_waiting():
+    table = MagicMock()
+    sfn_client = boto3.client('stepfunctions', region_name='us-east-1')
+    sfn_client.send_task_success = MagicMock(side_effect=sfn_client.exceptions.TaskTimedOut({}, 'SendTaskSuccess'))
+
+    assert not complete_stack_task(table, sfn_client, TENANT_ID, 'token', 'UPDATE_COMPLETE')
+    table.delete_item.assert_called_once()
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import boto3
+import pytest
+
+from common.data.queues import StepFunctionAction
+from common.data.stale_executions import get_execution_outcome, get_stale_audit_rows, record_execution_outcome
+
+EXECUTION_ARN = 'arn:aws:states:us-east-1:123456789012:execution:fnds-connector-create:abc'
+
+AUDIT_ROW = {
+    'pk': 'TENANT_ID#tenant-1',
+    'sk': 'AUDIT#CREATE',
+    'Status': 'Started',
+    'UpdatedAt': '2026-10-19T10:00:00.000Z',
+    'Execution': EXECUTION_ARN,
+}
+
+
+@pytest.fixture(name='table')
+def fixture_table():
+    table = MagicMock()
+    table.meta.client.exceptions = boto3.client('dynamodb', region_name='us-east-1').exceptions
+    return table
+
+
+@pytest.fixture(name='sfn_client')
+def fixture_sfn_client():
+    sfn_client = MagicMock()
+    sfn_client.exceptions = boto3.client('stepfunctions', region_name='us-east-1').exceptions
+    return sfn_client
+
+
+def test_get_stale_audit_rows(table):
+    table.query.side_effect = [{
+        'Items': [AUDIT_ROW],
+        'LastEvaluatedKey': {
+            'pk': 'TENANT_ID#tenant-1',
+            'sk': 'AUDIT#CREATE'
+        },
+    }, {
+        'Items': [],
+    }]
+
+    rows = get_stale_audit_rows(table, StepFunctionAction.CREATE, datetime(2026, 10, 19, 11, tzinfo=timezone.utc))
+
+    assert rows == [AUDIT_ROW]
+    query = table.query.call_args_list[0].kwargs
+    assert query['IndexName'] == 'InFlightIndex'
+    assert query['ExpressionAttributeValues'] == {
+        ':action': 'CREATE',
+        ':updatedBefore': '2026-10-19T11:00:00.000Z',
+    }
+    assert table.query.call_args_list[1].kwargs['ExclusiveStartKey'] == {
+        'pk': 'TENANT_ID#tenant-1',
+        'sk': 'AUDIT#CREATE'
+    }
+
+
+@pytest.mark.parametrize('status, outcome', [
+    ('RUNNING', None),
+    ('PENDING_REDRIVE', None),
+    ('SUCCEEDED', 'Success'),
+    ('FAILED', 'Failure'),
+    ('TIMED_OUT', 'Failure'),
+    ('ABORTED', 'Failure'),
+])
+def test_get_execution_outcome(sfn_client, status, outcome):
+    sfn_client.describe_execution.return_value = {
+        'status': status
+    }
+
+    assert get_execution_outcome(sfn_client, EXECUTION_ARN) == outcome
+    sfn_client.describe_execution.assert_called_once_with(executionArn=EXECUTION_ARN)
+
+
+def test_get_execution_outcome_of_expired_execution(sfn_client):
+    sfn_client.describe_execution.side_effect = sfn_client.exceptions.ExecutionDoesNotExist(
+        {
+            'Error': {
+                'Code': 'ExecutionDoesNotExist'
+            }
+        }, 'DescribeExecution')
+
+    assert get_execution_outcome(sfn_client, EXECUTION_ARN) == 'Failure'
+
+
+def test_record_execution_outcome(table):
+    assert record_execution_outcome(table, AUDIT_ROW, 'Failure')
+
+    update = table.update_item.call_args.kwargs
+    assert update['Key'] == {
+        'pk': 'TENANT_ID#tenant-1',
+        'sk': 'AUDIT#CREATE'
+    }
+    assert 'REMOVE InFlight' in update['UpdateExpression']
+    assert update['ExpressionAttributeValues'][':status'] == 'Failure'
+    assert update['ExpressionAttributeValues'][':execution'] == EXECUTION_ARN
+
+
+def test_record_execution_outcome_of_replaced_row(table):
+    table.update_item.side_effect = table.meta.client.exceptions.ConditionalCheckFailedException(
+        {
+            'Error': {
+                'Code': 'ConditionalCheckFailedException'
+            }
+        }, 'UpdateItem')
+
+    assert not record_execution_outcome(table, AUDIT_ROW, 'Success')
@@ -0,0 +1,178 @@
+import json
+from unittest.mock import MagicMock
+
+import boto3
+
+from common.data.tenant_queues import create_inbound_queue, get_inbound_queue_tenants, is_directly_provisioned, \
+    put_direct_metadata, retag_queue, tenant_tags
+
+QUEUE_URL = 'https://sqs.us-east-1.amazonaws.com/123456789012/fnds-connector-pool-0-inbound'
+QUEUE_ARN = 'arn:aws:sqs:us-east-1:123456789012:fnds-connector-pool-0-inbound'
+DLQ_ARN = 'arn:aws:sqs:us-east-1:123456789012:fnds-connector-inbound-dlq'
+
+
+def _sqs_client():
+    sqs_client = MagicMock()
+    sqs_client.exceptions = boto3.client('sqs', region_name='us-east-1').exceptions
+    sqs_client.create_queue.return_value = {
+        'QueueUrl': QUEUE_URL
+    }
+    sqs_client.get_queue_url.return_value = {
+        'QueueUrl': QUEUE_URL
+    }
+    sqs_client.get_queue_attributes.return_value = {
+        'Attributes': {
+            'QueueArn': QUEUE_ARN
+        }
+    }
+    return sqs_client
+
+
+def test_is_directly_provisioned():
+    assert is_directly_provisioned({
+        'Provisioner': 'Direct'
+    })
+    assert not is_directly_provisioned({
+        'InboundQueueUrl': QUEUE_URL
+    })
+    assert not is_directly_provisioned(None)
+
+
+def test_tenant_tags():
+    assert tenant_tags({
+        'Team': 'fnds'
+    }, 'tenant', 'client') == {
+        'Team': 'fnds',
+        'TenantId': 'tenant',
+        'ClientId': 'client'
+    }
+
+
+def test_create_inbound_queue():
+    sqs_client = _sqs_client()
+
+    assert create_inbound_queue(sqs_client, 'fnds-connector-pool-0-inbound', DLQ_ARN, {'Team': 'fnds'}) == \
+        (QUEUE_URL, QUEUE_ARN)
+
+    create_args = sqs_client.create_queue.call_args.kwargs
+    assert create_args['QueueName'] == 'fnds-connector-pool-0-inbound'
+    assert create_args['tags'] == {
+        'Team': 'fnds'
+    }
+    # Must match the tenant stack template
+    attributes = create_args['Attributes']
+    assert attributes['KmsMasterKeyId'] == 'alias/aws/sqs'
+    assert attributes['MessageRetentionPeriod'] == '1209600'
+    assert attributes['VisibilityTimeout'] == '900'
+    assert json.loads(attributes['RedrivePolicy']) == {
+        'deadLetterTargetArn': DLQ_ARN,
+        'maxReceiveCount': 10
+    }
+
+
+def test_create_inbound_queue_already_exists():
+    sqs_client = _sqs_client()
+    sqs_client.create_queue.side_effect = sqs_client.exceptions.QueueNameExists(
+        {
+            'Error': {
+                'Code': 'QueueAlreadyExists'
+            }
+        }, 'CreateQueue')
+    sqs_client.list_queue_tags.return_value = {
+        'Tags': {
+            'Team': 'fnds'
+        }
+    }
+
+    assert create_inbound_queue(sqs_client, 'fnds-connector-pool-0-inbound', DLQ_ARN, {'Team': 'fnds'}) == \
+        (QUEUE_URL, QUEUE_ARN)
+
+    sqs_client.set_queue_attributes.assert_called_once()
+    sqs_client.tag_queue.assert_called_once_with(QueueUrl=QUEUE_URL, Tags={
+        'Team': 'fnds'
+    })
+
+
+def test_retag_queue():
+    sqs_client = _sqs_client()
+    sqs_client.list_queue_tags.return_value = {
+        'Tags': {
+            'Team': 'fnds',
+            'WarmPool': 'true'
+        }
+    }
+    tags = {
+        'Team': 'fnds',
+        'TenantId': 'tenant',
+        'ClientId': 'client'
+    }
+
+    retag_queue(sqs_client, QUEUE_URL, tags)
+
+    sqs_client.untag_queue.assert_called_once_with(QueueUrl=QUEUE_URL, TagKeys=['WarmPool'])
+    sqs_client.tag_queue.assert_called_once_with(QueueUrl=QUEUE_URL, Tags=tags)
+
+
+def test_put_direct_metadata():
+    table = MagicMock()
+
+    put_direct_metadata(table, 'tenant', 'client', '0.3.0', QUEUE_URL, QUEUE_ARN)
+
+    update = table.update_item.call_args.kwargs
+    assert update['Key'] == {
+        'pk': 'TENANT_ID#tenant',
+        'sk': 'METADATA'
+    }
+    # Repeating the write must not reset the creation date
+    assert 'CreatedAt = if_not_exists(CreatedAt, :updatedAt)' in update['UpdateExpression']
+    values = update['ExpressionAttributeValues']
+    assert values[':provisioner'] == 'Direct'
+    assert values[':inUrl'] == QUEUE_URL
+    assert values[':inArn'] == QUEUE_ARN
+    assert values[':version'] == '0.3.0'
+    # Keeps the tenant in the version index
+    assert 'MetadataVersion = :version' in update['UpdateExpression']
+
+
+def test_get_inbound_queue_tenants_pages_through_scan():
+    table = MagicMock()
+    table.scan.side_effect = [{
+        'Items': [{
+            'pk': 'TENANT_ID#tenant-1',
+            'InboundQueueArn': 'arn:aws:sqs:us-east-1:123456789012:fnds-connector-tenant-1-inbound'
+        }],
+        'LastEvaluatedKey': {
+            'pk': 'TENANT_ID#tenant-1',
+            'sk': 'METADATA'
+        },
+    }, {
+        'Items': [{
+            'pk': 'TENANT_ID#tenant-2',
+            'InboundQueueArn': QUEUE_ARN
+        }],
+    }]
+
+    assert get_inbound_queue_tenants(table) == {
+        'fnds-connector-tenant-1-inbound': 'tenant-1',
+        'fnds-connector-pool-0-inbound': 'tenant-2',
+    }
+    assert 'IndexName' not in table.scan.call_args.kwargs
+    assert table.scan.call_args.kwargs['ExclusiveStartKey'] == {
+        'pk': 'TENANT_ID#tenant-1',
+        'sk': 'METADATA'
+    }
+
+
+def test_get_inbound_queue_tenants_from_version_index():
+    table = MagicMock()
+    table.scan.return_value = {
+        'Items': [{
+            'pk': 'TENANT_ID#tenant-2',
+            'InboundQueueArn': QUEUE_ARN
+        }],
+    }
+
+    assert get_inbound_queue_tenants(table, use_version_index=True) == {
+        'fnds-connector-pool-0-inbound': 'tenant-2',
+    }
+    assert table.scan.call_args.kwargs['IndexName'] == 'VersionIndex'
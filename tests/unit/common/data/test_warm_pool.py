@@ -0,0 +1,114 @@
+from unittest.mock import MagicMock
+
+import boto3
+import pytest
+
+from common.data.warm_pool import claim_pooled_queue, pooled_queue_name
+
+TENANT_ID = '00000000-0000-0000-0000-000000000000'
+CLIENT_ID = 'client'
+
+POOLED_QUEUES = [{
+    'pk': 'WARM_POOL',
+    'sk': f'fnds-connector-pool-{n}-inbound',
+    'InboundQueueArn': f'arn:aws:sqs:us-east-1:123456789012:fnds-connector-pool-{n}-inbound',
+    'InboundQueueUrl': f'https://sqs.us-east-1.amazonaws.com/123456789012/fnds-connector-pool-{n}-inbound',
+    'Version': '0.3.0',
+} for n in range(2)]
+
+
+@pytest.fixture(name='table')
+def fixture_table():
+    table = MagicMock()
+    table.name = 'tenants'
+    table.meta.client.exceptions = boto3.client('dynamodb', region_name='us-east-1').exceptions
+    table.get_item.return_value = {}
+    table.query.return_value = {
+        'Items': POOLED_QUEUES
+    }
+    return table
+
+
+def _transaction_canceled(table, *codes):
+    return table.meta.client.exceptions.TransactionCanceledException(
+        {
+            'Error': {
+                'Code': 'TransactionCanceledException'
+            },
+            'CancellationReasons': [{
+                'Code': code
+            } for code in codes]
+        }, 'TransactWriteItems')
+
+
+def test_pooled_queue_name():
+    name = pooled_queue_name('fnds-connector')
+    assert name.startswith('fnds-connector-pool-')
+    assert name.endswith('-inbound')
+    assert name != pooled_queue_name('fnds-connector')
+    assert len(name) <= 80
+
+
+def test_claim_pooled_queue(table):
+    metadata = claim_pooled_queue(table, TENANT_ID, CLIENT_ID)
+
+    assert metadata['pk'] == f'TENANT_ID#{TENANT_ID}'
+    assert metadata['sk'] == 'METADATA'
+    assert metadata['ClientId'] == CLIENT_ID
+    assert metadata['InboundQueueUrl'] == POOLED_QUEUES[0]['InboundQueueUrl']
+    assert metadata['Provisioner'] == 'Direct'
+    assert metadata['MetadataVersion'] == '0.3.0'
+
+    transaction = table.meta.client.transact_write_items.call_args.kwargs['TransactItems']
+    assert transaction[0]['Delete']['Key'] == {
+        'pk': 'WARM_POOL',
+        'sk': POOLED_QUEUES[0]['sk']
+    }
+    assert transaction[0]['Delete']['ConditionExpression'] == 'attribute_exists(pk)'
+    assert transaction[1]['Put']['Item'] == metadata
+    assert transaction[1]['Put']['ConditionExpression'] == 'attribute_not_exists(pk)'
+
+
+def test_claim_pooled_queue_claimed_by_another_tenant(table):
+    table.meta.client.transact_write_items.side_effect = [
+        _transaction_canceled(table, 'ConditionalCheckFailed', 'None'), None
+    ]
+
+    metadata = claim_pooled_queue(table, TENANT_ID, CLIENT_ID)
+
+    assert metadata['InboundQueueUrl'] == POOLED_QUEUES[1]['InboundQueueUrl']
+
+
+def test_claim_pooled_queue_empty(table):
+    table.query.return_value = {
+        'Items': []
+    }
+
+    assert claim_pooled_queue(table, TENANT_ID, CLIENT_ID) is None
+    table.meta.client.transact_write_items.assert_not_called()
+
+
+def test_claim_pooled_queue_already_claimed(table):
+    existing = {
+        'pk': f'TENANT_ID#{TENANT_ID}',
+        'sk': 'METADATA',
+        'Provisioner': 'Direct'
+    }
+    table.get_item.return_value = {
+        'Item': existing
+    }
+
+    assert claim_pooled_queue(table, TENANT_ID, CLIENT_ID) == existing
+    table.meta.client.transact_write_items.assert_not_called()
+
+
+def test_claim_pooled_queue_tenant_has_stack(table):
+    table.get_item.return_value = {
+        'Item': {
+            'pk': f'TENANT_ID#{TENANT_ID}',
+            'sk': 'METADATA'
+        }
+    }
+
+    assert claim_pooled_queue(table, TENANT_ID, CLIENT_ID) is None
+    table.meta.client.transact_write_items.assert_not_called()
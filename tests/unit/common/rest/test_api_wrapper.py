@@ -1,9 +1,11 @@
 import json
 import logging
+from unittest.mock import ANY
 
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
 from common.rest import BadRequest, RestApiWrapper
+from common.rest.timing import DYNAMODB, STS, phase
 from tests.common.core.mock_lambda_context import MockLambdaContext
 from tests.common.test_logger import DEFAULT_LOGGER_NAME, log_level_override
 from tests.unit.aws_mocks import apigw_event
@@ -22,7 +24,10 @@ def test_api_wrapper_success(caplog):
         response = lambda_handler(apigw_event(), MockLambdaContext())
 
     assert response == {
-        'statusCode': 200
+        'statusCode': 200,
+        'headers': {
+            'Server-Timing': ANY
+        },
     }
     assert caplog.record_tuples == [HANDLER_INFO_LOG]
 
@@ -40,7 +45,10 @@ def test_api_wrapper_debug_logging(caplog):
         response = lambda_handler(lambda_event, MockLambdaContext())
 
     assert response == {
-        'statusCode': 200
+        'statusCode': 200,
+        'headers': {
+            'Server-Timing': ANY
+        },
     }
     assert caplog.record_tuples == [(DEFAULT_LOGGER_NAME, logging.DEBUG, f'my.handler in with {lambda_event}')]
 
@@ -55,6 +63,9 @@ def test_api_wrapper_badrequest_error(caplog):
 
     assert response == {
         'statusCode': 400,
+        'headers': {
+            'Server-Timing': ANY
+        },
         'body': json.dumps({
             'code': 400,
             'message': 'myMessage',
@@ -77,6 +88,9 @@ def test_api_wrapper_unknown_error(caplog):
 
     assert response == {
         'statusCode': 500,
+        'headers': {
+            'Server-Timing': ANY
+        },
         'body': json.dumps({
             'message': 'math is hard'
         }),
@@ -85,3 +99,63 @@ def test_api_wrapper_unknown_error(caplog):
         HANDLER_INFO_LOG,
         (DEFAULT_LOGGER_NAME, logging.ERROR, 'Unexpected exception'),
     ]
+
+
+def test_api_wrapper_timing(capsys):
+    @RestApiWrapper('my.handler')
+    def lambda_handler(_event: dict, _context: LambdaContext):
+        with phase(DYNAMODB):
+            pass
+        with phase(STS):
+            pass
+        with phase(DYNAMODB):
+            pass
+        return {
+            'statusCode': 200,
+            'headers': {
+                'ETag': '"abc"'
+            },
+        }
+
+    response = lambda_handler(apigw_event(), MockLambdaContext())
+
+    assert response['headers']['ETag'] == '"abc"'
+    server_timing = [metric.split(';dur=') for metric in response['headers']['Server-Timing'].split(', ')]
+    assert [name for name, _ in server_timing] == ['dynamodb', 'sts', 'total']
+    assert all(float(milliseconds) >= 0 for _, milliseconds in server_timing)
+
+    documents = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+    assert sorted(document['Phase'] for document in documents) == ['dynamodb', 'sts', 'total']
+    assert all(document['Endpoint'] == 'my.handler' and document['Service'] == 'rest_api' for document in documents)
+    assert documents[0]['_aws']['CloudWatchMetrics'][0]['Metrics'] == [{
+        'Name': 'Latency',
+        'Unit': 'Milliseconds'
+    }]
+
+
+def test_api_wrapper_nested_timing(capsys):
+    @RestApiWrapper('my.endpoint')
+    def endpoint_handler(_event: dict, _context: LambdaContext):
+        with phase(DYNAMODB):
+            pass
+        return {
+            'statusCode': 200
+        }
+
+    @RestApiWrapper('my.router')
+    def router_handler(event: dict, context: LambdaContext):
+        return endpoint_handler(event, context)
+
+    response = router_handler(apigw_event(), MockLambdaContext())
+
+    assert response['headers']['Server-Timing'].count('total;') == 1
+    documents = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+    assert sorted((document['Endpoint'], document['Phase']) for document in documents) == [
+        ('my.endpoint', 'dynamodb'),
+        ('my.endpoint', 'total'),
+    ]
+
+
+def test_phase_outside_request():
+    with phase(DYNAMODB):
+        pass
@@ -1,6 +1,6 @@
 from http import HTTPStatus
 
-from common.rest import rest_response
+from common.rest import cache_headers, is_not_modified, rest_response
 
 
 def test_rest_response():
@@ -12,3 +12,76 @@ def test_rest_response():
         'statusCode': 405,
         'body': '{"a": "A", "b": "B"}'
     }
+
+
+def test_rest_response_headers():
+    response = rest_response(HTTPStatus.NOT_MODIFIED, headers={
+        'ETag': '"abc"'
+    })
+    assert response == {
+        'statusCode': 304,
+        'headers': {
+            'ETag': '"abc"'
+        },
+    }
+
+
+def test_cache_headers():
+    headers = cache_headers('0.4.0', '2020-08-31T16:02:16.808Z', 'no-cache')
+    assert headers['Cache-Control'] == 'no-cache'
+    assert headers['Last-Modified'] == 'Mon, 31 Aug 2020 16:02:16 GMT'
+    assert headers['ETag'].startswith('"') and headers['ETag'].endswith('"')
+
+    # Any change to the row changes the ETag
+    assert cache_headers('0.4.1', '2020-08-31T16:02:16.808Z', 'no-cache')['ETag'] != headers['ETag']
+    assert cache_headers('0.4.0', '2020-08-31T16:02:16.809Z', 'no-cache')['ETag'] != headers['ETag']
+
+    assert cache_headers(None, None, 'no-cache') == {
+        'Cache-Control': 'no-cache'
+    }
+
+
+def test_is_not_modified():
+    headers = cache_headers('0.4.0', '2020-08-31T16:02:16.808Z', 'no-cache')
+    etag = headers['ETag']
+
+    def event(request_headers):
+        return {
+            'headers': request_headers
+        }
+
+    assert is_not_modified(event({
+        'If-None-Match': etag
+    }), headers)
+    assert is_not_modified(event({
+        'if-none-match': f'"other", W/{etag}'
+    }), headers)
+    assert is_not_modified(event({
+        'If-None-Match': '*'
+    }), headers)
+    assert not is_not_modified(event({
+        'If-None-Match': '"other"'
+    }), headers)
+    assert not is_not_modified(event({
+        'If-None-Match': etag
+    }), {
+        'Cache-Control': 'no-cache'
+    })
+
+    assert is_not_modified(event({
+        'If-Modified-Since': 'Mon, 31 Aug 2020 16:02:16 GMT'
+    }), headers)
+    assert not is_not_modified(event({
+        'If-Modified-Since': 'Mon, 31 Aug 2020 16:02:15 GMT'
+    }), headers)
+    assert not is_not_modified(event({
+        'If-Modified-Since': 'yesterday'
+    }), headers)
+    # If-None-Match takes precedence
+    assert not is_not_modified(
+        event({
+            'If-None-Match': '"other"',
+            'If-Modified-Since': 'Mon, 31 Aug 2020 16:02:16 GMT'
+        }), headers)
+
+    assert not is_not_modified(event(None), headers)
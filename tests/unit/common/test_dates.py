@@ -1,7 +1,8 @@
 from datetime import datetime, timezone
 import pytz
 
-from common.dates import format_iso8601_date, parse_iso8601_date, time_minute_difference
+from common.dates import (format_iso8601_date, milliseconds_between, parse_epoch_millis, parse_iso8601_date,
+                          time_minute_difference)
 
 
 def test_parse_and_format_dates():
@@ -55,3 +56,16 @@ def test_time_minute_difference_naive_end_date_non_utc_start_date():
     end_date = datetime(2021, 1, 5, 10, 7, 15, 324080)  # "naive" datetime, i.e. not timezone-aware
 
     assert time_minute_difference(end_date, start_date) == 1011.0
+
+
+def test_parse_epoch_millis():
+    assert parse_epoch_millis('1545082649183') == datetime(2018, 12, 17, 21, 37, 29, 183000, timezone.utc)
+
+
+def test_milliseconds_between():
+    start_date = datetime(2021, 1, 5, 9, 23, 15, 324000, timezone.utc)
+    end_date = datetime(2021, 1, 5, 9, 23, 16, 574000, timezone.utc)
+
+    assert milliseconds_between(end_date, start_date) == 1250
+    # Clock skew
+    assert milliseconds_between(end_date=start_date, start_date=end_date) == 0
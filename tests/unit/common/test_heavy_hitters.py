@@ -0,0 +1,82 @@
+import json
+import time
+from unittest.mock import patch
+
+from common.heavy_hitters import HeavyHitters, SpaceSaving
+from common.metrics import Metrics
+
+
+def test_space_saving_exact_below_capacity():
+    sketch = SpaceSaving(capacity=3)
+
+    for key in ['a', 'b', 'a', 'c', 'a', 'b']:
+        sketch.add(key)
+
+    assert [(c.key, c.count, c.error) for c in sketch.top(3)] == [('a', 3, 0), ('b', 2, 0), ('c', 1, 0)]
+
+
+def test_space_saving_keeps_heavy_keys():
+    sketch = SpaceSaving(capacity=5)
+
+    # A few heavy keys buried in a long tail of keys seen once
+    for i in range(1000):
+        sketch.add(f'tail-{i}')
+        if i % 4 == 0:
+            sketch.add('heavy-1', 10)
+        if i % 10 == 0:
+            sketch.add('heavy-2', 5)
+
+    top = sketch.top(2)
+    assert [c.key for c in top] == ['heavy-1', 'heavy-2']
+    # Counts are never underestimated, and the error bounds the overestimate
+    assert top[0].count - top[0].error <= 2500 <= top[0].count
+    assert top[1].count - top[1].error <= 500 <= top[1].count
+
+
+def test_flush_publishes_top_tenants(capsys):
+    metrics = Metrics(service='test')
+    heavy_hitters = HeavyHitters(metrics, top_n=2, flush_interval_seconds=60)
+
+    for tenant_id, size in [('t1', 100), ('t2', 5000), ('t1', 100), ('t3', 10), ('t1', 100)]:
+        heavy_hitters.record(tenant_id, size)
+
+    heavy_hitters.flush()
+    metrics.flush()
+
+    documents = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    events = {
+        d['TenantId']: d['TenantEvents']
+        for d in documents if 'TenantEvents' in d
+    }
+    sizes = {
+        d['TenantId']: d['TenantBytes']
+        for d in documents if 'TenantBytes' in d
+    }
+    assert events == {
+        't1': 3,
+        't2': 1
+    }
+    assert sizes == {
+        't1': 300,
+        't2': 5000
+    }
+
+    # Counts restart after each flush
+    assert not heavy_hitters.events.top(2)
+
+
+def test_flush_periodically():
+    metrics = Metrics(service='test')
+    heavy_hitters = HeavyHitters(metrics, top_n=2, flush_interval_seconds=60)
+
+    @heavy_hitters.flush_periodically
+    def handler(_event, _context):
+        heavy_hitters.record('t1', 100)
+
+    with patch.object(heavy_hitters, 'flush') as mock_flush:
+        handler({}, None)
+        mock_flush.assert_not_called()
+
+        heavy_hitters.last_flush = time.monotonic() - 61
+        handler({}, None)
+        mock_flush.assert_called_once()
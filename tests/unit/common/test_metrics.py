@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from common.metrics import Metrics
+
+
+def _documents(capsys) -> list[dict]:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_counts_and_durations_are_summed(capsys):
+    metrics = Metrics(service='test', namespace='test-namespace')
+
+    metrics.add_count('Events', dimensions={
+        'Source': 'learn'
+    })
+    metrics.add_count('Events', 2, dimensions={
+        'Source': 'learn'
+    })
+    metrics.add_duration('ParseTime', 5)
+    metrics.add_duration('ParseTime', 7.5)
+    metrics.flush()
+
+    documents = _documents(capsys)
+    assert len(documents) == 2
+
+    events = next(d for d in documents if 'Events' in d)
+    assert events['Events'] == 3
+    assert events['Source'] == 'learn'
+    assert events['Service'] == 'test'
+    assert events['_aws']['CloudWatchMetrics'] == [{
+        'Namespace': 'test-namespace',
+        'Dimensions': [['Service', 'Source']],
+        'Metrics': [{
+            'Name': 'Events',
+            'Unit': 'Count'
+        }],
+    }]
+
+    parse_time = next(d for d in documents if 'ParseTime' in d)
+    assert parse_time['ParseTime'] == 12.5
+    assert parse_time['_aws']['CloudWatchMetrics'][0]['Metrics'] == [{
+        'Name': 'ParseTime',
+        'Unit': 'Milliseconds'
+    }]
+
+
+def test_flush_resets_metrics(capsys):
+    metrics = Metrics(service='test')
+
+    metrics.add_count('Events')
+    metrics.flush()
+    metrics.flush()
+
+    assert len(_documents(capsys)) == 1
+
+
+def test_samples_are_split_into_documents(capsys):
+    metrics = Metrics(service='test')
+
+    for i in range(150):
+        metrics.add_sample('Latency', i, 'Milliseconds')
+    metrics.add_count('Events')
+    metrics.flush()
+
+    documents = _documents(capsys)
+    assert len(documents) == 2
+    assert documents[0]['Latency'] == list(range(100))
+    assert documents[0]['Events'] == 1
+    assert documents[1]['Latency'] == list(range(100, 150))
+    assert 'Events' not in documents[1]
+
+
+def test_timer_records_failures(capsys):
+    metrics = Metrics(service='test')
+
+    with pytest.raises(RuntimeError):
+        with metrics.timer('SendTime'):
+            raise RuntimeError('failed')
+    metrics.flush()
+
+    documents = _documents(capsys)
+    assert documents[0]['SendTime'] >= 0
+
+
+def test_log_metrics_flushes_on_error(capsys):
+    metrics = Metrics(service='test')
+
+    @metrics.log_metrics
+    def handler(_event, _context):
+        metrics.add_count('Events')
+        raise RuntimeError('failed')
+
+    with pytest.raises(RuntimeError):
+        handler({}, None)
+
+    assert _documents(capsys)[0]['Events'] == 1
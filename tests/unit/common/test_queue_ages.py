@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from common.queue_ages import MAX_QUERIES_PER_REQUEST, get_oldest_message_ages, get_queue_metrics, \
+    summarize_queue_ages
+
+END_TIME = datetime(2026, 1, 1)
+START_TIME = END_TIME - timedelta(minutes=15)
+
+
+def _results(request: dict, values: list[float]) -> list[dict]:
+    return [{
+        'Id': query['Id'],
+        'Values': values,
+    } for query in request['MetricDataQueries']]
+
+
+def test_get_oldest_message_ages_batches_queries():
+    queue_names = [f'queue-{i}' for i in range(MAX_QUERIES_PER_REQUEST + 1)]
+    cloudwatch_client = MagicMock()
+    cloudwatch_client.get_metric_data.side_effect = lambda **request: {
+        'MetricDataResults': _results(request, [60.0, 30.0])
+    }
+
+    ages = get_oldest_message_ages(cloudwatch_client, queue_names, START_TIME, END_TIME)
+
+    assert cloudwatch_client.get_metric_data.call_count == 2
+    first, second = [call.kwargs for call in cloudwatch_client.get_metric_data.call_args_list]
+    assert len(first['MetricDataQueries']) == MAX_QUERIES_PER_REQUEST
+    assert len(second['MetricDataQueries']) == 1
+    assert second['MetricDataQueries'][0]['MetricStat']['Metric']['Dimensions'] == [{
+        'Name': 'QueueName',
+        'Value': f'queue-{MAX_QUERIES_PER_REQUEST}'
+    }]
+    # The newest datapoint of each queue
+    assert ages == {
+        queue_name: 60.0
+        for queue_name in queue_names
+    }
+
+
+def test_get_oldest_message_ages_follows_next_token():
+    cloudwatch_client = MagicMock()
+    cloudwatch_client.get_metric_data.side_effect = [{
+        'MetricDataResults': [{
+            'Id': 'q0',
+            'Values': [120.0]
+        }, {
+            'Id': 'q1',
+            'Values': []
+        }],
+        'NextToken': 'token',
+    }, {
+        'MetricDataResults': [{
+            'Id': 'q0',
+            'Values': [90.0]
+        }, {
+            'Id': 'q1',
+            'Values': [30.0]
+        }],
+    }]
+
+    ages = get_oldest_message_ages(cloudwatch_client, ['queue-0', 'queue-1'], START_TIME, END_TIME)
+
+    assert ages == {
+        'queue-0': 120.0,
+        'queue-1': 30.0,
+    }
+    assert cloudwatch_client.get_metric_data.call_args.kwargs['NextToken'] == 'token'
+
+
+def test_get_oldest_message_ages_leaves_out_queues_without_datapoints():
+    cloudwatch_client = MagicMock()
+    cloudwatch_client.get_metric_data.side_effect = lambda **request: {
+        'MetricDataResults': _results(request, [])
+    }
+
+    assert not get_oldest_message_ages(cloudwatch_client, ['queue-0'], START_TIME, END_TIME)
+
+
+def test_summarize_queue_ages():
+    ages = {
+        'queue-0': 100.0,
+        'queue-1': 500.0,
+        'queue-2': 300.0,
+        'queue-3': 400.0,
+    }
+
+    summary = summarize_queue_ages(ages, threshold_seconds=300, worst_offenders=2)
+
+    assert summary.reporting == 4
+    assert summary.over_threshold == 3
+    assert summary.max_age_seconds == 500.0
+    assert summary.worst_offenders == [('queue-1', 500.0), ('queue-3', 400.0)]
+
+
+def test_summarize_queue_ages_without_datapoints():
+    summary = summarize_queue_ages({}, threshold_seconds=300, worst_offenders=2)
+
+    assert summary.reporting == 0
+    assert summary.over_threshold == 0
+    assert summary.max_age_seconds == 0
+    assert not summary.worst_offenders
+
+
+def test_get_queue_metrics():
+    cloudwatch_client = MagicMock()
+    cloudwatch_client.get_metric_data.side_effect = lambda **request: {
+        'MetricDataResults': _results(request, [3.0])
+    }
+
+    sent = get_queue_metrics(cloudwatch_client, ['queue-0'], 'NumberOfMessagesSent', 'Sum', 86400, START_TIME, END_TIME)
+
+    assert sent == {
+        'queue-0': 3.0
+    }
+    metric_stat = cloudwatch_client.get_metric_data.call_args.kwargs['MetricDataQueries'][0]['MetricStat']
+    assert metric_stat['Metric']['MetricName'] == 'NumberOfMessagesSent'
+    assert metric_stat['Stat'] == 'Sum'
+    assert metric_stat['Period'] == 86400
+
+
+def test_get_queue_metrics_sums_every_datapoint():
+    cloudwatch_client = MagicMock()
+    cloudwatch_client.get_metric_data.side_effect = [{
+        'MetricDataResults': [{
+            'Id': 'q0',
+            'Values': [3.0]
+        }, {
+            'Id': 'q1',
+            'Values': []
+        }],
+        'NextToken': 'token'
+    }, {
+        'MetricDataResults': [{
+            'Id': 'q0',
+            'Values': [2.0]
+        }, {
+            'Id': 'q1',
+            'Values': []
+        }]
+    }]
+
+    sent = get_queue_metrics(cloudwatch_client, ['queue-0', 'queue-1'],
+                             'NumberOfMessagesSent',
+                             'Sum',
+                             86400,
+                             START_TIME,
+                             END_TIME,
+                             aggregate=sum)
+
+    # The range straddles two periods, and queues without datapoints are left out
+    assert sent == {
+        'queue-0': 5.0
+    }
@@ -0,0 +1,52 @@
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from common.sampled_logging import SampledLogger
+from tests.common.test_logger import DEFAULT_LOGGER_NAME, log_level_override
+
+
+def test_logs_everything_by_default(caplog):
+    sampled_logger = SampledLogger(sample_rate=1)
+
+    with log_level_override(logging.INFO):
+        for i in range(3):
+            sampled_logger.info('Processing record %d', i)
+        sampled_logger.log_summary()
+
+    assert caplog.record_tuples == [(DEFAULT_LOGGER_NAME, logging.INFO, f'Processing record {i}') for i in range(3)]
+
+
+@patch('common.sampled_logging.random.random', side_effect=[0.05, 0.5, 0.95, 0.01])
+def test_samples_and_summarizes(_mock_random, caplog):
+    sampled_logger = SampledLogger(sample_rate=0.1)
+
+    with log_level_override(logging.INFO):
+        for i in range(4):
+            sampled_logger.info('Processing record %d', i)
+        sampled_logger.error('Failed record %d', 2)
+        sampled_logger.log_summary()
+
+    assert caplog.record_tuples == [
+        (DEFAULT_LOGGER_NAME, logging.INFO, 'Processing record 0'),
+        (DEFAULT_LOGGER_NAME, logging.INFO, 'Processing record 3'),
+        (DEFAULT_LOGGER_NAME, logging.ERROR, 'Failed record 2'),
+        (DEFAULT_LOGGER_NAME, logging.INFO, 'Sampled 4 log messages at rate 0.1'),
+    ]
+    assert not sampled_logger.counts
+
+
+def test_summarize_on_error(caplog):
+    sampled_logger = SampledLogger(sample_rate=0)
+
+    @sampled_logger.summarize
+    def handler(_event, _context):
+        sampled_logger.info('Processing record')
+        raise RuntimeError('failed')
+
+    with log_level_override(logging.INFO):
+        with pytest.raises(RuntimeError):
+            handler({}, None)
+
+    assert caplog.record_tuples == [(DEFAULT_LOGGER_NAME, logging.INFO, 'Sampled 1 log messages at rate 0')]
@@ -1,11 +1,14 @@
 import json
 import logging
 import os
+from datetime import datetime, timedelta, timezone
 from unittest.mock import call, patch
 
 import pytest
 
+from common.data.message_encoding import MessageEncoding, decode_message_body
 from common.data.queues import AuditInformation, QueueType
+from common.dates import format_iso8601_date, parse_iso8601_date
 from tests.common.core.mock_lambda_context import MockLambdaContext
 from tests.common.test_logger import DEFAULT_LOGGER_NAME
 from tests.unit.logging import assert_no_error_logs
@@ -42,7 +45,48 @@ def test_handler_success(mock_send_message, mock_get_queue, caplog):
 
     assert_no_error_logs(caplog)
     mock_get_queue.assert_called_once_with(table, tenant_id=TENANT_ID, queue_type=QueueType.Inbound)
-    mock_send_message.assert_called_with(QueueUrl=queue.url, MessageBody=json.dumps(event))
+    _assert_message_sent(mock_send_message.call_args, queue, event)
+
+
+@patch('event_source.eventbridge_to_sqs.eventbridge_to_sqs.get_queue')
+@patch('event_source.eventbridge_to_sqs.eventbridge_to_sqs.sqs_client.send_message')
+def test_handler_gzip_encoding(mock_send_message, mock_get_queue, caplog):
+    from event_source.eventbridge_to_sqs.eventbridge_to_sqs import handler
+    event = mock_event_bridge_event(tenant_id=TENANT_ID)
+    event['detail']['payload'] = 'x' * 4096
+    queue = mock_queue(tenant_id=TENANT_ID, queue_type=QueueType.Inbound)
+    queue.encoding = MessageEncoding.GZIP
+    mock_get_queue.return_value = queue
+
+    handler(event, MockLambdaContext())
+
+    assert_no_error_logs(caplog)
+    mock_send_message.assert_called_once()
+    kwargs = mock_send_message.call_args.kwargs
+    assert kwargs['QueueUrl'] == queue.url
+    assert kwargs['MessageAttributes']['ContentEncoding']['StringValue'] == 'gzip'
+    assert len(kwargs['MessageBody']) < len(json.dumps(event))
+    assert json.loads(decode_message_body(kwargs['MessageBody'], kwargs['MessageAttributes'])) == event
+
+
+@patch('event_source.eventbridge_to_sqs.eventbridge_to_sqs.get_queue')
+@patch('event_source.eventbridge_to_sqs.eventbridge_to_sqs.sqs_client.send_message')
+def test_handler_records_delivery_latency(mock_send_message, mock_get_queue, capsys):
+    from event_source.eventbridge_to_sqs.eventbridge_to_sqs import handler
+    mock_get_queue.return_value = mock_queue(tenant_id=TENANT_ID, queue_type=QueueType.Inbound)
+
+    event = mock_event_bridge_event(tenant_id=TENANT_ID)
+    event['time'] = format_iso8601_date(datetime.now(timezone.utc) - timedelta(seconds=2))
+    handler(event, MockLambdaContext())
+    handler(event, MockLambdaContext())
+
+    documents = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    latencies = [document for document in documents if 'DeliveryLatency' in document]
+    assert [document['CacheHit'] for document in latencies] == ['False', 'True']
+    for document in latencies:
+        assert document['Source'] == event['source']
+        assert document['DetailType'] == event['detail-type']
+        assert 2000 <= document['DeliveryLatency'] < 60000
 
 
 @patch('event_source.eventbridge_to_sqs.eventbridge_to_sqs.get_queue')
@@ -89,7 +133,7 @@ def _verify_tenant_found(mock_send_message, mock_get_queue, caplog, event: dict,
 
     assert_no_error_logs(caplog)
     mock_get_queue.assert_called_once_with(table, tenant_id=tenant_id, queue_type=QueueType.Inbound)
-    mock_send_message.assert_called_with(QueueUrl=queue.url, MessageBody=json.dumps(event))
+    _assert_message_sent(mock_send_message.call_args, queue, event)
 
 
 @patch('event_source.eventbridge_to_sqs.eventbridge_to_sqs.get_queue')
@@ -188,6 +232,67 @@ def test_handler_sqs_success(mock_send_message, mock_get_queue, caplog):
         call(table, tenant_id='alternate-tenant', queue_type=QueueType.Inbound),
     ])
     assert mock_get_queue.call_count == 2
-    mock_send_message.assert_has_calls(
-        [call(QueueUrl=queue.url, MessageBody=json.dumps(eb_event)) for eb_event in eventbridge_events])
     assert mock_send_message.call_count == len(eventbridge_events)
+    for sent_call, eb_event in zip(mock_send_message.call_args_list, eventbridge_events):
+        _assert_message_sent(sent_call, queue, eb_event)
+
+
+@patch('event_source.eventbridge_to_sqs.eventbridge_to_sqs.get_queue')
+@patch('event_source.eventbridge_to_sqs.eventbridge_to_sqs.sqs_client')
+def test_handler_sqs_undecodable_record(mock_sqs_client, mock_get_queue):
+    from event_source.eventbridge_to_sqs.eventbridge_to_sqs import handler
+
+    eb_event = mock_event_bridge_event(tenant_id=TENANT_ID)
+    good_record = {
+        'receiptHandle': 'handle-0',
+        'body': json.dumps(eb_event),
+        'eventSourceARN': 'arn:aws:sqs:us-east-1:257597320193:fnds-connector-test-dlq',
+    }
+    # Claims to be gzip, but isn't
+    bad_record = {
+        'receiptHandle': 'handle-1',
+        'body': 'not base64 gzip',
+        'eventSourceARN': 'arn:aws:sqs:us-east-1:257597320193:fnds-connector-test-dlq',
+        'messageAttributes': {
+            'ContentEncoding': {
+                'stringValue': MessageEncoding.GZIP.value,
+                'dataType': 'String'
+            }
+        },
+    }
+    event = {
+        'Records': [good_record, bad_record, {
+            **good_record, 'receiptHandle': 'handle-2'
+        }]
+    }
+    mock_get_queue.return_value = mock_queue(tenant_id=TENANT_ID, queue_type=QueueType.Inbound)
+    mock_sqs_client.get_queue_url.return_value = {
+        'QueueUrl': 'https://sqs.us-east-1.amazonaws.com/257597320193/fnds-connector-test-dlq'
+    }
+
+    with pytest.raises(RuntimeError):
+        handler(event, MockLambdaContext())
+
+    # The records either side are replayed, and deleted so they aren't replayed again
+    assert mock_sqs_client.send_message.call_count == 2
+    mock_sqs_client.delete_message_batch.assert_called_once_with(
+        QueueUrl='https://sqs.us-east-1.amazonaws.com/257597320193/fnds-connector-test-dlq',
+        Entries=[{
+            'Id': 'handle-0',
+            'ReceiptHandle': 'handle-0'
+        }, {
+            'Id': 'handle-1',
+            'ReceiptHandle': 'handle-2'
+        }])
+
+
+def _assert_message_sent(sent_call, queue, event: dict):
+    kwargs = sent_call.kwargs
+    assert kwargs['QueueUrl'] == queue.url
+    assert kwargs['MessageBody'] == json.dumps(event)
+    assert kwargs['MessageAttributes']['EventTime'] == {
+        'DataType': 'String',
+        'StringValue': event['time'],
+    }
+    assert parse_iso8601_date(kwargs['MessageAttributes']['DeliveredAt']['StringValue']) >= parse_iso8601_date(
+        event['time'])
@@ -1,12 +1,14 @@
 import json
 import os
+import time
 from typing import Optional
-from unittest.mock import patch
+from unittest.mock import ANY, patch
 
 import pytest
 
+from common.data.eventbridge import EventBridgeFailure
 from common.data.queues import QueueType, get_sqs_credential_id
-from common.dates import parse_iso8601_date
+from common.dates import parse_epoch_millis, parse_iso8601_date
 from tests.common.core.mock_lambda_context import MockLambdaContext
 
 LAMBDA_ARN = 'arn:aws:lambda:us-east-1:257597320193:function:fnds-connector-example-SqsToEventBridgeFunction'
@@ -48,7 +50,8 @@ def test_parse_message():
                                                  detail_type=detail_type,
                                                  detail=detail,
                                                  time=parse_iso8601_date(time),
-                                                 sender_id=message.sender_id)
+                                                 sender_id=message.sender_id,
+                                                 sent_timestamp=parse_epoch_millis('1545082649183'))
     assert message.tenant_id() == TENANT_ID
     assert TENANT_ID in message.sender_id and TENANT_ID == sqs_to_eventbridge.tenant_from_event_sender(
         message.sender_id)
@@ -133,6 +136,54 @@ def test_handler_good_records(mock_get_sqs_url, send_events_to_eventbridge):
                                                        [expected_eb_event1, expected_eb_event2])
 
 
+@patch('event_source.sqs_to_eventbridge.sqs_to_eventbridge.send_events_to_eventbridge', return_value=[])
+@patch('event_source.sqs_to_eventbridge.sqs_to_eventbridge.get_sqs_url')
+def test_handler_records_latencies(_mock_get_sqs_url, _send_events_to_eventbridge, capsys):
+    from event_source.sqs_to_eventbridge import sqs_to_eventbridge
+    queue_arn = 'arn:aws:sqs:us-east-2:123456789012:fnds-connector-outbound'
+
+    record = _create_valid_record(queue_arn, version=1)
+    record['attributes']['SentTimestamp'] = str(int((time.time() - 2) * 1000))
+    event = {
+        'Records': [record]
+    }
+    sqs_to_eventbridge.handler(event, MockLambdaContext(invoked_function_arn=LAMBDA_ARN))
+
+    documents = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    latencies = next(document for document in documents if 'QueueLatency' in document)
+    assert latencies['Source'] == 'learn.data.source'
+    assert latencies['DetailType'] == 'Update'
+    assert 2000 <= latencies['QueueLatency'] < 60000
+    # The Learn event was created long before it was sent
+    assert latencies['EventLatency'] > latencies['QueueLatency']
+
+
+@patch('event_source.sqs_to_eventbridge.sqs_to_eventbridge.send_events_to_eventbridge')
+@patch('event_source.sqs_to_eventbridge.sqs_to_eventbridge.delete_messages_from_sqs')
+@patch('event_source.sqs_to_eventbridge.sqs_to_eventbridge.get_sqs_url')
+def test_handler_with_rejected_events(_mock_get_sqs_url, mock_delete_messages_from_sqs, send_events_to_eventbridge,
+                                      capsys):
+    from event_source.sqs_to_eventbridge import sqs_to_eventbridge
+    queue_arn = 'arn:aws:sqs:us-east-2:123456789012:fnds-connector-outbound'
+    send_events_to_eventbridge.side_effect = lambda _client, entries: [
+        EventBridgeFailure(error_code='InternalFailure', error_message='Try again', event=dict(entries[1]), index=1)
+    ]
+
+    sent = _create_valid_record(queue_arn, version=1)
+    rejected = _create_valid_record(queue_arn, version=2)
+    rejected['receiptHandle'] = 'rejected-handle'
+    with pytest.raises(RuntimeError):
+        sqs_to_eventbridge.handler({
+            'Records': [sent, rejected]
+        }, MockLambdaContext(invoked_function_arn=LAMBDA_ARN))
+
+    mock_delete_messages_from_sqs.assert_called_once_with(ANY, [sent, rejected], ['rejected-handle'])
+    documents = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    latencies = next(document for document in documents if 'QueueLatency' in document)
+    # Only the message that reached the event bus
+    assert not isinstance(latencies['QueueLatency'], list)
+
+
 @patch('event_source.sqs_to_eventbridge.sqs_to_eventbridge.send_events_to_eventbridge')
 @patch('event_source.sqs_to_eventbridge.sqs_to_eventbridge.delete_messages_from_sqs')
 @patch('event_source.sqs_to_eventbridge.sqs_to_eventbridge.get_sqs_url')
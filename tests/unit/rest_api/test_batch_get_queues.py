@@ -0,0 +1,112 @@
+# pylint: disable=import-outside-toplevel
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from common.data.queues import TenantQueues, UnprocessedTenants
+from tests.common.core.mock_lambda_context import MockLambdaContext
+from tests.unit.aws_mocks import apigw_event
+from tests.unit.logging import assert_no_error_logs
+from tests.unit.mock_queue import mock_queues
+
+
+@pytest.fixture(autouse=True)
+def aws_env_vars():
+    os.environ['TABLE_NAME'] = 'bb-foundations-connector-table'
+    os.environ['STACK_NAME'] = 'fnds-stack-name'
+
+
+def _event(body):
+    event = apigw_event()
+    event['httpMethod'] = 'POST'
+    event['pathParameters'] = None
+    event['body'] = body if isinstance(body, str) else json.dumps(body)
+    return event
+
+
+@patch('rest_api.batch_get_queues.batch_get_queues.batch_get_queues')
+def test_handler(mock_batch_get_queues, caplog):
+    from rest_api.batch_get_queues import batch_get_queues
+
+    inbound_queue, _ = mock_queues(inbound=True, outbound=False, tenant_id='active')
+    deleting_queue, _ = mock_queues(inbound=True, outbound=False, tenant_id='deleting')
+    mock_batch_get_queues.return_value = {
+        'active': TenantQueues(queues=[inbound_queue]),
+        'deleting': TenantQueues(queues=[deleting_queue], delete_status='Started'),
+        'missing': TenantQueues(),
+    }
+
+    response = batch_get_queues.handler(_event({
+        'tenantIds': ['active', 'deleting', 'missing', 'active']
+    }), MockLambdaContext())
+
+    assert_no_error_logs(caplog)
+    mock_batch_get_queues.assert_called_once_with(batch_get_queues.table, ['active', 'deleting', 'missing'])
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body']) == {
+        'results': [
+            {
+                'tenantId': 'active',
+                'state': 'Active',
+                'queues': [{
+                    'tenantId': 'active',
+                    'type': 'Inbound',
+                    'arn': inbound_queue.sqs_arn,
+                    'url': inbound_queue.url,
+                }],
+            },
+            {
+                'tenantId': 'deleting',
+                'state': 'Deleting',
+                'queues': [],
+            },
+            {
+                'tenantId': 'missing',
+                'state': 'NotFound',
+                'queues': [],
+            },
+        ]
+    }
+
+
+@pytest.mark.parametrize('body', [
+    'not json',
+    [],
+    {},
+    {
+        'tenantIds': 'tenant'
+    },
+    {
+        'tenantIds': []
+    },
+    {
+        'tenantIds': ['tenant', 1]
+    },
+    {
+        'tenantIds': [f'tenant-{i}' for i in range(101)]
+    },
+])
+@patch('rest_api.batch_get_queues.batch_get_queues.batch_get_queues')
+def test_handler_bad_request(mock_batch_get_queues, body):
+    from rest_api.batch_get_queues import batch_get_queues
+
+    response = batch_get_queues.handler(_event(body), MockLambdaContext())
+
+    assert response['statusCode'] == 400
+    assert json.loads(response['body'])['message'] == 'Invalid request body'
+    mock_batch_get_queues.assert_not_called()
+
+
+@patch('rest_api.batch_get_queues.batch_get_queues.batch_get_queues', side_effect=UnprocessedTenants(['tenant-1']))
+def test_handler_throttled(_mock_batch_get_queues):
+    from rest_api.batch_get_queues import batch_get_queues
+
+    response = batch_get_queues.handler(_event({
+        'tenantIds': ['tenant-0', 'tenant-1']
+    }), MockLambdaContext())
+
+    assert response['statusCode'] == 503
+    assert json.loads(response['body'])['message'] == 'Tenants could not be read, try again later'
@@ -1,6 +1,6 @@
 # pylint: disable=import-outside-toplevel
 import os
-from unittest.mock import patch
+from unittest.mock import ANY, patch
 
 import pytest
 
@@ -31,8 +31,13 @@ def test_handler_queues_exist(_get_status, _get_queues, mock_delete_queues, capl
     mock_delete_queues.assert_called_once_with(delete_queues.sfn_client, 'delete_arn', tenant_id=TENANT_ID)
 
     assert response == {
-        'statusCode': 202
+        'statusCode': 202,
+        'headers': {
+            'Server-Timing': ANY
+        },
     }
+    phases = [metric.split(';')[0] for metric in response['headers']['Server-Timing'].split(', ')]
+    assert phases == ['dynamodb', 'stepfunctions', 'total']
 
 
 @patch('rest_api.delete_queues.delete_queues.delete_queues')
@@ -48,7 +53,10 @@ def test_handler_no_queues(_get_status, _get_queues, mock_delete_queues, caplog)
     mock_delete_queues.assert_not_called()
 
     assert response == {
-        'statusCode': 404
+        'statusCode': 404,
+        'headers': {
+            'Server-Timing': ANY
+        },
     }
 
 
@@ -65,5 +73,8 @@ def test_handler_queues_deleting(_get_status, _get_queues, mock_delete_queues, c
     mock_delete_queues.assert_not_called()
 
     assert response == {
-        'statusCode': 410
+        'statusCode': 410,
+        'headers': {
+            'Server-Timing': ANY
+        },
     }
@@ -7,6 +7,7 @@ from unittest.mock import patch
 import pytest
 from requests_mock import ANY
 
+from common.data.message_encoding import MessageEncoding
 from common.data.queues import AuditInformation, Queue, QueueType, SqsCredentials
 from common.rest.constants import GET_QUEUE_MAX_RETRIES
 from tests.common.core.mock_lambda_context import MockLambdaContext
@@ -69,6 +70,7 @@ def test_handler_queues_exist(mock_get_queue, mock_get_shared_outbound_queue, mo
         'arn': queue.sqs_arn,
         'url': queue.url,
         'region': REGION,
+        'messageEncoding': 'identity',
         'credentials': {
             'accessKeyId': credentials.access_key_id,
             'secretAccessKey': credentials.secret_access_key,
@@ -94,6 +96,69 @@ def test_handler_invalid_queue_type():
     }
 
 
+@patch('rest_api.get_queue.get_queue.set_message_encoding')
+@patch('rest_api.get_queue.get_queue.get_sqs_credentials')
+@patch('rest_api.get_queue.get_queue.get_queue')
+def test_handler_negotiates_message_encoding(mock_get_queue, mock_get_sqs_credentials, mock_set_message_encoding):
+    from rest_api.get_queue import get_queue
+
+    mock_get_queue.return_value = create_tenant_queue(TENANT_ID, QueueType.Inbound)
+    mock_get_sqs_credentials.return_value = create_credentials()
+
+    event = apigw_event(tenant_id=TENANT_ID, queue_type='Inbound', query_parameters={
+        'messageEncoding': 'gzip'
+    })
+    response = get_queue.handler(event, MockLambdaContext())
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['messageEncoding'] == 'gzip'
+    mock_set_message_encoding.assert_called_once_with(get_queue.table, TENANT_ID, MessageEncoding.GZIP)
+
+    # Nothing is written once the tenant is already using the requested encoding
+    mock_set_message_encoding.reset_mock()
+    mock_get_queue.return_value.encoding = MessageEncoding.GZIP
+
+    response = get_queue.handler(event, MockLambdaContext())
+
+    assert response['statusCode'] == 200
+    mock_set_message_encoding.assert_not_called()
+
+
+@patch('rest_api.get_queue.get_queue.get_sqs_credentials')
+@patch('rest_api.get_queue.get_queue.get_queue')
+def test_handler_not_cached(mock_get_queue, mock_get_sqs_credentials):
+    from rest_api.get_queue import get_queue
+
+    queue = create_tenant_queue(TENANT_ID, QueueType.Inbound)
+    queue.version = '0.4.0'
+    queue.modified_date = '2020-06-01T15:45:37.000Z'
+    mock_get_queue.return_value = queue
+    mock_get_sqs_credentials.return_value = create_credentials()
+
+    event = apigw_event(tenant_id=TENANT_ID, queue_type='Inbound')
+    event['headers']['If-None-Match'] = '*'
+    response = get_queue.handler(event, MockLambdaContext())
+
+    # Credentials expire, so every request is answered with new ones
+    assert response['statusCode'] == 200
+    assert response['headers']['Cache-Control'] == 'no-store'
+    assert 'ETag' not in response['headers']
+    assert 'Last-Modified' not in response['headers']
+    mock_get_sqs_credentials.assert_called_once()
+
+
+def test_handler_invalid_message_encoding():
+    from rest_api.get_queue import get_queue
+
+    event = apigw_event(tenant_id=TENANT_ID, queue_type='Inbound', query_parameters={
+        'messageEncoding': 'brotli'
+    })
+    response = get_queue.handler(event, MockLambdaContext())
+
+    assert response['statusCode'] == 400
+    assert json.loads(response['body'])['message'] == 'Failed to parse messageEncoding'
+
+
 @patch('rest_api.get_queue.get_queue.get_tenant')
 @patch('rest_api.get_queue.get_queue.get_sqs_credentials')
 @patch('rest_api.get_queue.get_queue.get_queue', return_value=None)
@@ -112,6 +177,56 @@ def test_handler_queues_creating(_mock_get_status_and_retry_information, _mock_g
     assert response['statusCode'] == 202
 
 
+@patch('rest_api.get_queue.get_queue.get_tenant', return_value={})
+@patch('rest_api.get_queue.get_queue.get_sqs_credentials')
+@patch('rest_api.get_queue.get_queue.get_queue', return_value=None)
+@patch('rest_api.get_queue.get_queue.get_status_and_retry_information', return_value=AuditInformation(status="Started"))
+@patch('rest_api.get_queue.get_queue.wait_for_queue')
+def test_handler_queues_creating_wait(mock_wait_for_queue, _mock_get_status_and_retry_information, _mock_get_queue,
+                                      mock_get_sqs_credentials, _mock_get_tenant):
+    from rest_api.get_queue import get_queue
+
+    context = MockLambdaContext()
+    context.get_remaining_time_in_millis = lambda: 27000
+    mock_wait_for_queue.return_value = create_tenant_queue(TENANT_ID, QueueType.Inbound)
+    mock_get_sqs_credentials.return_value = create_credentials()
+
+    event = apigw_event(tenant_id=TENANT_ID, queue_type='Inbound', query_parameters={
+        'wait': '60'
+    })
+    response = get_queue.handler(event, context)
+
+    assert response['statusCode'] == 200
+    # Capped, and then again by the time left
+    mock_wait_for_queue.assert_called_once_with(get_queue.table, TENANT_ID, QueueType.Inbound, 20, 1)
+    context.get_remaining_time_in_millis = lambda: 13000
+    get_queue.handler(event, context)
+    assert mock_wait_for_queue.call_args.args[3] == 10
+
+    # Still being created
+    mock_wait_for_queue.return_value = None
+    response = get_queue.handler(event, context)
+    assert response['statusCode'] == 202
+
+    # Without the parameter, there's no wait
+    mock_wait_for_queue.reset_mock()
+    response = get_queue.handler(apigw_event(tenant_id=TENANT_ID, queue_type='Inbound'), context)
+    assert response['statusCode'] == 202
+    mock_wait_for_queue.assert_not_called()
+
+
+def test_handler_invalid_wait():
+    from rest_api.get_queue import get_queue
+
+    event = apigw_event(tenant_id=TENANT_ID, queue_type='Inbound', query_parameters={
+        'wait': 'forever'
+    })
+    response = get_queue.handler(event, MockLambdaContext())
+
+    assert response['statusCode'] == 400
+    assert json.loads(response['body'])['message'] == 'Failed to parse wait'
+
+
 @patch('rest_api.get_queue.get_queue.get_tenant')
 @patch('rest_api.get_queue.get_queue.get_sqs_credentials')
 @patch('rest_api.get_queue.get_queue.get_queue', return_value=None)
@@ -153,6 +268,7 @@ def test_handler_queues_create_failed_once_retry_time_has_passed(mock_create_que
 
     mock_get_sqs_credentials.assert_not_called()
     mock_create_queues.assert_called_once_with(get_queue.sfn_client,
+                                               get_queue.table,
                                                'provisioner_arn',
                                                TENANT_ID,
                                                "Developer",
@@ -192,7 +308,8 @@ def test_handler_queues_create(mock_create_queues, _mock_get_status_and_retry_in
     response = get_queue.handler(event, MockLambdaContext())
 
     mock_get_sqs_credentials.assert_not_called()
-    mock_create_queues.assert_called_once_with(get_queue.sfn_client, 'provisioner_arn', TENANT_ID, "Developer")
+    mock_create_queues.assert_called_once_with(get_queue.sfn_client, get_queue.table, 'provisioner_arn', TENANT_ID,
+                                               "Developer")
 
     assert response['statusCode'] == 202
 
@@ -236,7 +353,8 @@ def test_handler_tenant_api_failure(mock_create_queues, _mock_get_status_and_ret
 
     assert response['statusCode'] == 202
     mock_get_sqs_credentials.assert_not_called()
-    mock_create_queues.assert_called_once_with(get_queue.sfn_client, 'provisioner_arn', TENANT_ID, 'Missing')
+    mock_create_queues.assert_called_once_with(get_queue.sfn_client, get_queue.table, 'provisioner_arn', TENANT_ID,
+                                               'Missing')
 
 
 def create_tenant_queue(tenant_id: str, queue_type: QueueType):
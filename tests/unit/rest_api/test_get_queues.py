@@ -73,6 +73,35 @@ def test_handler_queues_deleting(_mock_get_status, mock_get_queues, caplog):
     assert response['statusCode'] == 410
 
 
+@patch('rest_api.get_queues.get_queues.get_queues')
+@patch('rest_api.get_queues.get_queues.get_status', return_value=None)
+def test_handler_queues_not_modified(_mock_get_status, mock_get_queues):
+    from rest_api.get_queues import get_queues
+
+    inbound_queue, _ = mock_queues(inbound=True, outbound=False, tenant_id=TENANT_ID)
+    inbound_queue.version = '0.4.0'
+    mock_get_queues.return_value = [inbound_queue]
+
+    response = get_queues.handler(apigw_event(tenant_id=TENANT_ID), MockLambdaContext())
+
+    assert response['statusCode'] == 200
+    assert response['headers']['Cache-Control'] == 'no-cache'
+    assert response['headers']['Last-Modified'] == 'Wed, 15 Jul 2020 17:09:06 GMT'
+
+    event = apigw_event(tenant_id=TENANT_ID)
+    event['headers']['If-None-Match'] = response['headers']['ETag']
+    response = get_queues.handler(event, MockLambdaContext())
+
+    assert response['statusCode'] == 304
+    assert 'body' not in response
+
+    event = apigw_event(tenant_id=TENANT_ID)
+    event['headers']['If-Modified-Since'] = 'Wed, 15 Jul 2020 17:09:06 GMT'
+    response = get_queues.handler(event, MockLambdaContext())
+
+    assert response['statusCode'] == 304
+
+
 @patch('rest_api.get_queues.get_queues.get_queues', return_value=[])
 def test_handler_not_found(_mock_get_queues):
     from rest_api.get_queues import get_queues
@@ -0,0 +1,73 @@
+# pylint: disable=import-outside-toplevel
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from tests.common.core.mock_lambda_context import MockLambdaContext
+from tests.unit.aws_mocks import apigw_event
+from tests.unit.mock_queue import mock_queues
+
+TENANT_ID = 'mock-tenant'
+
+
+@pytest.fixture(autouse=True)
+def aws_env_vars():
+    os.environ['TABLE_NAME'] = 'bb-foundations-connector-table'
+    os.environ['STACK_NAME'] = 'fnds-stack-name'
+
+
+def _event(resource: str, method: str):
+    event = apigw_event(tenant_id=TENANT_ID)
+    event['resource'] = resource
+    event['httpMethod'] = method
+    return event
+
+
+@patch('rest_api.get_queues.get_queues.get_queues')
+@patch('rest_api.get_queues.get_queues.get_status', return_value=None)
+def test_handler_routes_to_endpoint(_mock_get_status, mock_get_queues):
+    from rest_api import router
+
+    inbound_queue, _ = mock_queues(inbound=True, outbound=False, tenant_id=TENANT_ID)
+    mock_get_queues.return_value = [inbound_queue]
+
+    response = router.handler(_event('/internal/api/v1/foundationsConnector/tenants/{tenantId}/queues', 'GET'),
+                              MockLambdaContext())
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['results'][0]['arn'] == inbound_queue.sqs_arn
+
+
+@patch('rest_api.router.importlib.import_module')
+def test_handler_routes(mock_import_module):
+    from rest_api import router
+
+    for (resource, method), module_name in router.ROUTES.items():
+        event = _event(resource, method)
+        response = router.handler(event, MockLambdaContext())
+
+        mock_import_module.assert_called_with(f'rest_api.{module_name}')
+        mock_import_module.return_value.handler.assert_called_with(event, MockLambdaContext())
+        assert response == mock_import_module.return_value.handler.return_value
+
+
+def test_handler_unknown_endpoint():
+    from rest_api import router
+
+    response = router.handler(_event('/internal/api/v1/foundationsConnector/tenants/{tenantId}/queues', 'PUT'),
+                              MockLambdaContext())
+
+    assert response['statusCode'] == 404
+    assert json.loads(response['body'])['message'] == 'Endpoint not found'
+
+
+def test_handler_missing_resource():
+    from rest_api import router
+
+    event = _event('/internal/api/v1/foundationsConnector/tenants/{tenantId}/queues', 'GET')
+    del event['resource']
+    response = router.handler(event, MockLambdaContext())
+
+    assert response['statusCode'] == 404
@@ -0,0 +1,73 @@
+# pylint: disable=import-outside-toplevel
+import os
+from unittest.mock import patch
+
+import pytest
+
+from tests.common.core.mock_lambda_context import MockLambdaContext
+
+TENANT_ID = 'mock-tenant'
+CLIENT_ID = 'mock-client'
+QUEUE_URL = 'https://sqs.us-east-1.amazonaws.com/123456789012/fnds-stack-name-pool-1-inbound'
+
+
+@pytest.fixture(autouse=True)
+def aws_env_vars():
+    os.environ['TABLE_NAME'] = 'bb-foundations-connector-table'
+    os.environ['STACK_TAGS'] = '{"Team": "fnds"}'
+
+
+def _event() -> dict:
+    return {
+        'tenantId': TENANT_ID,
+        'clientId': CLIENT_ID,
+    }
+
+
+@patch('tenant_resources.claim_pooled_queue.claim_pooled_queue.retag_queue')
+@patch('tenant_resources.claim_pooled_queue.claim_pooled_queue.claim_pooled_queue')
+def test_handler_claims_queue(mock_claim_pooled_queue, mock_retag_queue):
+    from tenant_resources.claim_pooled_queue import claim_pooled_queue
+
+    mock_claim_pooled_queue.return_value = {
+        'InboundQueueUrl': QUEUE_URL
+    }
+
+    result = claim_pooled_queue.handler(_event(), MockLambdaContext())
+
+    assert result == {
+        'claimed': True,
+        'queueUrl': QUEUE_URL,
+    }
+    mock_retag_queue.assert_called_once_with(claim_pooled_queue.sqs_client, QUEUE_URL, {
+        'Team': 'fnds',
+        'TenantId': TENANT_ID,
+        'ClientId': CLIENT_ID,
+    })
+
+
+@patch('tenant_resources.claim_pooled_queue.claim_pooled_queue.retag_queue')
+@patch('tenant_resources.claim_pooled_queue.claim_pooled_queue.claim_pooled_queue', return_value=None)
+def test_handler_pool_empty(_mock_claim_pooled_queue, mock_retag_queue):
+    from tenant_resources.claim_pooled_queue import claim_pooled_queue
+
+    result = claim_pooled_queue.handler(_event(), MockLambdaContext())
+
+    assert result == {
+        'claimed': False
+    }
+    mock_retag_queue.assert_not_called()
+
+
+@patch('tenant_resources.claim_pooled_queue.claim_pooled_queue.retag_queue', side_effect=Exception('Throttled'))
+@patch('tenant_resources.claim_pooled_queue.claim_pooled_queue.claim_pooled_queue')
+def test_handler_retag_failed_after_claim(mock_claim_pooled_queue, _mock_retag_queue):
+    from tenant_resources.claim_pooled_queue import claim_pooled_queue
+
+    mock_claim_pooled_queue.return_value = {
+        'InboundQueueUrl': QUEUE_URL
+    }
+
+    # The step function retries this error instead of falling back to a stack
+    with pytest.raises(claim_pooled_queue.PooledQueueRetagFailed):
+        claim_pooled_queue.handler(_event(), MockLambdaContext())
@@ -0,0 +1,165 @@
+import os
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import botocore
+import pytest
+
+from tests.common.core.mock_lambda_context import MockLambdaContext
+
+TENANT_ID = 'mock-tenant'
+CLIENT_ID = 'mock-client'
+STACK_NAME = 'fnds-stack-name-mock-tenant'
+
+
+@pytest.fixture(autouse=True)
+def aws_env_vars():
+    os.environ['TABLE_NAME'] = 'bb-foundations-connector-table'
+    os.environ['STACK_NAME'] = 'fnds-stack-name'
+    os.environ['STACK_VERSION'] = '0.4.0'
+    os.environ['STACK_TAGS'] = '{"Team": "fnds"}'
+    os.environ['MANAGE_METADATA_ARN'] = 'manage_metadata_arn'
+    os.environ['INBOUND_DLQ_ARN'] = 'inbound_dlq_arn'
+
+
+def _event(is_update=False) -> dict:
+    event: dict[str, Any] = {
+        'tenantId': TENANT_ID,
+        'clientId': CLIENT_ID,
+    }
+    if is_update:
+        event['isUpdate'] = True
+    return event
+
+
+def _deployed_stack(deploy_stack, template_hash: str) -> MagicMock:
+    stack = MagicMock()
+    stack.stack_status = 'UPDATE_COMPLETE'
+    stack.parameters = [{
+        'ParameterKey': 'TenantId',
+        'ParameterValue': TENANT_ID
+    }, {
+        'ParameterKey': 'ClientId',
+        'ParameterValue': CLIENT_ID
+    }, {
+        'ParameterKey': 'StackVersion',
+        'ParameterValue': '0.4.0'
+    }, {
+        'ParameterKey': 'ManageMetadataFunctionArn',
+        'ParameterValue': 'manage_metadata_arn'
+    }, {
+        'ParameterKey': 'InboundDlqArn',
+        'ParameterValue': 'inbound_dlq_arn'
+    }, {
+        'ParameterKey': 'TemplateHash',
+        'ParameterValue': template_hash
+    }]
+    stack.tags = [{
+        'Key': key,
+        'Value': value
+    } for key, value in deploy_stack.tenant_tags(deploy_stack.stack_tags, TENANT_ID, CLIENT_ID).items()]
+    return stack
+
+
+@patch('tenant_resources.deploy_stack.deploy_stack.cloudformation')
+def test_create_records_template_hash(mock_cloudformation):
+    from tenant_resources.deploy_stack import deploy_stack
+
+    mock_cloudformation.create_stack.return_value.stack_id = 'stack-id'
+
+    result = deploy_stack.handler(_event(), MockLambdaContext())
+
+    assert result == {
+        'stackName': STACK_NAME,
+        'stackId': 'stack-id',
+    }
+    create = mock_cloudformation.create_stack.call_args.kwargs
+    # Without a staged template, the body is sent instead
+    assert create['TemplateBody'] == deploy_stack.template.body
+    assert 'TemplateURL' not in create
+    assert {
+        'ParameterKey': 'TemplateHash',
+        'ParameterValue': deploy_stack.template.hash
+    } in create['Parameters']
+
+
+@patch('tenant_resources.deploy_stack.deploy_stack.get_metadata', return_value={})
+@patch('tenant_resources.deploy_stack.deploy_stack.cloudformation')
+def test_update_skipped_when_up_to_date(mock_cloudformation, _get_metadata):
+    from tenant_resources.deploy_stack import deploy_stack
+
+    stack = _deployed_stack(deploy_stack, deploy_stack.template.hash)
+    mock_cloudformation.Stack.return_value = stack
+
+    result = deploy_stack.handler(_event(is_update=True), MockLambdaContext())
+
+    assert result == {
+        'stackName': STACK_NAME,
+        'stackId': None,
+    }
+    stack.update.assert_not_called()
+
+
+@patch('tenant_resources.deploy_stack.deploy_stack.get_metadata', return_value={})
+@patch('tenant_resources.deploy_stack.deploy_stack.cloudformation')
+def test_update_when_template_changed(mock_cloudformation, _get_metadata):
+    from tenant_resources.deploy_stack import deploy_stack
+
+    stack = _deployed_stack(deploy_stack, 'previous-hash')
+    stack.stack_id = 'stack-id'
+    mock_cloudformation.Stack.return_value = stack
+
+    result = deploy_stack.handler(_event(is_update=True), MockLambdaContext())
+
+    assert result == {
+        'stackName': STACK_NAME,
+        'stackId': 'stack-id',
+    }
+    update = stack.update.call_args.kwargs
+    assert update['TemplateBody'] == deploy_stack.template.body
+    assert {
+        'ParameterKey': 'TemplateHash',
+        'ParameterValue': deploy_stack.template.hash
+    } in update['Parameters']
+
+
+@patch('tenant_resources.deploy_stack.deploy_stack.get_metadata', return_value={})
+@patch('tenant_resources.deploy_stack.deploy_stack.cloudformation')
+def test_update_rejected_as_no_op(mock_cloudformation, _get_metadata):
+    from tenant_resources.deploy_stack import deploy_stack
+
+    stack = _deployed_stack(deploy_stack, 'previous-hash')
+    stack.update.side_effect = botocore.exceptions.ClientError(
+        {
+            'Error': {
+                'Code': 'ValidationError',
+                'Message': 'No updates are to be performed.'
+            }
+        }, 'UpdateStack')
+    mock_cloudformation.Stack.return_value = stack
+
+    result = deploy_stack.handler(_event(is_update=True), MockLambdaContext())
+
+    assert result == {
+        'stackName': STACK_NAME,
+        'stackId': None,
+    }
+
+
+@patch('tenant_resources.deploy_stack.deploy_stack.get_metadata', return_value={})
+@patch('tenant_resources.deploy_stack.deploy_stack.cloudformation')
+def test_update_fails_on_other_errors(mock_cloudformation, _get_metadata):
+    from tenant_resources.deploy_stack import deploy_stack
+
+    stack = _deployed_stack(deploy_stack, 'previous-hash')
+    stack.update.side_effect = botocore.exceptions.ClientError(
+        {
+            'Error': {
+                'Code': 'ValidationError',
+                'Message': 'Stack is in UPDATE_IN_PROGRESS state and can not be updated.'
+            }
+        }, 'UpdateStack')
+    mock_cloudformation.Stack.return_value = stack
+
+    with pytest.raises(botocore.exceptions.ClientError):
+        deploy_stack.handler(_event(is_update=True), MockLambdaContext())